@@ -93,7 +93,7 @@ class PaymentForm(BaseServiceForm, PaymentFieldsMixin, RemanenteFieldsMixin):
             'remanente': self.cleaned_data.get('remanente')
         }
         
-        updated_periods = []
+        amounts = {}
         for period in periods:
             if hasattr(period, 'amount') and period.amount and period.amount > 0:
                 amount = period.amount
@@ -106,11 +106,10 @@ class PaymentForm(BaseServiceForm, PaymentFieldsMixin, RemanenteFieldsMixin):
             if amount <= 0:
                 raise ValidationError(f'No se pudo determinar un importe válido para el período {period.period_start} - {period.period_end}')
             
-            updated_period = PaymentService.process_payment(
-                period=period,
-                amount=amount,
-                **payment_info
-            )
-            updated_periods.append(updated_period)
-                        
-        return updated_periods
+            amounts[period.pk] = amount
+
+        return PaymentService.process_payments_bulk(
+            periods=periods,
+            amounts=amounts,
+            **payment_info
+        )
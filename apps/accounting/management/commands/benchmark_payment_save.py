@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+from apps.accounting.models import ServicePayment
+from apps.business_lines.services.business_line_service import BusinessLineService
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide las consultas SQL de guardar un período (ServicePayment.save) con la '
+        'sincronización anterior de end_date y con la actual. No guarda cambios.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('schema', type=str, help='Schema del tenant sobre el que medir')
+        parser.add_argument(
+            '--payment',
+            type=int,
+            help='ID del período a guardar (por defecto, el más reciente)',
+        )
+
+    def handle(self, *args, **options):
+        with schema_context(options['schema']):
+            payments = ServicePayment.objects.select_related('client_service__business_line')
+            if options.get('payment'):
+                payments = payments.filter(pk=options['payment'])
+            payment = payments.order_by('-created').first()
+            if payment is None:
+                raise CommandError('No hay períodos para medir en este tenant')
+
+            legacy = self._measure(payment, self._legacy_save)
+            lean = self._measure(payment, self._lean_save)
+
+        self.stdout.write(f'Período {payment.pk} (servicio {payment.client_service_id})')
+        self.stdout.write(f'  Antes:   {legacy} consultas')
+        self.stdout.write(f'  Después: {lean} consultas')
+        self.stdout.write(self.style.SUCCESS(f'Ahorro: {legacy - lean} consultas por guardado'))
+
+    def _measure(self, payment, save):
+        payment = ServicePayment.objects.select_related('client_service__business_line').get(pk=payment.pk)
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                save(payment)
+                # Dentro del rollback no hay commit: se ejecutan aquí los recálculos diferidos
+                BusinessLineService.flush_business_line_status_updates()
+            transaction.set_rollback(True)
+        return len(queries)
+
+    def _lean_save(self, payment):
+        payment.save()
+
+    def _legacy_save(self, payment):
+        # Reproduce la sincronización anterior: consulta ordenada de períodos, save()
+        # completo del servicio y doble recorrido de la línea (save + señal post_save).
+        # El save() del servicio ya deja un recorrido diferido; se añade el segundo.
+        if payment.status not in [ServicePayment.StatusChoices.PAID, ServicePayment.StatusChoices.REFUNDED]:
+            payment.status = payment.get_appropriate_status()
+        previous_rollup_state = payment._get_previous_rollup_state()
+        super(ServicePayment, payment).save()
+
+        service = payment.client_service
+        last_period = service.payments.filter(
+            status__in=[
+                ServicePayment.StatusChoices.AWAITING_START,
+                ServicePayment.StatusChoices.UNPAID_ACTIVE,
+                ServicePayment.StatusChoices.PAID
+            ]
+        ).order_by('-period_end').first()
+        if last_period:
+            service.end_date = last_period.period_end
+            service.save(update_fields=['end_date', 'modified'])
+            service.business_line.update_active_status()
+
+        payment._record_rollup_change(previous_rollup_state)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_tenant_model, schema_context
+from apps.accounting.services.service_state_manager import ServiceStateManager
+
+
+class Command(BaseCommand):
+    help = 'Desactiva en bloque los servicios cuya fecha de finalización ya ha pasado, en todos los tenants'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra cuántos servicios se desactivarían sin hacer cambios',
+        )
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Procesar solo el tenant con este schema',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        schema_name = options.get('tenant')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Modo DRY-RUN activado'))
+
+        TenantModel = get_tenant_model()
+        tenants_qs = TenantModel.objects.exclude(schema_name='public').filter(is_deleted=False)
+
+        if schema_name:
+            tenants_qs = tenants_qs.filter(schema_name=schema_name)
+
+        total = 0
+        for tenant in tenants_qs:
+            with schema_context(tenant.schema_name):
+                count = ServiceStateManager.deactivate_expired_services(dry_run=dry_run)
+
+            total += count
+            action = 'se desactivarían' if dry_run else 'desactivados'
+            self.stdout.write(f'  {tenant.schema_name}: {count} servicios {action}')
+
+        self.stdout.write(self.style.SUCCESS(f'\nProceso completado: {total} servicios en total'))
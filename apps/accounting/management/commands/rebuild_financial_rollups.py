@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from apps.accounting.services.financial_rollup_service import FinancialRollupService
+
+
+class Command(BaseCommand):
+    help = 'Regenera el agregado mensual de ingresos y gastos a partir de pagos y gastos'
+
+    def handle(self, *args, **options):
+        rows = FinancialRollupService.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Agregado financiero regenerado: {rows} filas')
+        )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_tenant_model, schema_context
+from apps.accounting.services.period_service import ServicePeriodManager
+
+
+class Command(BaseCommand):
+    help = 'Actualiza en bloque el estado de los períodos sin pagar (pendiente de inicio, pendiente, vencido) en todos los tenants'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra cuántos períodos cambiarían sin hacer cambios',
+        )
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Procesar solo el tenant con este schema',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        schema_name = options.get('tenant')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Modo DRY-RUN activado'))
+
+        TenantModel = get_tenant_model()
+        tenants_qs = TenantModel.objects.exclude(schema_name='public').filter(is_deleted=False)
+
+        if schema_name:
+            tenants_qs = tenants_qs.filter(schema_name=schema_name)
+
+        total = 0
+        for tenant in tenants_qs:
+            with schema_context(tenant.schema_name):
+                counts = ServicePeriodManager.refresh_period_statuses(dry_run=dry_run)
+
+            tenant_total = sum(counts.values())
+            total += tenant_total
+            detail = ', '.join(f'{status}: {count}' for status, count in counts.items())
+            self.stdout.write(f'  {tenant.schema_name}: {tenant_total} períodos ({detail})')
+
+        self.stdout.write(self.style.SUCCESS(f'\nProceso completado: {total} períodos actualizados'))
@@ -142,8 +142,7 @@ class BusinessLineManager(models.Manager):
         from apps.accounting.models import ClientService, ServicePayment
         
         if include_descendants:
-            descendant_ids = business_line.get_descendant_ids()
-            services_filter = Q(business_line_id__in=descendant_ids, is_active=True)
+            services_filter = business_line.get_subtree_q('business_line__') & Q(is_active=True)
         else:
             services_filter = Q(business_line=business_line, is_active=True)
         
@@ -2,7 +2,7 @@ from typing import Dict, List, Optional, Any
 from decimal import Decimal
 from datetime import date, timedelta
 from django.db import models
-from django.db.models import QuerySet, Q, Sum, Count, Avg, F, Case, When, Value, OuterRef, Max
+from django.db.models import QuerySet, Q, Sum, Count, Avg, F, Case, When, Value, OuterRef, Max, Subquery, Exists, CharField
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -35,6 +35,9 @@ class ClientServiceQuerySet(models.QuerySet):
     def by_business_lines(self, business_lines: QuerySet):
         return self.filter(business_line__in=business_lines)
     
+    def in_business_line_tree(self, business_line):
+        return self.filter(business_line.get_subtree_q('business_line__'))
+    
     def with_client_data(self):
         return self.select_related('client', 'business_line')
     
@@ -44,6 +47,52 @@ class ClientServiceQuerySet(models.QuerySet):
             business_line_name=F('business_line__name')
         )
     
+    def with_status_data(self):
+        """
+        Anota el estado de renovación calculado en SQL para evitar consultas por fila.
+
+        Añade `last_period_end`, `has_pending_periods`, `latest_payment_status` y
+        `resolved_status`, que ServiceStateManager usa cuando están presentes.
+        """
+        from apps.accounting.models import ServicePayment
+        from apps.accounting.services.service_state_manager import ServiceStateManager
+        
+        today = timezone.now().date()
+        service_payments = ServicePayment.objects.filter(client_service=OuterRef('pk'))
+        
+        return self.annotate(
+            last_period_end=Subquery(
+                service_payments.order_by('-period_end').values('period_end')[:1]
+            ),
+            has_pending_periods=Exists(
+                service_payments.filter(status__in=[
+                    ServicePayment.StatusChoices.AWAITING_START,
+                    ServicePayment.StatusChoices.UNPAID_ACTIVE,
+                ])
+            ),
+            latest_payment_status=Subquery(
+                service_payments.order_by('-created').values('status')[:1]
+            ),
+        ).annotate(
+            resolved_status=Case(
+                # Un servicio con fecha de fin ya pasada se considera inactivo
+                When(Q(is_active=False) | Q(end_date__lt=today), then=Value('inactive')),
+                When(admin_status='SUSPENDED', then=Value('suspended')),
+                When(last_period_end__isnull=True, then=Value('no_periods')),
+                When(last_period_end__lt=today, then=Value('expired')),
+                When(
+                    last_period_end__lte=today + timedelta(days=ServiceStateManager.EXPIRING_SOON_DAYS),
+                    then=Value('expiring_soon')
+                ),
+                When(
+                    last_period_end__lte=today + timedelta(days=ServiceStateManager.RENEWAL_WARNING_DAYS),
+                    then=Value('renewal_pending')
+                ),
+                default=Value('active'),
+                output_field=CharField(),
+            )
+        )
+    
     def expiring_soon(self, days=30):
         target_date = timezone.now().date() + timedelta(days=days)
         return self.active().filter(
@@ -202,6 +251,9 @@ class ClientServiceManager(models.Manager):
     def with_status(self, status):
         return self.get_queryset().with_status(status)
     
+    def with_status_data(self):
+        return self.get_queryset().with_status_data()
+    
     def get_services_by_category(
         self,
         business_line,
@@ -219,11 +271,7 @@ class ClientServiceManager(models.Manager):
         category: str,
         active_only: bool = False
     ) -> QuerySet:
-        descendant_ids = business_line.get_descendant_ids()
-        
-        queryset = self.get_queryset().filter(
-            business_line__id__in=descendant_ids
-        ).by_category(category)
+        queryset = self.get_queryset().in_business_line_tree(business_line).by_category(category)
         
         if active_only:
             queryset = queryset.active()
@@ -277,11 +325,7 @@ class ClientServiceManager(models.Manager):
         business_line,
         category: Optional[str] = None
     ) -> Dict[str, Any]:
-        descendant_ids = business_line.get_descendant_ids()
-        
-        queryset = self.get_queryset().filter(
-            business_line__id__in=descendant_ids
-        ).active()
+        queryset = self.get_queryset().in_business_line_tree(business_line).active()
         
         if category:
             queryset = queryset.by_category(category)
@@ -0,0 +1,110 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+import django.db.models.deletion
+
+
+def populate_financial_rollups(apps, schema_editor):
+    """
+    Carga inicial del agregado mensual a partir de los pagos y gastos existentes.
+    """
+    ServicePayment = apps.get_model('accounting', 'ServicePayment')
+    Expense = apps.get_model('expenses', 'Expense')
+    FinancialMonthlyRollup = apps.get_model('accounting', 'FinancialMonthlyRollup')
+
+    zero = Value(0, output_field=models.DecimalField())
+    buckets = {}
+
+    def accumulate(key, amount, remanente, entry_count):
+        current = buckets.get(key, (Decimal('0'), Decimal('0'), 0))
+        buckets[key] = (current[0] + amount, current[1] + remanente, current[2] + entry_count)
+
+    payment_rows = (
+        ServicePayment.objects
+        .filter(payment_date__isnull=False)
+        .annotate(rollup_month=TruncMonth('payment_date'))
+        .values('rollup_month', 'client_service__business_line_id', 'client_service__category', 'payment_method', 'status')
+        .annotate(
+            total_amount=Coalesce(Sum(F('amount') - Coalesce(F('refunded_amount'), zero)), zero),
+            total_remanente=Coalesce(Sum('remanente'), zero),
+            total_count=Count('amount'),
+        )
+        .order_by()
+    )
+    for row in payment_rows:
+        status = row['status'] if row['status'] in ('PAID', 'REFUNDED') else 'PENDING'
+        key = (
+            row['rollup_month'], 'PAYMENT', row['client_service__business_line_id'],
+            row['client_service__category'], row['payment_method'] or '', status,
+        )
+        accumulate(key, row['total_amount'], row['total_remanente'], row['total_count'])
+
+    expense_rows = (
+        Expense.objects
+        .annotate(rollup_month=TruncMonth('date'))
+        .values('rollup_month', 'service_category')
+        .annotate(total_amount=Sum('amount'), total_count=Count('id'))
+        .order_by()
+    )
+    for row in expense_rows:
+        key = (row['rollup_month'], 'EXPENSE', None, row['service_category'] or '', '', '')
+        accumulate(key, row['total_amount'], Decimal('0'), row['total_count'])
+
+    FinancialMonthlyRollup.objects.bulk_create(
+        [
+            FinancialMonthlyRollup(
+                month=key[0], source=key[1], business_line_id=key[2], category=key[3],
+                payment_method=key[4], payment_status=key[5],
+                amount=values[0], remanente=values[1], entry_count=values[2],
+            )
+            for key, values in buckets.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_lines', '0001_initial'),
+        ('expenses', '0001_initial'),
+        ('accounting', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinancialMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='Primer día del mes agregado', verbose_name='Mes')),
+                ('source', models.CharField(choices=[('PAYMENT', 'Ingreso'), ('EXPENSE', 'Gasto')], max_length=10, verbose_name='Origen')),
+                ('category', models.CharField(max_length=10, verbose_name='Categoría')),
+                ('payment_method', models.CharField(blank=True, default='', max_length=15, verbose_name='Método de pago')),
+                ('payment_status', models.CharField(blank=True, choices=[('PAID', 'Pagado'), ('REFUNDED', 'Reembolsado'), ('PENDING', 'Sin liquidar')], default='', max_length=10, verbose_name='Estado del pago')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Importe neto €')),
+                ('remanente', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Remanente €')),
+                ('entry_count', models.IntegerField(default=0, verbose_name='Número de registros')),
+                ('business_line', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='financial_rollups', to='business_lines.businessline', verbose_name='Línea de negocio')),
+            ],
+            options={
+                'verbose_name': 'Resumen financiero mensual',
+                'verbose_name_plural': 'Resúmenes financieros mensuales',
+                'db_table': 'financial_monthly_rollups',
+                'indexes': [
+                    models.Index(fields=['source', 'category', 'month'], name='financial_m_source_91bec0_idx'),
+                    models.Index(fields=['business_line', 'month'], name='financial_m_busines_7f3e4c_idx'),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='financialmonthlyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('business_line__isnull', False)), fields=('month', 'source', 'business_line', 'category', 'payment_method', 'payment_status'), name='financial_rollup_line_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='financialmonthlyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('business_line__isnull', True)), fields=('month', 'source', 'category', 'payment_method', 'payment_status'), name='financial_rollup_global_key'),
+        ),
+        migrations.RunPython(populate_financial_rollups, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Q, Subquery
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from apps.core.models import TimeStampedModel, SoftDeleteModel
@@ -166,6 +167,8 @@ class ClientService(TimeStampedModel):
 
     objects = ClientServiceManager()
 
+    ROLLUP_KEY_FIELDS = ('business_line_id', 'category')
+
     class Meta:
         db_table = 'client_services'
         verbose_name = "Servicio de cliente"
@@ -213,19 +216,34 @@ class ClientService(TimeStampedModel):
             self.remanentes = {}
         
         self.clean()
+        previous_rollup_key = getattr(self, '_rollup_key', None)
         super().save(*args, **kwargs)
         
-        # Actualizar el estado de la línea de negocio
-        if self.business_line:
-            self.business_line.update_active_status()
+        current_rollup_key = (self.business_line_id, self.category)
+        if previous_rollup_key and previous_rollup_key != current_rollup_key:
+            from .services.financial_rollup_service import FinancialRollupService
+            FinancialRollupService.move_service(self, *previous_rollup_key)
+        self._rollup_key = current_rollup_key
+        
+        # El estado de la línea de negocio se recalcula una vez por transacción
+        from apps.business_lines.services.business_line_service import BusinessLineService
+        BusinessLineService.schedule_business_line_status_update(self.business_line_id)
 
     def delete(self, *args, **kwargs):
-        business_line = self.business_line
-        super().delete(*args, **kwargs)
+        business_line_id = self.business_line_id
+        result = super().delete(*args, **kwargs)
         
         # Actualizar el estado de la línea de negocio después de eliminar el servicio
-        if business_line:
-            business_line.update_active_status()
+        from apps.business_lines.services.business_line_service import BusinessLineService
+        BusinessLineService.schedule_business_line_status_update(business_line_id)
+        return result
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in field_names for field in cls.ROLLUP_KEY_FIELDS):
+            instance._rollup_key = (instance.business_line_id, instance.category)
+        return instance
 
     def __str__(self):
         return f"{self.client.full_name} - {self.business_line.name} ({self.category})"
@@ -438,6 +456,15 @@ class ServicePayment(TimeStampedModel):
         ]
         ordering = ['-payment_date', '-created']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        from .services.financial_rollup_service import FinancialRollupService
+        instance = super().from_db(db, field_names, values)
+        tracked_fields = FinancialRollupService.PAYMENT_TRACKED_FIELDS
+        if all(field in field_names for field in tracked_fields):
+            instance._rollup_state = FinancialRollupService.snapshot(instance, tracked_fields)
+        return instance
+
     def clean(self):
         super().clean()
         
@@ -456,24 +483,30 @@ class ServicePayment(TimeStampedModel):
                 'remanente': 'Los remanentes solo pueden aplicarse a servicios de categoría BUSINESS.'
             })
 
-    def save(self, *args, **kwargs):
-        self.clean()
-        super().save(*args, **kwargs)
-        
-        self._update_service_end_date()
-    
     def _update_service_end_date(self):
-        last_period = self.client_service.payments.filter(
+        """
+        Sincroniza end_date del servicio con el último período vigente o pagado.
+        
+        Un único UPDATE condicional que no escribe si la fecha ya coincide. No
+        recalcula la línea de negocio: su estado solo depende de is_active.
+        """
+        last_period_end = ServicePayment.objects.filter(
+            client_service=OuterRef('pk'),
             status__in=[
                 self.StatusChoices.AWAITING_START,
                 self.StatusChoices.UNPAID_ACTIVE,
                 self.StatusChoices.PAID
             ]
-        ).order_by('-period_end').first()
+        ).order_by('-period_end').values('period_end')[:1]
         
-        if last_period and last_period.period_end:
-            self.client_service.end_date = last_period.period_end
-            self.client_service.save(update_fields=['end_date', 'modified'])
+        updated = ClientService.objects.filter(
+            Exists(last_period_end),
+            Q(end_date__isnull=True) | ~Q(end_date=Subquery(last_period_end)),
+            pk=self.client_service_id,
+        ).update(end_date=Subquery(last_period_end), modified=timezone.now())
+        
+        if updated and ServicePayment.client_service.is_cached(self):
+            self.client_service.refresh_from_db(fields=['end_date', 'modified'])
 
     def __str__(self):
         return f"{self.client_service.client.full_name} - {self.amount}€ ({self.get_status_display()})"
@@ -634,5 +667,117 @@ class ServicePayment(TimeStampedModel):
     def save(self, *args, **kwargs):
         if self.status not in [self.StatusChoices.PAID, self.StatusChoices.REFUNDED]:
             self.status = self.get_appropriate_status()
+        previous_rollup_state = self._get_previous_rollup_state()
         super().save(*args, **kwargs)
         self._update_service_end_date()
+        self._record_rollup_change(previous_rollup_state)
+
+    def _get_previous_rollup_state(self):
+        from .services.financial_rollup_service import FinancialRollupService
+        if self._state.adding:
+            return None
+        if hasattr(self, '_rollup_state'):
+            return self._rollup_state
+        
+        tracked_fields = FinancialRollupService.PAYMENT_TRACKED_FIELDS
+        values = ServicePayment.objects.filter(pk=self.pk).values_list(*tracked_fields).first()
+        return dict(zip(tracked_fields, values)) if values else None
+
+    def _record_rollup_change(self, previous_rollup_state):
+        from .services.financial_rollup_service import FinancialRollupService
+        self._rollup_state = FinancialRollupService.record_payment_change(self, previous_rollup_state)
+
+
+class FinancialMonthlyRollup(models.Model):
+    
+    class SourceChoices(models.TextChoices):
+        PAYMENT = 'PAYMENT', 'Ingreso'
+        EXPENSE = 'EXPENSE', 'Gasto'
+    
+    class StatusBucketChoices(models.TextChoices):
+        PAID = 'PAID', 'Pagado'
+        REFUNDED = 'REFUNDED', 'Reembolsado'
+        PENDING = 'PENDING', 'Sin liquidar'
+    
+    month = models.DateField(
+        verbose_name="Mes",
+        help_text="Primer día del mes agregado"
+    )
+    
+    source = models.CharField(
+        max_length=10,
+        choices=SourceChoices.choices,
+        verbose_name="Origen"
+    )
+    
+    business_line = models.ForeignKey(
+        'business_lines.BusinessLine',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='financial_rollups',
+        verbose_name="Línea de negocio"
+    )
+    
+    category = models.CharField(
+        max_length=10,
+        verbose_name="Categoría"
+    )
+    
+    payment_method = models.CharField(
+        max_length=15,
+        blank=True,
+        default='',
+        verbose_name="Método de pago"
+    )
+    
+    payment_status = models.CharField(
+        max_length=10,
+        choices=StatusBucketChoices.choices,
+        blank=True,
+        default='',
+        verbose_name="Estado del pago"
+    )
+    
+    amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name="Importe neto €"
+    )
+    
+    remanente = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name="Remanente €"
+    )
+    
+    entry_count = models.IntegerField(
+        default=0,
+        verbose_name="Número de registros"
+    )
+
+    class Meta:
+        db_table = 'financial_monthly_rollups'
+        verbose_name = "Resumen financiero mensual"
+        verbose_name_plural = "Resúmenes financieros mensuales"
+        indexes = [
+            models.Index(fields=['source', 'category', 'month']),
+            models.Index(fields=['business_line', 'month']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'source', 'business_line', 'category', 'payment_method', 'payment_status'],
+                condition=models.Q(business_line__isnull=False),
+                name='financial_rollup_line_key'
+            ),
+            models.UniqueConstraint(
+                fields=['month', 'source', 'category', 'payment_method', 'payment_status'],
+                condition=models.Q(business_line__isnull=True),
+                name='financial_rollup_global_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.get_source_display()} {self.category}: {self.amount}€"
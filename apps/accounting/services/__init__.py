@@ -17,6 +17,8 @@ from .payment_components import (
     PaymentCreator
 )
 from .client_reactivation_service import ClientReactivationService
+from .financial_rollup_service import FinancialRollupService
+from .business_line_tree_stats import BusinessLineTreeStats
 
 __all__ = [
     'BusinessLineService', 
@@ -36,5 +38,7 @@ __all__ = [
     'PaymentValidator',
     'ServiceExtensionManager',
     'PaymentCreator',
-    'ClientReactivationService'
+    'ClientReactivationService',
+    'FinancialRollupService',
+    'BusinessLineTreeStats'
 ]
@@ -92,10 +92,7 @@ class BusinessLineService(RevenueCalculationMixin):
         )
         
         if include_children:
-            descendant_ids = business_line.get_descendant_ids()
-            services_query = ClientService.objects.filter(
-                business_line__id__in=descendant_ids
-            )
+            services_query = ClientService.objects.in_business_line_tree(business_line)
         
         payments_query = ServicePayment.objects.filter(
             client_service__in=services_query
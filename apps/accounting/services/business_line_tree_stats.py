@@ -0,0 +1,181 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Count, Q, Sum
+
+from apps.business_lines.models import BusinessLine
+from apps.accounting.models import ClientService
+from apps.core.constants import SERVICE_CATEGORIES
+from .revenue_calculation_utils import RevenueCalculationMixin
+
+
+class BusinessLineTreeStats(RevenueCalculationMixin):
+    """
+    Estadísticas de ingresos y servicios para todo el árbol de líneas de negocio.
+
+    Carga la tabla de líneas una vez, obtiene los totales propios de cada línea con
+    una única consulta agrupada sobre ClientService y sus pagos, y acumula los
+    valores de abajo arriba en Python. Cualquier nodo se consulta después sin
+    nuevas consultas.
+    """
+
+    STAT_FIELDS = (
+        'personal_revenue',
+        'business_revenue',
+        'personal_services',
+        'business_services',
+        'payment_count',
+        'total_remanentes',
+    )
+
+    def __init__(
+        self,
+        statuses: Optional[Iterable[str]] = None,
+        active_services_only: bool = False,
+        active_lines_only: bool = False,
+        include_clients: bool = False,
+    ):
+        self.statuses = list(statuses) if statuses is not None else None
+        self.active_services_only = active_services_only
+        self.active_lines_only = active_lines_only
+        self.include_clients = include_clients
+
+        self._lines = {}
+        self._children = defaultdict(list)
+        self._own_stats = defaultdict(self._empty_stats)
+        self._own_clients = defaultdict(set)
+        self._subtree_stats = {}
+        self._subtree_clients = {}
+
+        self._load_lines()
+        self._load_own_stats()
+        if include_clients:
+            self._load_own_clients()
+
+    @classmethod
+    def _empty_stats(cls) -> Dict[str, Decimal]:
+        return {
+            'personal_revenue': Decimal('0'),
+            'business_revenue': Decimal('0'),
+            'personal_services': 0,
+            'business_services': 0,
+            'payment_count': 0,
+            'total_remanentes': Decimal('0'),
+        }
+
+    def _load_lines(self):
+        for line_id, parent_id, is_active in BusinessLine.objects.values_list('id', 'parent_id', 'is_active'):
+            self._lines[line_id] = (parent_id, is_active)
+            if parent_id is not None:
+                self._children[parent_id].append(line_id)
+
+    def _services_queryset(self):
+        services = ClientService.objects.all()
+        if self.active_services_only:
+            services = services.filter(is_active=True)
+        return services
+
+    def _load_own_stats(self):
+        payment_filter = Q(payments__amount__isnull=False)
+        if self.statuses is not None:
+            payment_filter &= Q(payments__status__in=self.statuses)
+
+        net_amount = self.get_net_amount_expression_for('payments__')
+        rows = (
+            self._services_queryset()
+            .values('business_line_id', 'category')
+            .annotate(
+                service_count=Count('id', distinct=True),
+                revenue=Sum(net_amount, filter=payment_filter),
+                payment_count=Count('payments', filter=payment_filter),
+                remanentes=Sum('payments__remanente', filter=Q(payments__remanente__isnull=False)),
+            )
+            .order_by()
+        )
+
+        for row in rows:
+            stats = self._own_stats[row['business_line_id']]
+            if row['category'] == SERVICE_CATEGORIES['PERSONAL']:
+                stats['personal_revenue'] += row['revenue'] or Decimal('0')
+                stats['personal_services'] += row['service_count']
+            elif row['category'] == SERVICE_CATEGORIES['BUSINESS']:
+                stats['business_revenue'] += row['revenue'] or Decimal('0')
+                stats['business_services'] += row['service_count']
+                stats['total_remanentes'] += row['remanentes'] or Decimal('0')
+            stats['payment_count'] += row['payment_count']
+
+    def _load_own_clients(self):
+        pairs = self._services_queryset().values_list('business_line_id', 'client_id').distinct()
+        for line_id, client_id in pairs:
+            self._own_clients[line_id].add(client_id)
+
+    def _visible_children(self, line_id):
+        children = self._children.get(line_id, [])
+        if self.active_lines_only:
+            return [child_id for child_id in children if self._lines[child_id][1]]
+        return children
+
+    def _compute_subtree(self, line_id):
+        # Recorrido iterativo en post-orden: no depende del límite de recursión
+        stack = [(line_id, False)]
+        while stack:
+            current_id, expanded = stack.pop()
+            if current_id in self._subtree_stats:
+                continue
+            children = self._visible_children(current_id)
+            if not expanded:
+                stack.append((current_id, True))
+                stack.extend((child_id, False) for child_id in children)
+                continue
+
+            totals = dict(self._own_stats.get(current_id) or self._empty_stats())
+            clients = set(self._own_clients.get(current_id, ()))
+            for child_id in children:
+                child_totals = self._subtree_stats[child_id]
+                for field in self.STAT_FIELDS:
+                    totals[field] += child_totals[field]
+                clients |= self._subtree_clients[child_id]
+            self._subtree_stats[current_id] = totals
+            self._subtree_clients[current_id] = clients
+
+    def get_line_ids(self, line_id) -> set:
+        """IDs de la línea y de todos sus descendientes."""
+        collected = set()
+        pending = [line_id]
+        while pending:
+            current_id = pending.pop()
+            collected.add(current_id)
+            pending.extend(self._visible_children(current_id))
+        return collected
+
+    def get_stats(self, line_id, include_children: bool = True) -> Dict[str, Decimal]:
+        if line_id not in self._lines:
+            stats = self._empty_stats()
+            clients = set()
+        elif include_children:
+            self._compute_subtree(line_id)
+            stats = dict(self._subtree_stats[line_id])
+            clients = self._subtree_clients[line_id]
+        else:
+            stats = dict(self._own_stats.get(line_id) or self._empty_stats())
+            clients = self._own_clients.get(line_id, set())
+
+        stats['total_revenue'] = stats['personal_revenue'] + stats['business_revenue']
+        stats['total_services'] = stats['personal_services'] + stats['business_services']
+        if self.include_clients:
+            stats['unique_clients'] = len(clients)
+        return stats
+
+    def enrich(self, business_line, include_children: bool = True):
+        stats = self.get_stats(business_line.id, include_children)
+        business_line.personal_revenue = stats['personal_revenue']
+        business_line.business_revenue = stats['business_revenue']
+        business_line.personal_services = stats['personal_services']
+        business_line.business_services = stats['business_services']
+        return business_line
+
+    def enrich_many(self, business_lines, include_children: bool = True):
+        for line in business_lines:
+            self.enrich(line, include_children)
+        return business_lines
@@ -98,7 +98,7 @@ class ClientReactivationService:
         queryset = Client.objects.filter(is_deleted=False)
         if business_line:
             queryset = queryset.filter(
-                services__business_line__in=business_line.get_descendant_ids()
+                business_line.get_subtree_q('services__business_line__')
             ).distinct()
         
         stats = {
@@ -0,0 +1,470 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce, TruncMonth
+
+from apps.accounting.models import ClientService, FinancialMonthlyRollup, ServicePayment
+
+
+class FinancialRollupService:
+    """
+    Mantiene y consulta la tabla de agregados mensuales de ingresos y gastos.
+
+    Cada escritura de un pago o gasto aplica la diferencia entre su contribución
+    anterior y la nueva, de modo que las lecturas del dashboard se resuelven con
+    unas pocas búsquedas indexadas en lugar de agregados sobre toda la tabla.
+    """
+
+    PAYMENT_TRACKED_FIELDS = (
+        'client_service_id', 'payment_date', 'amount', 'refunded_amount',
+        'remanente', 'status', 'payment_method',
+    )
+    EXPENSE_TRACKED_FIELDS = ('date', 'amount', 'service_category')
+
+    ZERO = Decimal('0')
+
+    @staticmethod
+    def month_start(value: date) -> date:
+        return value.replace(day=1)
+
+    @staticmethod
+    def next_month(value: date) -> date:
+        return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    @staticmethod
+    def status_bucket(status: str) -> str:
+        buckets = FinancialMonthlyRollup.StatusBucketChoices
+        if status == ServicePayment.StatusChoices.PAID:
+            return buckets.PAID
+        if status == ServicePayment.StatusChoices.REFUNDED:
+            return buckets.REFUNDED
+        return buckets.PENDING
+
+    @classmethod
+    def status_buckets(cls, statuses: Optional[Iterable[str]]):
+        if statuses is None:
+            return None
+        return sorted({cls.status_bucket(status) for status in statuses})
+
+    # ------------------------------------------------------------------
+    # Escritura incremental
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def snapshot(cls, instance, fields) -> Dict[str, Any]:
+        return {field: getattr(instance, field) for field in fields}
+
+    @classmethod
+    def payment_contribution(cls, state, business_line_id, category):
+        if not state or not state.get('payment_date'):
+            return None
+
+        amount = state.get('amount')
+        net_amount = cls.ZERO if amount is None else amount - (state.get('refunded_amount') or cls.ZERO)
+        key = (
+            cls.month_start(state['payment_date']),
+            FinancialMonthlyRollup.SourceChoices.PAYMENT,
+            business_line_id,
+            category,
+            state.get('payment_method') or '',
+            cls.status_bucket(state.get('status')),
+        )
+        return key, (net_amount, state.get('remanente') or cls.ZERO, 0 if amount is None else 1)
+
+    @classmethod
+    def expense_contribution(cls, state):
+        if not state or not state.get('date') or state.get('amount') is None:
+            return None
+
+        key = (
+            cls.month_start(state['date']),
+            FinancialMonthlyRollup.SourceChoices.EXPENSE,
+            None,
+            state.get('service_category') or '',
+            '',
+            '',
+        )
+        return key, (state['amount'], cls.ZERO, 1)
+
+    @classmethod
+    def record_payment_change(cls, payment, previous_state=None):
+        """
+        Aplica al agregado el cambio de un pago. ``previous_state`` es el
+        snapshot tomado al cargar la instancia (``None`` si es nueva).
+        """
+        service = payment.client_service
+        current_state = cls.snapshot(payment, cls.PAYMENT_TRACKED_FIELDS)
+
+        old_contribution = None
+        if previous_state:
+            if previous_state.get('client_service_id') == service.pk:
+                old_line_id, old_category = service.business_line_id, service.category
+            else:
+                old_line_id, old_category = ClientService.objects.filter(
+                    pk=previous_state.get('client_service_id')
+                ).values_list('business_line_id', 'category').first() or (None, None)
+            if old_line_id is not None:
+                old_contribution = cls.payment_contribution(previous_state, old_line_id, old_category)
+
+        new_contribution = cls.payment_contribution(
+            current_state, service.business_line_id, service.category
+        )
+        cls._apply_change(old_contribution, new_contribution)
+        return current_state
+
+    @classmethod
+    def record_payment_changes(cls, payments, previous_states):
+        """
+        Versión por lotes de ``record_payment_change``: agrupa las diferencias por
+        clave del agregado y escribe cada clave una sola vez.
+        """
+        deltas = {}
+        added_keys = set()
+        current_states = []
+
+        for payment, previous_state in zip(payments, previous_states):
+            service = payment.client_service
+            if previous_state and previous_state.get('client_service_id') != service.pk:
+                current_states.append(cls.record_payment_change(payment, previous_state))
+                continue
+
+            current_state = cls.snapshot(payment, cls.PAYMENT_TRACKED_FIELDS)
+            old_contribution = cls.payment_contribution(previous_state, service.business_line_id, service.category)
+            new_contribution = cls.payment_contribution(current_state, service.business_line_id, service.category)
+            if old_contribution:
+                cls._accumulate(deltas, old_contribution[0], *(-value for value in old_contribution[1]))
+            if new_contribution:
+                cls._accumulate(deltas, new_contribution[0], *new_contribution[1])
+                added_keys.add(new_contribution[0])
+            current_states.append(current_state)
+
+        for key, values in deltas.items():
+            cls._apply_delta(key, *values, create=key in added_keys)
+        return current_states
+
+    @classmethod
+    def record_payment_removal(cls, payment, business_line_id, category, state=None):
+        state = state or cls.snapshot(payment, cls.PAYMENT_TRACKED_FIELDS)
+        cls._apply_change(cls.payment_contribution(state, business_line_id, category), None)
+
+    @classmethod
+    def record_expense_change(cls, expense, previous_state=None):
+        current_state = cls.snapshot(expense, cls.EXPENSE_TRACKED_FIELDS)
+        cls._apply_change(
+            cls.expense_contribution(previous_state),
+            cls.expense_contribution(current_state)
+        )
+        return current_state
+
+    @classmethod
+    def record_expense_removal(cls, expense, state=None):
+        state = state or cls.snapshot(expense, cls.EXPENSE_TRACKED_FIELDS)
+        cls._apply_change(cls.expense_contribution(state), None)
+
+    @classmethod
+    def move_service(cls, client_service, old_business_line_id, old_category):
+        """
+        Traslada los agregados de un servicio cuando cambia su línea de negocio
+        o su categoría.
+        """
+        rows = (
+            client_service.payments
+            .filter(payment_date__isnull=False)
+            .values_list(*cls.PAYMENT_TRACKED_FIELDS)
+        )
+        for values in rows.iterator():
+            state = dict(zip(cls.PAYMENT_TRACKED_FIELDS, values))
+            cls._apply_change(
+                cls.payment_contribution(state, old_business_line_id, old_category),
+                cls.payment_contribution(state, client_service.business_line_id, client_service.category)
+            )
+
+    @classmethod
+    def _apply_change(cls, old_contribution, new_contribution):
+        if old_contribution == new_contribution:
+            return
+
+        if old_contribution and new_contribution and old_contribution[0] == new_contribution[0]:
+            key = new_contribution[0]
+            deltas = tuple(new - old for new, old in zip(new_contribution[1], old_contribution[1]))
+            cls._apply_delta(key, *deltas)
+            return
+
+        if old_contribution:
+            # Una retirada nunca crea filas: si la fila ya no existe (p. ej. borrada
+            # en cascada con su línea de negocio) no hay nada que descontar.
+            cls._apply_delta(old_contribution[0], *(-value for value in old_contribution[1]), create=False)
+        if new_contribution:
+            cls._apply_delta(new_contribution[0], *new_contribution[1])
+
+    @classmethod
+    def _apply_delta(cls, key, amount, remanente, entry_count, create=True):
+        if not amount and not remanente and not entry_count:
+            return
+
+        month, source, business_line_id, category, payment_method, payment_status = key
+        lookup = {
+            'month': month,
+            'source': source,
+            'business_line_id': business_line_id,
+            'category': category,
+            'payment_method': payment_method,
+            'payment_status': payment_status,
+        }
+        changes = {
+            'amount': F('amount') + amount,
+            'remanente': F('remanente') + remanente,
+            'entry_count': F('entry_count') + entry_count,
+        }
+
+        if FinancialMonthlyRollup.objects.filter(**lookup).update(**changes) or not create:
+            return
+
+        try:
+            with transaction.atomic():
+                FinancialMonthlyRollup.objects.create(
+                    amount=amount, remanente=remanente, entry_count=entry_count, **lookup
+                )
+        except IntegrityError:
+            FinancialMonthlyRollup.objects.filter(**lookup).update(**changes)
+
+    # ------------------------------------------------------------------
+    # Reconstrucción completa
+    # ------------------------------------------------------------------
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls) -> int:
+        """Regenera la tabla completa a partir de pagos y gastos del tenant."""
+        from apps.expenses.models import Expense
+
+        FinancialMonthlyRollup.objects.all().delete()
+
+        zero = Value(0, output_field=DecimalField())
+        payment_rows = (
+            ServicePayment.objects
+            .filter(payment_date__isnull=False)
+            .annotate(rollup_month=TruncMonth('payment_date'))
+            .values(
+                'rollup_month',
+                'client_service__business_line_id',
+                'client_service__category',
+                'payment_method',
+                'status',
+            )
+            .annotate(
+                total_amount=Coalesce(Sum(F('amount') - Coalesce(F('refunded_amount'), zero)), zero),
+                total_remanente=Coalesce(Sum('remanente'), zero),
+                total_count=Count('amount'),
+            )
+            .order_by()
+        )
+
+        buckets = {}
+        for row in payment_rows:
+            key = (
+                row['rollup_month'],
+                FinancialMonthlyRollup.SourceChoices.PAYMENT,
+                row['client_service__business_line_id'],
+                row['client_service__category'],
+                row['payment_method'] or '',
+                cls.status_bucket(row['status']),
+            )
+            cls._accumulate(buckets, key, row['total_amount'], row['total_remanente'], row['total_count'])
+
+        expense_rows = (
+            Expense.objects
+            .annotate(rollup_month=TruncMonth('date'))
+            .values('rollup_month', 'service_category')
+            .annotate(total_amount=Sum('amount'), total_count=Count('id'))
+            .order_by()
+        )
+        for row in expense_rows:
+            key = (
+                row['rollup_month'],
+                FinancialMonthlyRollup.SourceChoices.EXPENSE,
+                None,
+                row['service_category'] or '',
+                '',
+                '',
+            )
+            cls._accumulate(buckets, key, row['total_amount'], cls.ZERO, row['total_count'])
+
+        FinancialMonthlyRollup.objects.bulk_create(
+            [
+                FinancialMonthlyRollup(
+                    month=key[0],
+                    source=key[1],
+                    business_line_id=key[2],
+                    category=key[3],
+                    payment_method=key[4],
+                    payment_status=key[5],
+                    amount=values[0],
+                    remanente=values[1],
+                    entry_count=values[2],
+                )
+                for key, values in buckets.items()
+            ],
+            batch_size=1000
+        )
+        return len(buckets)
+
+    @staticmethod
+    def _accumulate(buckets, key, amount, remanente, entry_count):
+        current = buckets.get(key, (Decimal('0'), Decimal('0'), 0))
+        buckets[key] = (current[0] + amount, current[1] + remanente, current[2] + entry_count)
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _filtered(
+        cls,
+        source: str,
+        category: Optional[str] = None,
+        business_line_ids: Optional[Iterable[int]] = None,
+        statuses: Optional[Iterable[str]] = None,
+        month_from: Optional[date] = None,
+        month_to: Optional[date] = None,
+    ):
+        queryset = FinancialMonthlyRollup.objects.filter(source=source)
+
+        if category:
+            queryset = queryset.filter(category=category)
+        if business_line_ids is not None:
+            queryset = queryset.filter(business_line_id__in=list(business_line_ids))
+        buckets = cls.status_buckets(statuses)
+        if buckets is not None:
+            queryset = queryset.filter(payment_status__in=buckets)
+        if month_from:
+            queryset = queryset.filter(month__gte=cls.month_start(month_from))
+        if month_to:
+            queryset = queryset.filter(month__lte=cls.month_start(month_to))
+        return queryset
+
+    @classmethod
+    def get_totals(cls, source: str, **filters) -> Dict[str, Any]:
+        totals = cls._filtered(source, **filters).aggregate(
+            amount=Sum('amount'),
+            remanente=Sum('remanente'),
+            entry_count=Sum('entry_count'),
+        )
+        return {
+            'amount': totals['amount'] or cls.ZERO,
+            'remanente': totals['remanente'] or cls.ZERO,
+            'entry_count': totals['entry_count'] or 0,
+        }
+
+    @classmethod
+    def get_monthly_totals(cls, source: str, **filters) -> Dict[str, Dict[str, Any]]:
+        rows = (
+            cls._filtered(source, **filters)
+            .values('month')
+            .annotate(
+                total_amount=Sum('amount'),
+                total_remanente=Sum('remanente'),
+                total_count=Sum('entry_count'),
+            )
+            .order_by('month')
+        )
+        return {
+            row['month'].strftime('%Y-%m'): {
+                'amount': row['total_amount'] or cls.ZERO,
+                'remanente': row['total_remanente'] or cls.ZERO,
+                'entry_count': row['total_count'] or 0,
+            }
+            for row in rows
+        }
+
+    @classmethod
+    def get_range_totals(
+        cls,
+        source: str,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        category: Optional[str] = None,
+        business_line_ids: Optional[Iterable[int]] = None,
+        statuses: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Totales para un rango arbitrario de fechas: los meses completos se leen
+        del agregado y sólo los días de los meses frontera van a las tablas base.
+        """
+        filters = {'category': category, 'business_line_ids': business_line_ids, 'statuses': statuses}
+
+        if start_date is None and end_date is None:
+            return cls.get_totals(source, **filters)
+
+        full_from = None
+        if start_date:
+            full_from = start_date if start_date.day == 1 else cls.next_month(start_date)
+        full_to = None
+        if end_date:
+            end_is_month_end = cls.next_month(end_date) - timedelta(days=1) == end_date
+            full_to = cls.month_start(end_date) if end_is_month_end else cls.month_start(end_date) - timedelta(days=1)
+
+        if full_from and full_to and full_from > full_to:
+            return cls._raw_totals(source, start_date, end_date, **filters)
+
+        totals = cls.get_totals(source, month_from=full_from, month_to=full_to, **filters)
+
+        edges = []
+        if start_date and full_from != start_date:
+            edges.append((start_date, full_from - timedelta(days=1)))
+        if end_date and full_to is not None and cls.next_month(full_to) <= end_date:
+            edges.append((cls.next_month(full_to), end_date))
+
+        for edge_start, edge_end in edges:
+            edge_totals = cls._raw_totals(source, edge_start, edge_end, **filters)
+            for field in totals:
+                totals[field] += edge_totals[field]
+
+        return totals
+
+    @classmethod
+    def _raw_totals(cls, source, start_date, end_date, category=None, business_line_ids=None, statuses=None):
+        if source == FinancialMonthlyRollup.SourceChoices.EXPENSE:
+            from apps.expenses.models import Expense
+
+            queryset = Expense.objects.filter(date__range=[start_date, end_date])
+            if category:
+                queryset = queryset.filter(service_category=category)
+            totals = queryset.aggregate(amount=Sum('amount'), entry_count=Count('id'))
+            return {
+                'amount': totals['amount'] or cls.ZERO,
+                'remanente': cls.ZERO,
+                'entry_count': totals['entry_count'] or 0,
+            }
+
+        queryset = ServicePayment.objects.filter(payment_date__range=[start_date, end_date])
+        if category:
+            queryset = queryset.filter(client_service__category=category)
+        if business_line_ids is not None:
+            queryset = queryset.filter(client_service__business_line_id__in=list(business_line_ids))
+        if statuses is not None:
+            queryset = queryset.filter(cls._status_filter(statuses))
+
+        zero = Value(0, output_field=DecimalField())
+        totals = queryset.aggregate(
+            amount=Sum(F('amount') - Coalesce(F('refunded_amount'), zero)),
+            remanente=Sum('remanente'),
+            entry_count=Count('amount'),
+        )
+        return {
+            'amount': totals['amount'] or cls.ZERO,
+            'remanente': totals['remanente'] or cls.ZERO,
+            'entry_count': totals['entry_count'] or 0,
+        }
+
+    @classmethod
+    def _status_filter(cls, statuses):
+        buckets = set(cls.status_buckets(statuses))
+        settled = [ServicePayment.StatusChoices.PAID, ServicePayment.StatusChoices.REFUNDED]
+        condition = Q(status__in=[status for status in settled if status in buckets])
+        if FinancialMonthlyRollup.StatusBucketChoices.PENDING in buckets:
+            condition |= ~Q(status__in=settled)
+        return condition
@@ -1,11 +1,12 @@
 from datetime import date
 from decimal import Decimal
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.db import models
 
 from ..models import ClientService, ServicePayment
+from apps.core.services.tenant_cache import TenantCache
 
 
 class PaymentService:
@@ -47,6 +48,83 @@ class PaymentService:
         
         return period
     
+    @staticmethod
+    def process_payments_bulk(
+        periods: List[ServicePayment],
+        payment_date: date,
+        payment_method: str,
+        reference_number: str = "",
+        notes: str = "",
+        remanente: Optional[Decimal] = None,
+        amounts: Optional[Dict[int, Decimal]] = None
+    ) -> List[ServicePayment]:
+        """
+        Marca como pagados varios períodos con una única escritura en bloque.
+        
+        `amounts` permite indicar el importe por id de período; por defecto se usa
+        el importe ya registrado en cada período. end_date y el agregado financiero
+        se actualizan una vez al final, no por período.
+        """
+        from django.db import transaction
+        from .financial_rollup_service import FinancialRollupService
+        from .notes_manager import ServiceNotesManager
+        
+        periods = list(periods)
+        if not periods:
+            return []
+        
+        amounts = amounts or {}
+        period_amounts = []
+        for period in periods:
+            if not period.can_be_paid:
+                raise ValidationError(
+                    f"El período {period.period_start} - {period.period_end} con estado "
+                    f"'{period.get_status_display()}' no puede recibir pagos"
+                )
+            amount = amounts.get(period.pk, period.amount)
+            if amount is None:
+                raise ValidationError(
+                    f"No se pudo determinar un importe válido para el período {period.period_start} - {period.period_end}"
+                )
+            period_amounts.append(amount)
+        
+        PaymentService._validate_payment_data(min(period_amounts), payment_date, payment_method)
+        
+        previous_states = [period._get_previous_rollup_state() for period in periods]
+        now = timezone.now()
+        for period, amount in zip(periods, period_amounts):
+            period.amount = amount
+            period.payment_date = payment_date
+            period.payment_method = payment_method
+            period.reference_number = reference_number
+            period.status = ServicePayment.StatusChoices.PAID
+            period.modified = now
+            if remanente is not None:
+                period.remanente = remanente
+            if notes:
+                period.notes = ServiceNotesManager.add_note(period.notes, f"Pago: {notes}")
+        
+        with transaction.atomic():
+            ServicePayment.objects.bulk_update(
+                periods,
+                fields=[
+                    'amount', 'payment_date', 'payment_method', 'reference_number',
+                    'status', 'remanente', 'notes', 'modified'
+                ]
+            )
+            
+            # Un período por servicio basta para sincronizar su end_date
+            for period in {period.client_service_id: period for period in periods}.values():
+                period._update_service_end_date()
+            
+            current_states = FinancialRollupService.record_payment_changes(periods, previous_states)
+            # bulk_update() no dispara post_save
+            TenantCache.invalidate(TenantCache.REVENUE)
+            for period, state in zip(periods, current_states):
+                period._rollup_state = state
+        
+        return periods
+    
     @staticmethod
     def create_payment_with_period(
         client_service: ClientService,
@@ -238,6 +316,23 @@ class PaymentService:
             'average_amount': total_amount / total_payments if total_payments > 0 else Decimal('0'),
         }
     
+    @staticmethod
+    def calculate_revenue_totals_by_business_line(payments_queryset) -> Dict[int, Tuple[Decimal, int]]:
+        """Importe neto y número de pagos cobrados por línea de negocio, en una sola consulta."""
+        from django.db.models import Sum, Count, F, Q
+        
+        rows = payments_queryset.filter(amount__isnull=False).order_by().values(
+            'client_service__business_line_id'
+        ).annotate(
+            total_amount=Sum(F('amount') - F('refunded_amount')),
+            total_payments=Count('id', filter=Q(status=ServicePayment.StatusChoices.PAID)),
+        )
+        
+        return {
+            row['client_service__business_line_id']: (row['total_amount'] or Decimal('0'), row['total_payments'] or 0)
+            for row in rows
+        }
+    
     @staticmethod
     def update_payment(
         payment: ServicePayment,
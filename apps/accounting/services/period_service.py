@@ -114,6 +114,39 @@ class ServicePeriodManager:
             'latest_end': pending_periods.last().period_end if pending_periods else None
         }
     
+    @staticmethod
+    def refresh_period_statuses(today: Optional[date] = None, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Recalcula en bloque el estado de los períodos no pagados según la fecha actual.
+        
+        Aplica las mismas reglas que ServicePayment.get_appropriate_status() con un
+        UPDATE por estado destino. Devuelve cuántos períodos pasan a cada estado.
+        """
+        from django.db import transaction
+        
+        today = today or timezone.now().date()
+        statuses = ServicePayment.StatusChoices
+        unpaid = ServicePayment.objects.filter(
+            status__in=[statuses.AWAITING_START, statuses.UNPAID_ACTIVE, statuses.OVERDUE]
+        )
+        transitions = {
+            statuses.AWAITING_START: unpaid.filter(period_start__gt=today),
+            statuses.UNPAID_ACTIVE: unpaid.filter(period_start__lte=today, period_end__gte=today),
+            statuses.OVERDUE: unpaid.filter(period_end__lt=today),
+        }
+        
+        counts = {}
+        now = timezone.now()
+        with transaction.atomic():
+            for target_status, queryset in transitions.items():
+                # Estos cambios no alteran el agregado financiero: todos son "sin liquidar"
+                stale = queryset.exclude(status=target_status)
+                counts[target_status] = stale.count() if dry_run else stale.update(
+                    status=target_status, modified=now
+                )
+        
+        return counts
+    
     @staticmethod
     def _calculate_end_date(start_date: date, months: int) -> date:
         return start_date + timedelta(days=months * 30 - 1)
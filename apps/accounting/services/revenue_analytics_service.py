@@ -5,10 +5,11 @@ from django.db.models import Sum, Count, Avg, Q
 from django.utils import timezone
 from calendar import month_name
 
-from apps.accounting.models import ServicePayment, ClientService
+from apps.accounting.models import ServicePayment, ClientService, FinancialMonthlyRollup
 from apps.expenses.models import Expense
 from apps.business_lines.models import BusinessLine
 from .revenue_calculation_utils import RevenueCalculationMixin
+from .financial_rollup_service import FinancialRollupService
 
 
 class RevenueAnalyticsService(RevenueCalculationMixin):
@@ -31,17 +32,41 @@ class RevenueAnalyticsService(RevenueCalculationMixin):
         """Obtiene datos financieros temporales para dashboard"""
         end_date = self.today
         start_date = end_date - timedelta(days=30 * months)
+        current_month_start = end_date.replace(day=1)
+        
+        paid_statuses = [ServicePayment.StatusChoices.PAID]
+        revenue_by_month = FinancialRollupService.get_monthly_totals(
+            FinancialMonthlyRollup.SourceChoices.PAYMENT,
+            statuses=paid_statuses,
+            month_from=start_date,
+            month_to=current_month_start - timedelta(days=1),
+        )
+        expenses_by_month = FinancialRollupService.get_monthly_totals(
+            FinancialMonthlyRollup.SourceChoices.EXPENSE,
+            month_from=start_date,
+            month_to=current_month_start - timedelta(days=1),
+        )
+        # El mes en curso se corta en la fecha de hoy, igual que el resto de la vista
+        current_key = current_month_start.strftime('%Y-%m')
+        revenue_by_month[current_key] = FinancialRollupService.get_range_totals(
+            FinancialMonthlyRollup.SourceChoices.PAYMENT, current_month_start, end_date, statuses=paid_statuses
+        )
+        expenses_by_month[current_key] = FinancialRollupService.get_range_totals(
+            FinancialMonthlyRollup.SourceChoices.EXPENSE, current_month_start, end_date
+        )
         
         monthly_data = []
         current_date = start_date.replace(day=1)
         
         while current_date <= end_date:
             next_month = (current_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-            month_end = min(next_month - timedelta(days=1), end_date)
+            month_key = current_date.strftime('%Y-%m')
             
-            month_stats = self._get_month_financial_data(current_date, month_end)
+            month_stats = self._build_month_financial_data(
+                revenue_by_month.get(month_key), expenses_by_month.get(month_key)
+            )
             monthly_data.append({
-                'period': current_date.strftime('%Y-%m'),
+                'period': month_key,
                 'month_name': month_name[current_date.month],
                 'year': current_date.year,
                 **month_stats
@@ -175,27 +200,23 @@ class RevenueAnalyticsService(RevenueCalculationMixin):
 
     def _get_month_financial_data(self, start_date: date, end_date: date) -> Dict[str, Any]:
         """Datos financieros para un mes específico"""
-        payments = ServicePayment.objects.filter(
-            payment_date__range=[start_date, end_date],
-            status=ServicePayment.StatusChoices.PAID
-        )
-        
-        expenses = Expense.objects.filter(
-            date__range=[start_date, end_date]
+        revenue = FinancialRollupService.get_range_totals(
+            FinancialMonthlyRollup.SourceChoices.PAYMENT,
+            start_date,
+            end_date,
+            statuses=[ServicePayment.StatusChoices.PAID]
         )
-        
-        revenue_stats = payments.aggregate(
-            total_revenue=self.get_net_revenue_aggregation(),
-            payment_count=Count('id')
-        )
-        
-        expense_stats = expenses.aggregate(
-            total_expenses=Sum('amount'),
-            expense_count=Count('id')
+        expenses = FinancialRollupService.get_range_totals(
+            FinancialMonthlyRollup.SourceChoices.EXPENSE, start_date, end_date
         )
+        return self._build_month_financial_data(revenue, expenses)
+
+    def _build_month_financial_data(self, revenue: Optional[Dict], expenses: Optional[Dict]) -> Dict[str, Any]:
+        revenue = revenue or {}
+        expenses = expenses or {}
         
-        total_revenue = revenue_stats['total_revenue'] or Decimal('0')
-        total_expenses = expense_stats['total_expenses'] or Decimal('0')
+        total_revenue = revenue.get('amount') or Decimal('0')
+        total_expenses = expenses.get('amount') or Decimal('0')
         profit = total_revenue - total_expenses
         
         profit_margin = (profit / total_revenue * 100) if total_revenue > 0 else Decimal('0')
@@ -205,8 +226,8 @@ class RevenueAnalyticsService(RevenueCalculationMixin):
             'expenses': total_expenses,
             'profit': profit,
             'profit_margin': round(profit_margin, 2),
-            'payment_count': revenue_stats['payment_count'] or 0,
-            'expense_count': expense_stats['expense_count'] or 0
+            'payment_count': revenue.get('entry_count') or 0,
+            'expense_count': expenses.get('entry_count') or 0
         }
 
     def _calculate_temporal_summary(self, monthly_data: List[Dict]) -> Dict[str, Any]:
@@ -263,11 +284,7 @@ class RevenueAnalyticsService(RevenueCalculationMixin):
         end_date: Optional[date] = None
     ) -> Dict[str, Any]:
         
-        # Obtener IDs de la línea y todos sus descendientes
-        line_descendant_ids = business_line.get_descendant_ids()
-        
-        services_query = ClientService.objects.filter(
-            business_line__id__in=line_descendant_ids,
+        services_query = ClientService.objects.in_business_line_tree(business_line).filter(
             is_active=True
         )
         
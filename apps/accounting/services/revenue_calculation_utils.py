@@ -6,7 +6,11 @@ from django.db.models.functions import Coalesce
 class RevenueCalculationMixin:
     @staticmethod
     def get_net_amount_expression():
-        return F('amount') - Coalesce(F('refunded_amount'), Value(0, output_field=DecimalField()))
+        return RevenueCalculationMixin.get_net_amount_expression_for('')
+    
+    @staticmethod
+    def get_net_amount_expression_for(prefix):
+        return F(f'{prefix}amount') - Coalesce(F(f'{prefix}refunded_amount'), Value(0, output_field=DecimalField()))
     
     @staticmethod
     def get_net_revenue_aggregation():
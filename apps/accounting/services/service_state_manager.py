@@ -3,6 +3,7 @@ from datetime import date, timedelta
 from django.utils import timezone
 from ..models import ClientService, ServicePayment
 from .date_calculator import DateCalculator
+from apps.core.services.tenant_cache import TenantCache
 
 
 class ServiceStateManager:
@@ -10,11 +11,16 @@ class ServiceStateManager:
     RENEWAL_WARNING_DAYS = 15
     EXPIRING_SOON_DAYS = 7
     
+    @classmethod
+    def has_status_annotations(cls, service) -> bool:
+        return hasattr(service, 'resolved_status')
+    
     @classmethod
     def is_service_active(cls, service) -> bool:
-        cls._auto_deactivate_if_scheduled(service)
+        if cls.has_status_annotations(service):
+            return service.resolved_status not in ('inactive', 'suspended', 'expired')
         
-        if not service.is_active:
+        if cls._is_effectively_inactive(service):
             return False
         
         if service.admin_status == 'SUSPENDED':
@@ -28,9 +34,13 @@ class ServiceStateManager:
     
     @classmethod
     def is_service_expired(cls, service: ClientService) -> bool:
-        cls._auto_deactivate_if_scheduled(service)
+        if cls.has_status_annotations(service):
+            return (
+                service.resolved_status == 'inactive'
+                or DateCalculator.is_date_in_past(service.last_period_end)
+            )
         
-        if not service.is_active:
+        if cls._is_effectively_inactive(service):
             return True
         
         last_period = cls._get_last_period(service)
@@ -41,26 +51,24 @@ class ServiceStateManager:
     
     @classmethod
     def days_until_expiry(cls, service: ClientService) -> int:
-        last_period = cls._get_last_period(service)
-        if last_period:
-            return DateCalculator.days_between(DateCalculator.get_today(), last_period.period_end)
+        last_period_end = cls._get_last_period_end(service)
+        if last_period_end:
+            return DateCalculator.days_between(DateCalculator.get_today(), last_period_end)
         
         return 0
     
     @classmethod
     def get_service_status(cls, service) -> str:
-        cls._auto_deactivate_if_scheduled(service)
+        if cls.has_status_annotations(service):
+            return service.resolved_status
         
-        if not service.is_active:
+        if cls._is_effectively_inactive(service):
             return 'inactive'
         
         if service.admin_status == 'SUSPENDED':
             return 'suspended'
         
         last_period = cls._get_last_period(service)
-        has_pending_periods = service.payments.filter(
-            status__in=['AWAITING_START', 'UNPAID_ACTIVE']
-        ).exists()
         
         if not last_period:
             return 'no_periods'
@@ -80,6 +88,13 @@ class ServiceStateManager:
     def _get_last_period(cls, service: ClientService) -> Optional[ServicePayment]:
         return service.payments.order_by('-period_end').first()
     
+    @classmethod
+    def _get_last_period_end(cls, service: ClientService) -> Optional[date]:
+        if cls.has_status_annotations(service):
+            return service.last_period_end
+        last_period = cls._get_last_period(service)
+        return last_period.period_end if last_period else None
+    
     @classmethod
     def get_status_display_data(cls, service: ClientService) -> Dict[str, Any]:
         from .status_display_service import StatusDisplayService
@@ -150,23 +165,52 @@ class ServiceStateManager:
     
     @classmethod
     def needs_renewal(cls, service: ClientService) -> bool:
-        if not service.is_active:
+        if cls.has_status_annotations(service):
+            return service.resolved_status in ['renewal_pending', 'expiring_soon', 'expired']
+        
+        if cls._is_effectively_inactive(service):
             return False
         
         status = cls.get_service_status(service)
         return status in ['renewal_pending', 'expiring_soon', 'expired']
     
     @classmethod
-    def _auto_deactivate_if_scheduled(cls, service):
-        from django.db import transaction
+    def _is_effectively_inactive(cls, service) -> bool:
+        # El servicio se considera inactivo al día siguiente de su fecha de finalización,
+        # aunque el proceso programado aún no haya actualizado is_active
+        if not service.is_active:
+            return True
+        return bool(service.end_date) and service.end_date < DateCalculator.get_today()
+    
+    @classmethod
+    def deactivate_expired_services(cls, dry_run: bool = False) -> int:
+        """
+        Desactiva en bloque los servicios cuya fecha de finalización ya ha pasado.
         
-        if service.is_active and service.end_date:
-            today = DateCalculator.get_today()
-            # El servicio se desactiva al día siguiente de su fecha de finalización
-            if service.end_date < today:
-                with transaction.atomic():
-                    service.is_active = False
-                    service.save(update_fields=['is_active', 'modified'])
+        Se ejecuta desde el comando `deactivate_expired_services` dentro del
+        esquema de cada tenant; las lecturas de estado no escriben nunca.
+        """
+        from django.db import transaction
+        from apps.business_lines.models import BusinessLine
+        
+        expired = ClientService.objects.filter(
+            is_active=True,
+            end_date__lt=DateCalculator.get_today()
+        )
+        if dry_run:
+            return expired.count()
+        
+        with transaction.atomic():
+            line_ids = set(expired.values_list('business_line_id', flat=True))
+            updated = expired.update(is_active=False, modified=timezone.now())
+            if updated:
+                TenantCache.invalidate(TenantCache.REVENUE)
+            
+            # update() no dispara save(): se recalcula una vez cada línea afectada
+            for business_line in BusinessLine.objects.filter(id__in=line_ids):
+                business_line.update_active_status()
+        
+        return updated
     
     @classmethod
     def get_service_detailed_info(cls, service: ClientService) -> Dict[str, Any]:
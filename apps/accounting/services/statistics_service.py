@@ -7,44 +7,22 @@ from apps.business_lines.models import BusinessLine
 from apps.accounting.models import ClientService, ServicePayment
 from apps.core.constants import SERVICE_CATEGORIES
 from .revenue_calculation_utils import RevenueCalculationMixin, RevenueCalculationUtils
+from .business_line_tree_stats import BusinessLineTreeStats
 
 
 class StatisticsService(RevenueCalculationMixin):
-    def calculate_business_line_stats(self, business_line, include_children=True):
-        services_query = self._get_services_for_line(business_line, include_children)
-        
-        paid_payments = ServicePayment.objects.filter(
-            client_service__in=services_query,
-            status=ServicePayment.StatusChoices.PAID
+    def calculate_business_line_stats(self, business_line, include_children=True, tree_stats=None):
+        tree_stats = tree_stats or BusinessLineTreeStats(
+            statuses=[ServicePayment.StatusChoices.PAID],
+            active_services_only=True,
+            active_lines_only=True,
+            include_clients=True
         )
-        
-        stats = paid_payments.aggregate(
-            total_revenue=self.get_net_revenue_aggregation(),
-            total_payments=Count('id')
-        )
-        
-        service_stats = services_query.aggregate(
-            total_services=Count('id'),
-            personal_services=Count('id', filter=Q(category=SERVICE_CATEGORIES['PERSONAL'])),
-            business_services=Count('id', filter=Q(category=SERVICE_CATEGORIES['BUSINESS'])),
-            unique_clients=Count('client', distinct=True)
+        stats = tree_stats.get_stats(business_line.id, include_children)
+        stats['avg_price'] = (
+            stats['total_revenue'] / stats['payment_count'] if stats['payment_count'] else Decimal('0')
         )
-        
-        category_revenue = {
-            'personal_revenue': paid_payments.filter(
-                client_service__category=SERVICE_CATEGORIES['PERSONAL']
-            ).aggregate(total=self.get_net_revenue_aggregation())['total'] or Decimal('0'),
-            'business_revenue': paid_payments.filter(
-                client_service__category=SERVICE_CATEGORIES['BUSINESS']
-            ).aggregate(total=self.get_net_revenue_aggregation())['total'] or Decimal('0')
-        }
-        
-        total_remanentes = self._calculate_remanente_totals(
-            services_query.filter(category=SERVICE_CATEGORIES['BUSINESS'])
-        )
-        
-        combined_stats = {**stats, **service_stats, **category_revenue}
-        return self._normalize_stats(combined_stats, total_remanentes)
+        return self._normalize_stats(stats, stats['total_remanentes'])
     
     def get_revenue_summary_by_period(self, business_lines, year=None, month=None):
         services_query = ClientService.objects.filter(
@@ -234,10 +212,8 @@ class StatisticsService(RevenueCalculationMixin):
 
     def _get_services_for_line(self, business_line, include_children):
         if include_children:
-            line_ids = [business_line.id]
-            self._collect_descendant_ids(business_line, line_ids)
             return ClientService.objects.filter(
-                business_line_id__in=line_ids,
+                self._active_subtree_q(business_line),
                 is_active=True
             )
         else:
@@ -246,10 +222,9 @@ class StatisticsService(RevenueCalculationMixin):
                 is_active=True
             )
     
-    def _collect_descendant_ids(self, business_line, id_list):
-        for child in business_line.children.filter(is_active=True):
-            id_list.append(child.id)
-            self._collect_descendant_ids(child, id_list)
+    def _active_subtree_q(self, business_line):
+        # Sólo se recorren sublíneas activas; la propia línea se incluye siempre
+        return business_line.get_active_subtree_q('business_line__')
     
     def _calculate_remanente_totals(self, services_query):
         total = ServicePayment.objects.filter(
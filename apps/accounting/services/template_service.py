@@ -138,10 +138,7 @@ class BusinessLineStatsService(RevenueCalculationMixin):
         }
     
     def calculate_business_line_metrics(self, business_line: BusinessLine) -> Dict[str, Any]:
-        descendant_ids = business_line.get_descendant_ids()
-        services = ClientService.objects.filter(
-            business_line__id__in=descendant_ids
-        )
+        services = ClientService.objects.in_business_line_tree(business_line)
         
         basic_stats = ServicePayment.objects.filter(
             client_service__in=services
@@ -1,5 +1,45 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+
+def remove_payment_from_rollup(sender, instance, **kwargs):
+    from apps.accounting.models import ClientService
+    from apps.accounting.services.financial_rollup_service import FinancialRollupService
+    
+    if not instance.payment_date:
+        return
+    
+    service_key = ClientService.objects.filter(
+        pk=instance.client_service_id
+    ).values_list('business_line_id', 'category').first()
+    if service_key:
+        FinancialRollupService.record_payment_removal(
+            instance, *service_key, state=getattr(instance, '_rollup_state', None)
+        )
+
+
+def invalidate_revenue_cache(sender, **kwargs):
+    from apps.core.services.tenant_cache import TenantCache
+    TenantCache.invalidate(TenantCache.REVENUE)
+
+
 def register_signals():
-    pass
+    from apps.accounting.models import ClientService, ServicePayment
+    
+    post_delete.connect(
+        remove_payment_from_rollup,
+        sender=ServicePayment,
+        dispatch_uid='accounting_remove_payment_from_rollup'
+    )
+    
+    for model in (ServicePayment, ClientService):
+        post_save.connect(
+            invalidate_revenue_cache,
+            sender=model,
+            dispatch_uid=f'accounting_invalidate_revenue_cache_on_save_{model.__name__}'
+        )
+        post_delete.connect(
+            invalidate_revenue_cache,
+            sender=model,
+            dispatch_uid=f'accounting_invalidate_revenue_cache_on_delete_{model.__name__}'
+        )
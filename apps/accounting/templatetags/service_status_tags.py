@@ -198,11 +198,13 @@ def service_operational_status_badge(service):
 def service_payment_status_badge(service):
     from ..services.status_display_service import StatusDisplayService
     
-    latest_payment = service.payments.order_by('-created').first()
-    if not latest_payment:
-        status_data = StatusDisplayService.get_payment_status_display('AWAITING_START')
+    if ServiceStateManager.has_status_annotations(service):
+        latest_status = service.latest_payment_status
     else:
-        status_data = StatusDisplayService.get_payment_status_display(latest_payment.status)
+        latest_payment = service.payments.order_by('-created').first()
+        latest_status = latest_payment.status if latest_payment else None
+    
+    status_data = StatusDisplayService.get_payment_status_display(latest_status or 'AWAITING_START')
     
     return mark_safe(
         f'<span class="inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium {status_data["class"]}">'
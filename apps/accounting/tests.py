@@ -1,10 +1,23 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.test import Client
 from django.urls import reverse
+from django_tenants.test.cases import TenantTestCase
 from apps.business_lines.models import BusinessLine
-from apps.accounting.models import Client as AccountingClient, ClientService
+from apps.accounting.models import (
+    Client as AccountingClient, ClientService, FinancialMonthlyRollup, ServicePayment
+)
+from apps.accounting.services.financial_rollup_service import FinancialRollupService
 from apps.accounting.services.business_line_navigator import BusinessLineNavigator
+from apps.accounting.views.revenue_summary import (
+    _build_revenue_summary, calculate_revenue_stats_filtered, get_all_descendant_lines
+)
+from apps.core.testing import QueryBudgetTestMixin
+from apps.expenses.models import Expense, ExpenseCategory
 
 User = get_user_model()
 
@@ -225,3 +238,293 @@ def validate_phase_2():
     except Exception as e:
         print(f"❌ Validation error: {e}")
         return False
+
+
+class ActiveSubtreeTestCase(TenantTestCase):
+    
+    def setUp(self):
+        self.root = BusinessLine.objects.create(name='Root', slug='root', is_active=True)
+        self.inactive_child = BusinessLine.objects.create(
+            name='Inactive', slug='inactive', parent=self.root, is_active=False
+        )
+        self.hidden_grandchild = BusinessLine.objects.create(
+            name='Hidden', slug='hidden', parent=self.inactive_child, is_active=True
+        )
+        self.active_child = BusinessLine.objects.create(
+            name='Active', slug='active', parent=self.root, is_active=True
+        )
+    
+    def test_descent_stops_at_inactive_children(self):
+        lines = get_all_descendant_lines(self.root)
+        self.assertEqual(lines[0], self.root)
+        self.assertEqual(set(lines), {self.root, self.active_child})
+    
+    def test_inactive_line_still_includes_itself_and_its_active_children(self):
+        lines = get_all_descendant_lines(self.inactive_child)
+        self.assertEqual(set(lines), {self.inactive_child, self.hidden_grandchild})
+    
+    def test_line_without_path_only_matches_itself(self):
+        BusinessLine.objects.filter(pk=self.inactive_child.pk).update(path='')
+        self.inactive_child.refresh_from_db()
+        self.assertEqual(list(self.inactive_child.get_descendants()), [self.inactive_child])
+
+
+class RevenueSummaryQueryBudgetTestCase(QueryBudgetTestMixin, TenantTestCase):
+    
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Revenue Test'
+        tenant.email = 'revenue@test.com'
+    
+    def setUp(self):
+        self.category = ClientService.CategoryChoices.PERSONAL
+        self.root = BusinessLine.objects.create(name='Consulta', slug='consulta', is_active=True)
+        self.client_record = AccountingClient.objects.create(
+            full_name='Cliente Ingresos',
+            dni='00000001X',
+            gender='F'
+        )
+    
+    def _add_line(self, index, parent, is_active=True):
+        line = BusinessLine.objects.create(
+            name=f'Línea {index}',
+            slug=f'linea-{index}',
+            parent=parent,
+            is_active=is_active
+        )
+        service = ClientService.objects.create(
+            client=self.client_record,
+            business_line=line,
+            category=self.category,
+            price=Decimal('50.00'),
+            start_date=date(2024, 1, 1)
+        )
+        ServicePayment.objects.create(
+            client_service=service,
+            amount=Decimal('50.00'),
+            payment_date=date(2024, 1, 10),
+            period_start=date(2024, 1, 1),
+            period_end=date(2024, 1, 31),
+            status=ServicePayment.StatusChoices.PAID,
+            payment_method=ServicePayment.PaymentMethodChoices.CARD
+        )
+        return line
+    
+    def _summary(self):
+        return _build_revenue_summary(self.category, '', None, None, None, None, None)
+    
+    def test_query_count_does_not_grow_with_lines(self):
+        for index in range(2):
+            self._add_line(index, self.root)
+        with self.assertQueryBudget(2, max_repeats=1):
+            self._summary()
+        
+        for index in range(2, 10):
+            self._add_line(index, self.root)
+        with self.assertQueryBudget(2, max_repeats=1):
+            lines_data, total_summary = self._summary()
+        
+        [root_data] = lines_data
+        self.assertEqual(len(root_data['children']), 10)
+        self.assertEqual(total_summary['total_payments'], 10)
+    
+    def test_stats_match_per_line_calculation(self):
+        child = self._add_line(0, self.root)
+        self._add_line(1, child)
+        inactive = self._add_line(2, self.root, is_active=False)
+        self._add_line(3, inactive)
+        
+        lines_data, _ = self._summary()
+        
+        def walk(items):
+            for item in items:
+                yield item
+                yield from walk(item['children'])
+        
+        for line_data in walk(lines_data):
+            expected = calculate_revenue_stats_filtered(business_line=line_data['line'], category=self.category)
+            self.assertEqual(line_data['stats'], expected)
+        
+        # La línea inactiva y su hija activa quedan fuera del total de la raíz
+        [root_data] = lines_data
+        self.assertEqual(root_data['stats']['total_payments'], 2)
+
+
+class FinancialRollupConsistencyTestCase(TenantTestCase):
+    """El agregado incremental debe coincidir siempre con un cálculo desde cero."""
+    
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Rollup Test'
+        tenant.email = 'rollup@test.com'
+    
+    def setUp(self):
+        self.line_a = BusinessLine.objects.create(name='Consulta', slug='consulta', is_active=True)
+        self.line_b = BusinessLine.objects.create(name='Empresas', slug='empresas', is_active=True)
+        client = AccountingClient.objects.create(full_name='Cliente Agregados', dni='00000002X', gender='F')
+        self.personal_service = ClientService.objects.create(
+            client=client,
+            business_line=self.line_a,
+            category=ClientService.CategoryChoices.PERSONAL,
+            price=Decimal('100.00'),
+            start_date=date(2024, 1, 1)
+        )
+        self.business_service = ClientService.objects.create(
+            client=client,
+            business_line=self.line_b,
+            category=ClientService.CategoryChoices.BUSINESS,
+            price=Decimal('80.00'),
+            start_date=date(2024, 1, 1)
+        )
+        self.expense_category = ExpenseCategory.objects.create(
+            name='Alquiler',
+            category_type=ExpenseCategory.CategoryTypeChoices.FIXED
+        )
+    
+    def _add_payment(self, service, amount, payment_date, **kwargs):
+        return ServicePayment.objects.create(
+            client_service=service,
+            amount=amount,
+            payment_date=payment_date,
+            period_start=payment_date.replace(day=1),
+            period_end=payment_date.replace(day=28),
+            status=kwargs.pop('status', ServicePayment.StatusChoices.PAID),
+            payment_method=kwargs.pop('payment_method', ServicePayment.PaymentMethodChoices.CARD),
+            **kwargs
+        )
+    
+    def _add_expense(self, amount, expense_date):
+        return Expense.objects.create(
+            category=self.expense_category,
+            amount=amount,
+            date=expense_date,
+            description='Gasto'
+        )
+    
+    @staticmethod
+    def _rollup_rows():
+        rows = {}
+        for row in FinancialMonthlyRollup.objects.all():
+            if not row.amount and not row.remanente and not row.entry_count:
+                continue
+            key = (
+                row.month, row.source, row.business_line_id, row.category,
+                row.payment_method, row.payment_status
+            )
+            rows[key] = (row.amount, row.remanente, row.entry_count)
+        return rows
+    
+    @staticmethod
+    def _expected_rows():
+        buckets = FinancialMonthlyRollup.StatusBucketChoices
+        status_buckets = {
+            ServicePayment.StatusChoices.PAID: buckets.PAID,
+            ServicePayment.StatusChoices.REFUNDED: buckets.REFUNDED,
+        }
+        rows = {}
+        
+        def add(key, amount, remanente, entry_count):
+            current = rows.get(key, (Decimal('0'), Decimal('0'), 0))
+            rows[key] = (current[0] + amount, current[1] + remanente, current[2] + entry_count)
+        
+        payments = ServicePayment.objects.filter(payment_date__isnull=False).select_related('client_service')
+        for payment in payments:
+            add(
+                (
+                    payment.payment_date.replace(day=1),
+                    FinancialMonthlyRollup.SourceChoices.PAYMENT,
+                    payment.client_service.business_line_id,
+                    payment.client_service.category,
+                    payment.payment_method or '',
+                    status_buckets.get(payment.status, buckets.PENDING),
+                ),
+                payment.net_amount or Decimal('0'),
+                payment.remanente or Decimal('0'),
+                0 if payment.amount is None else 1
+            )
+        for expense in Expense.objects.all():
+            add(
+                (expense.date.replace(day=1), FinancialMonthlyRollup.SourceChoices.EXPENSE, None,
+                 expense.service_category, '', ''),
+                expense.amount, Decimal('0'), 1
+            )
+        return {key: values for key, values in rows.items() if any(values)}
+    
+    def assertRollupConsistent(self):
+        expected = self._expected_rows()
+        self.assertEqual(self._rollup_rows(), expected)
+        
+        # La reconstrucción completa debe dar lo mismo; se deshace para seguir
+        # comprobando el mantenimiento incremental en los pasos siguientes
+        with transaction.atomic():
+            FinancialRollupService.rebuild()
+            self.assertEqual(self._rollup_rows(), expected)
+            transaction.set_rollback(True)
+    
+    def test_rollup_tracks_creation_edits_and_refunds(self):
+        payment = self._add_payment(self.personal_service, Decimal('100.00'), date(2024, 1, 10))
+        business_payment = self._add_payment(
+            self.business_service, Decimal('80.00'), date(2024, 2, 5), remanente=Decimal('-10.00')
+        )
+        self._add_payment(
+            self.personal_service, Decimal('60.00'), date(2024, 2, 20),
+            status=ServicePayment.StatusChoices.OVERDUE
+        )
+        self._add_expense(Decimal('200.00'), date(2024, 1, 15))
+        self.assertRollupConsistent()
+        
+        # Edición de una instancia en memoria y de otra recién cargada de la BD
+        payment.amount = Decimal('120.00')
+        payment.payment_method = ServicePayment.PaymentMethodChoices.CASH
+        payment.save()
+        loaded = ServicePayment.objects.get(pk=business_payment.pk)
+        loaded.remanente = Decimal('15.00')
+        loaded.save()
+        self.assertRollupConsistent()
+        
+        ServicePayment.objects.get(pk=payment.pk).refund(Decimal('20.00'))
+        self.assertRollupConsistent()
+        
+        ServicePayment.objects.get(pk=business_payment.pk).refund()
+        self.assertRollupConsistent()
+    
+    def test_rollup_tracks_moves_between_months_and_business_lines(self):
+        payment = self._add_payment(self.personal_service, Decimal('100.00'), date(2024, 1, 10))
+        other_payment = self._add_payment(self.business_service, Decimal('80.00'), date(2024, 1, 12))
+        expense = self._add_expense(Decimal('200.00'), date(2024, 1, 15))
+        self.assertRollupConsistent()
+        
+        payment.payment_date = date(2024, 3, 1)
+        payment.save()
+        self.assertRollupConsistent()
+        
+        moved = ServicePayment.objects.get(pk=other_payment.pk)
+        moved.client_service = self.personal_service
+        moved.save()
+        self.assertRollupConsistent()
+        
+        service = ClientService.objects.get(pk=self.personal_service.pk)
+        service.business_line = self.line_b
+        service.save()
+        self.assertRollupConsistent()
+        
+        expense = Expense.objects.get(pk=expense.pk)
+        expense.date = date(2024, 3, 20)
+        expense.service_category = Expense.ServiceCategoryChoices.PERSONAL
+        expense.save()
+        self.assertRollupConsistent()
+    
+    def test_rollup_tracks_deletions(self):
+        payment = self._add_payment(self.personal_service, Decimal('100.00'), date(2024, 1, 10))
+        self._add_payment(self.business_service, Decimal('80.00'), date(2024, 1, 12))
+        first_expense = self._add_expense(Decimal('200.00'), date(2024, 1, 15))
+        self._add_expense(Decimal('50.00'), date(2024, 1, 20))
+        self.assertRollupConsistent()
+        
+        ServicePayment.objects.get(pk=payment.pk).delete()
+        first_expense.delete()
+        self.assertRollupConsistent()
+        
+        # Los pagos borrados en cascada con su servicio también se descuentan
+        ClientService.objects.get(pk=self.business_service.pk).delete()
+        self.assertRollupConsistent()
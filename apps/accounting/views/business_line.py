@@ -12,7 +12,7 @@ from apps.accounting.models import ClientService
 from apps.accounting.services.template_service import TemplateDataService
 from apps.accounting.services.presentation_service import PresentationService
 from apps.accounting.services.business_line_service import BusinessLineService
-from apps.accounting.services.business_line_stats_calculator import BusinessLineStatsCalculator
+from apps.accounting.services.business_line_tree_stats import BusinessLineTreeStats
 from apps.core.mixins import (
     BusinessLinePermissionMixin,
     BusinessLineHierarchyMixin
@@ -150,10 +150,10 @@ class BusinessLineHierarchyView(
                 elif status_filter == 'inactive':
                     accessible_children = accessible_children.filter(is_active=False)
                 
-                if not accessible_children.exists():
-                    current_line_descendant_ids = current_line.get_descendant_ids()
-                    BusinessLineStatsCalculator.enrich_business_line_with_stats(current_line)
-                    
+                tree_stats = BusinessLineTreeStats()
+                tree_stats.enrich(current_line)
+                
+                if not accessible_children:
                     context.update({
                         'current_line': current_line,
                         'children': [current_line],
@@ -174,10 +174,7 @@ class BusinessLineHierarchyView(
                         }
                     })
                 else:
-                    BusinessLineStatsCalculator.enrich_business_line_with_stats(current_line)
-                    
-                    for child in accessible_children:
-                        BusinessLineStatsCalculator.enrich_business_line_with_stats(child)
+                    tree_stats.enrich_many(accessible_children)
                     
                     context.update({
                         'current_line': current_line,
@@ -212,7 +209,7 @@ class BusinessLineHierarchyView(
             else:
                 total_lines = accessible_lines.count()
             
-            BusinessLineStatsCalculator.enrich_business_lines_with_stats(root_lines)
+            BusinessLineTreeStats().enrich_many(root_lines)
             
             personal_revenue = sum(line.personal_revenue for line in root_lines)
             business_revenue = sum(line.business_revenue for line in root_lines)
@@ -7,6 +7,7 @@ from django.shortcuts import get_object_or_404
 from django.http import Http404
 
 from apps.business_lines.models import BusinessLine
+from apps.accounting.models import ClientService
 from apps.business_lines.forms import BusinessLineCreateForm, BusinessLineUpdateForm
 from ..mixins import BusinessLinePathMixin, BusinessLineParentMixin
 
@@ -122,16 +123,10 @@ class BusinessLineDeleteView(
         return context
     
     def _count_total_descendants(self, business_line):
-        count = business_line.children.count()
-        for child in business_line.children.all():
-            count += self._count_total_descendants(child)
-        return count
+        return business_line.get_descendants(include_self=False).count()
     
     def _count_total_services(self, business_line):
-        count = business_line.client_services.count()
-        for child in business_line.children.all():
-            count += self._count_total_services(child)
-        return count
+        return ClientService.objects.in_business_line_tree(business_line).count()
     
     def _get_cascade_warning(self, children, total_descendants, total_services):
         if children == 0 and total_services == 0:
@@ -1,4 +1,5 @@
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Q, Sum, Count
@@ -10,6 +11,7 @@ from apps.accounting.services.service_state_manager import ServiceStateManager
 from apps.accounting.services.payment_service import PaymentService
 from apps.accounting.services.revenue_calculation_utils import RevenueCalculationMixin
 from apps.core.mixins import BusinessLinePermissionMixin
+from apps.core.query_budget import query_budget
 
 
 class PaymentManagementView(LoginRequiredMixin, BusinessLinePermissionMixin, ListView):
@@ -68,6 +70,7 @@ class PaymentManagementView(LoginRequiredMixin, BusinessLinePermissionMixin, Lis
         return context
 
 
+@method_decorator(query_budget(12), name='dispatch')
 class ExpiringServicesView(LoginRequiredMixin, BusinessLinePermissionMixin, ListView):
     model = ClientService
     template_name = 'accounting/services/expiring_services.html'
@@ -78,23 +81,20 @@ class ExpiringServicesView(LoginRequiredMixin, BusinessLinePermissionMixin, List
         accessible_lines = self.get_allowed_business_lines()
         days = int(self.request.GET.get('days', 30))
         
+        today = timezone.now().date()
+        
+        # El estado anotado evita una consulta de períodos por servicio al listar
         queryset = ClientService.objects.filter(
             business_line__in=accessible_lines,
-            is_active=True
-        ).select_related('client', 'business_line').prefetch_related('payments')
+            is_active=True,
+            end_date__range=(today, today + timedelta(days=days))
+        ).select_related('client', 'business_line').with_status_data()
         
         category = self.request.GET.get('category')
         if category:
             queryset = queryset.filter(category=category)
         
-        expiring_services = []
-        for service in queryset:
-            if service.end_date:
-                days_left = (service.end_date - timezone.now().date()).days
-                if 0 <= days_left <= days:
-                    expiring_services.append(service.id)
-        
-        return queryset.filter(id__in=expiring_services).order_by('created')
+        return queryset.order_by('created')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
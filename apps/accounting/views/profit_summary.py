@@ -1,13 +1,11 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.db.models import Q, Sum, F
 from decimal import Decimal
 from apps.core.constants import SERVICE_CATEGORIES, CATEGORY_CONFIG, EXPENSE_SERVICE_CATEGORIES
 from datetime import date, timedelta
-from apps.expenses.models import Expense
-from ..models import ServicePayment, ClientService
-from ..services.payment_service import PaymentService
+from ..models import ServicePayment, FinancialMonthlyRollup
+from ..services.financial_rollup_service import FinancialRollupService
 from ..services.revenue_analytics_service import RevenueAnalyticsService
 
 
@@ -65,24 +63,43 @@ def profit_summary_view(request, category=SERVICE_CATEGORIES['PERSONAL']):
     return render(request, 'accounting/profit_summary.html', context)
 
 
+def _get_calculation_range(year=None, month=None, date_range=None):
+    if date_range:
+        return date_range
+    if year and month:
+        start_date = date(year, month, 1)
+        end_date = (start_date.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        return start_date, end_date
+    if year:
+        return date(year, 1, 1), date(year, 12, 31)
+    return None, None
+
+
 def calculate_profit_for_category(category, year=None, month=None, date_range=None):
-    payments = ServicePayment.objects.filter(
-        client_service__category=category,
-        status__in=[ServicePayment.StatusChoices.PAID, ServicePayment.StatusChoices.REFUNDED],
-        amount__isnull=False
-    )
+    start_date, end_date = _get_calculation_range(year, month, date_range)
     
-    if date_range:
-        start_date, end_date = date_range
-        payments = payments.filter(payment_date__range=[start_date, end_date])
-    else:
-        if year:
-            payments = payments.filter(payment_date__year=year)
-        if month:
-            payments = payments.filter(payment_date__month=month)
+    settled_totals = FinancialRollupService.get_range_totals(
+        FinancialMonthlyRollup.SourceChoices.PAYMENT,
+        start_date,
+        end_date,
+        category=category,
+        statuses=[ServicePayment.StatusChoices.PAID, ServicePayment.StatusChoices.REFUNDED]
+    )
+    paid_totals = FinancialRollupService.get_range_totals(
+        FinancialMonthlyRollup.SourceChoices.PAYMENT,
+        start_date,
+        end_date,
+        category=category,
+        statuses=[ServicePayment.StatusChoices.PAID]
+    )
     
-    revenue_stats = PaymentService.calculate_revenue_stats(payments)
-    total_revenue = revenue_stats['total_amount']
+    total_revenue = settled_totals['amount']
+    total_payments = paid_totals['entry_count']
+    revenue_stats = {
+        'total_amount': total_revenue,
+        'total_payments': total_payments,
+        'average_amount': total_revenue / total_payments if total_payments > 0 else Decimal('0'),
+    }
     
     expense_category_map = {
         SERVICE_CATEGORIES['PERSONAL']: EXPENSE_SERVICE_CATEGORIES['PERSONAL'],
@@ -91,40 +108,15 @@ def calculate_profit_for_category(category, year=None, month=None, date_range=No
     
     expense_service_category = expense_category_map.get(category, EXPENSE_SERVICE_CATEGORIES['SHARED'])
     
-    expenses_filter = Q(service_category=expense_service_category)
-    if date_range:
-        start_date, end_date = date_range
-        expenses_filter &= Q(date__range=[start_date, end_date])
-    else:
-        if year:
-            expenses_filter &= Q(accounting_year=year)
-        if month:
-            expenses_filter &= Q(accounting_month=month)
-    
-    total_expenses = Expense.objects.filter(expenses_filter).aggregate(
-        total=Sum('amount')
-    )['total'] or Decimal('0')
+    total_expenses = FinancialRollupService.get_range_totals(
+        FinancialMonthlyRollup.SourceChoices.EXPENSE,
+        start_date,
+        end_date,
+        category=expense_service_category
+    )['amount']
     
-    # Filtros para remanentes
     if category == SERVICE_CATEGORIES['BUSINESS']:
-        total_remanentes = ServicePayment.objects.filter(
-            client_service__category=category,
-            status__in=[ServicePayment.StatusChoices.PAID, ServicePayment.StatusChoices.REFUNDED],
-            remanente__isnull=False
-        )
-        
-        if date_range:
-            start_date, end_date = date_range
-            total_remanentes = total_remanentes.filter(payment_date__range=[start_date, end_date])
-        else:
-            if year:
-                total_remanentes = total_remanentes.filter(payment_date__year=year)
-            if month:
-                total_remanentes = total_remanentes.filter(payment_date__month=month)
-        
-        total_remanentes = total_remanentes.aggregate(
-            total=Sum('remanente')
-        )['total'] or Decimal('0')
+        total_remanentes = settled_totals['remanente']
     else:
         total_remanentes = Decimal('0')
     
@@ -2,18 +2,21 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.db.models import Q
+from collections import defaultdict
 from decimal import Decimal
 from apps.core.constants import SERVICE_CATEGORIES, CATEGORY_CONFIG
 from datetime import date, timedelta
 from apps.business_lines.models import BusinessLine
-from ..models import ServicePayment
+from apps.core.query_budget import query_budget
+from apps.core.services.tenant_cache import TenantCache
+from ..models import ClientService, ServicePayment
 from ..services.revenue_analytics_service import RevenueAnalyticsService
 
 
 def _get_period_filters_and_range(period):
     today = timezone.now().date()
     analytics_service = RevenueAnalyticsService()
-
+    
     if period == 'current_month':
         return {'year': today.year, 'month': today.month, 'date_range': None}
     elif period == 'current_year':
@@ -27,7 +30,16 @@ def _get_period_filters_and_range(period):
         return {'year': None, 'month': None, 'date_range': None}
 
 
+def _build_business_lines_choices():
+    business_lines_choices = []
+    for line in BusinessLine.objects.filter(is_active=True).order_by('name'):
+        level_prefix = "  " * line.level
+        business_lines_choices.append((line.id, f"{level_prefix}{line.name}"))
+    return business_lines_choices
+
+
 @login_required
+@query_budget(15)
 def revenue_summary_view(request, category=SERVICE_CATEGORIES['PERSONAL']):
     search = request.GET.get('search', '').strip()
     business_line_id = request.GET.get('business_line')
@@ -39,17 +51,17 @@ def revenue_summary_view(request, category=SERVICE_CATEGORIES['PERSONAL']):
             business_line_id = int(business_line_id)
         except (ValueError, TypeError):
             business_line_id = None
-
+    
     period_filters = _get_period_filters_and_range(period)
     year = period_filters['year']
     month = period_filters['month']
     date_range = period_filters['date_range']
-
-    business_lines_choices = []
-    for line in BusinessLine.objects.filter(is_active=True).order_by('name'):
-        level_prefix = "  " * line.level
-        business_lines_choices.append((line.id, f"{level_prefix}{line.name}"))
-
+    
+    business_lines_choices = TenantCache.get_or_set(
+        'accounting.business_lines_choices', (), _build_business_lines_choices,
+        depends_on=(TenantCache.HIERARCHY,)
+    )
+    
     context = {
         'category': category,
         'category_display': CATEGORY_CONFIG[category]['name'],
@@ -73,50 +85,124 @@ def revenue_summary_view(request, category=SERVICE_CATEGORIES['PERSONAL']):
         ]
     }
     
-    root_lines = BusinessLine.objects.filter(parent__isnull=True, is_active=True).order_by('name')
+    summary_args = (category, search, business_line_id, payment_method, year, month, date_range)
+    if search:
+        # Las búsquedas libres dependen también de los clientes y apenas se repiten: no se cachean
+        lines_data, total_summary = _build_revenue_summary(*summary_args)
+    else:
+        lines_data, total_summary = TenantCache.get_or_set(
+            'accounting.revenue_summary', summary_args,
+            lambda: _build_revenue_summary(*summary_args),
+            depends_on=(TenantCache.REVENUE, TenantCache.HIERARCHY)
+        )
+    
+    context['total_summary'] = total_summary
+    context['revenue_data'] = lines_data
     
-    if business_line_id:
-        try:
-            selected_line = BusinessLine.objects.get(id=business_line_id, is_active=True)
-            if selected_line.parent is None:
-                root_lines = [selected_line]
-            else:
-                root_lines = [selected_line]
-        except BusinessLine.DoesNotExist:
-            pass
+    return render(request, 'accounting/revenue_summary.html', context)
+
+
+def _build_revenue_summary(category, search, business_line_id, payment_method, year, month, date_range):
+    """
+    Árbol de ingresos por línea con un número fijo de consultas.
+    
+    Los pagos se agregan una sola vez por línea de negocio y cada línea suma
+    en memoria los suyos propios más los de sus hijas activas y, a través de
+    ellas, sus descendientes; una hija inactiva corta el recorrido. Es la
+    misma regla de get_all_descendant_lines() y BusinessLineTreeStats.
+    """
+    from ..services.payment_service import PaymentService
+    
+    lines = list(BusinessLine.objects.order_by('name'))
+    lines_by_id = {line.id: line for line in lines}
+    children_by_parent = defaultdict(list)
+    for line in lines:
+        if line.parent_id is not None:
+            children_by_parent[line.parent_id].append(line)
+    
+    payments = _filter_revenue_payments(
+        ServicePayment.objects.filter(
+            client_service__category=category,
+            status__in=[ServicePayment.StatusChoices.PAID, ServicePayment.StatusChoices.REFUNDED],
+            amount__isnull=False
+        ),
+        year=year, month=month, payment_method=payment_method, date_range=date_range
+    )
+    own_totals = PaymentService.calculate_revenue_totals_by_business_line(payments)
+    
+    empty_totals = (Decimal('0'), 0)
+    
+    def add_totals(first, second):
+        return first[0] + second[0], first[1] + second[1]
+    
+    subtree_totals = {}
+    
+    def collect_totals(line):
+        # Como BusinessLineTreeStats: la línea suma lo suyo y el subárbol de sus hijas
+        # activas; el recorrido se detiene en las hijas inactivas
+        if line.id not in subtree_totals:
+            totals = own_totals.get(line.id, empty_totals)
+            for child in children_by_parent[line.id]:
+                if child.is_active:
+                    totals = add_totals(totals, collect_totals(child))
+            subtree_totals[line.id] = totals
+        return subtree_totals[line.id]
+    
+    def build_stats(totals):
+        total_amount, total_payments = totals
+        return {
+            'total_amount': total_amount,
+            'total_payments': total_payments,
+            'average_amount': total_amount / total_payments if total_payments > 0 else Decimal('0')
+        }
+    
+    def line_stats(line):
+        return build_stats(collect_totals(line))
+    
+    matching_line_ids = set()
+    if search:
+        matching_line_ids = set(
+            ClientService.objects.filter(
+                client__full_name__icontains=search
+            ).values_list('business_line_id', flat=True)
+        )
+    
+    def matches_search(line):
+        return search.lower() in line.name.lower() or line.id in matching_line_ids
+    
+    selected_line = lines_by_id.get(business_line_id) if business_line_id else None
+    if selected_line is not None and not selected_line.is_active:
+        selected_line = None
+    
+    if selected_line is not None:
+        root_lines = [selected_line]
+    else:
+        root_lines = [line for line in lines if line.parent_id is None and line.is_active]
     
     if search:
-        root_lines = root_lines.filter(
-            Q(name__icontains=search) | 
-            Q(client_services__client__full_name__icontains=search)
-        ).distinct()
+        root_lines = [line for line in root_lines if matches_search(line)]
     
     lines_data = []
     
     def build_line_data(line, level=0, force_include=False):
-        stats = calculate_revenue_stats_filtered(
-            business_line=line, category=category, year=year, month=month, payment_method=payment_method, date_range=date_range
-        )
+        stats = line_stats(line)
         
         should_include = force_include
         if search and not force_include:
-            line_matches = search.lower() in line.name.lower()
-            service_matches = line.client_services.filter(
-                client__full_name__icontains=search
-            ).exists()
-            should_include = line_matches or service_matches
+            should_include = matches_search(line)
         elif not search:
             should_include = True
         
+        active_children = [child for child in children_by_parent[line.id] if child.is_active]
         children_data = []
         if business_line_id:
             if line.id == business_line_id:
-                for child in line.children.filter(is_active=True).order_by('name'):
+                for child in active_children:
                     child_data = build_line_data(child, level + 1, force_include=True)
                     if child_data:
                         children_data.append(child_data)
         else:
-            for child in line.children.filter(is_active=True).order_by('name'):
+            for child in active_children:
                 child_data = build_line_data(child, level + 1)
                 if child_data:
                     children_data.append(child_data)
@@ -136,23 +222,13 @@ def revenue_summary_view(request, category=SERVICE_CATEGORIES['PERSONAL']):
             lines_data.append(line_data)
     
     if business_line_id:
-        try:
-            selected_line = BusinessLine.objects.get(id=business_line_id, is_active=True)
-            stats = calculate_revenue_stats_filtered(
-                business_line=selected_line, category=category, year=year, month=month, payment_method=payment_method, date_range=date_range
+        if selected_line is not None:
+            total_summary = line_stats(selected_line)
+        else:
+            total_summary = build_stats(
+                (sum((totals[0] for totals in own_totals.values()), Decimal('0')),
+                 sum(totals[1] for totals in own_totals.values()))
             )
-            total_summary = {
-                'total_amount': stats['total_amount'],
-                'total_payments': stats['total_payments'],
-                'average_amount': stats['average_amount']
-            }
-        except BusinessLine.DoesNotExist:
-            stats = calculate_revenue_stats_filtered(category=category, year=year, month=month, payment_method=payment_method, date_range=date_range)
-            total_summary = {
-                'total_amount': stats['total_amount'],
-                'total_payments': stats['total_payments'],
-                'average_amount': stats['average_amount']
-            }
     else:
         total_amount = Decimal('0')
         total_payments = 0
@@ -161,41 +237,26 @@ def revenue_summary_view(request, category=SERVICE_CATEGORIES['PERSONAL']):
             total_amount += line_data['stats']['total_amount']
             total_payments += line_data['stats']['total_payments']
         
-        total_summary = {
-            'total_amount': total_amount,
-            'total_payments': total_payments,
-            'average_amount': total_amount / total_payments if total_payments > 0 else Decimal('0')
-        }
-    
-    context['total_summary'] = total_summary
-    context['revenue_data'] = lines_data
+        total_summary = build_stats((total_amount, total_payments))
     
-    return render(request, 'accounting/revenue_summary.html', context)
+    return lines_data, total_summary
 
 
 def get_all_descendant_lines(business_line):
-    descendants = [business_line]
-    for child in business_line.children.filter(is_active=True):
-        descendants.extend(get_all_descendant_lines(child))
-    return descendants
+    return [business_line] + list(
+        BusinessLine.objects.filter(business_line.get_active_subtree_q()).exclude(pk=business_line.pk)
+    )
 
 def calculate_revenue_stats_filtered(business_line=None, category=SERVICE_CATEGORIES['PERSONAL'], year=None, month=None, payment_method=None, date_range=None):
     from ..services.payment_service import PaymentService
     
     if business_line:
-        all_lines = get_all_descendant_lines(business_line)
-        services = []
-        for line in all_lines:
-            services.extend(line.client_services.filter(category=category))
-        
-        if services:
-            payments = ServicePayment.objects.filter(
-                client_service__in=services,
-                status__in=[ServicePayment.StatusChoices.PAID, ServicePayment.StatusChoices.REFUNDED],
-                amount__isnull=False
-            )
-        else:
-            payments = ServicePayment.objects.none()
+        payments = ServicePayment.objects.filter(
+            business_line.get_active_subtree_q('client_service__business_line__'),
+            client_service__category=category,
+            status__in=[ServicePayment.StatusChoices.PAID, ServicePayment.StatusChoices.REFUNDED],
+            amount__isnull=False
+        )
     else:
         payments = ServicePayment.objects.filter(
             client_service__category=category,
@@ -203,6 +264,13 @@ def calculate_revenue_stats_filtered(business_line=None, category=SERVICE_CATEGO
             amount__isnull=False
         )
     
+    payments = _filter_revenue_payments(
+        payments, year=year, month=month, payment_method=payment_method, date_range=date_range
+    )
+    return PaymentService.calculate_revenue_stats(payments)
+
+
+def _filter_revenue_payments(payments, year=None, month=None, payment_method=None, date_range=None):
     # Aplicar filtros de fecha
     if date_range:
         start_date, end_date = date_range
@@ -216,4 +284,4 @@ def calculate_revenue_stats_filtered(business_line=None, category=SERVICE_CATEGO
     if payment_method:
         payments = payments.filter(payment_method=payment_method)
     
-    return PaymentService.calculate_revenue_stats(payments)
+    return payments
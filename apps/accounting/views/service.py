@@ -4,9 +4,11 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.urls import reverse
 from django.http import Http404
+from django.utils.decorators import method_decorator
 
 from apps.accounting.models import ClientService
 from apps.accounting.forms.service_form_factory import ServiceFormFactory
+from apps.core.query_budget import query_budget
 from apps.core.mixins import (
     BusinessLinePermissionMixin,
     BusinessLineHierarchyMixin,
@@ -68,6 +70,7 @@ class BaseServiceView(
         return context
 
 
+@method_decorator(query_budget(40), name='dispatch')
 class ServiceCategoryListView(BaseServiceView, ListView):
     template_name = 'accounting/service_category_list.html'
     context_object_name = 'services'
@@ -101,7 +104,7 @@ class ServiceCategoryListView(BaseServiceView, ListView):
 
         queryset = EnhancedFilterService.apply_filters(queryset, filters)
         
-        return queryset.select_related('client', 'business_line').prefetch_related('payments')
+        return queryset.select_related('client', 'business_line').prefetch_related('payments').with_status_data()
     
     def get_context_data(self, **kwargs):
         from ..services.enhanced_filter_service import EnhancedFilterService
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+def populate_business_line_paths(apps, schema_editor):
+    """
+    Calcula la ruta materializada de las líneas existentes, de la raíz a las hojas.
+    """
+    BusinessLine = apps.get_model('business_lines', 'BusinessLine')
+
+    paths = {}
+    pending = list(BusinessLine.objects.order_by('level', 'id').values_list('id', 'parent_id'))
+    while pending:
+        remaining = []
+        for line_id, parent_id in pending:
+            if parent_id is None:
+                paths[line_id] = f"{line_id}/"
+            elif parent_id in paths:
+                paths[line_id] = f"{paths[parent_id]}{line_id}/"
+            else:
+                remaining.append((line_id, parent_id))
+        if len(remaining) == len(pending):
+            break
+        pending = remaining
+
+    for line_id, path in paths.items():
+        BusinessLine.objects.filter(pk=line_id).update(path=path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business_lines', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessline',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text="IDs de los ancestros y de la propia línea, p. ej. '3/17/42/'", max_length=255, verbose_name='Ruta materializada'),
+        ),
+        migrations.RunPython(populate_business_line_paths, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.text import slugify
 from apps.core.models import TimeStampedModel
 
@@ -43,6 +45,16 @@ class BusinessLine(TimeStampedModel):
         default=0,
         verbose_name="Orden"
     )
+    
+    path = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        editable=False,
+        db_index=True,
+        verbose_name="Ruta materializada",
+        help_text="IDs de los ancestros y de la propia línea, p. ej. '3/17/42/'"
+    )
 
     class Meta:
         db_table = 'business_lines'
@@ -74,14 +86,34 @@ class BusinessLine(TimeStampedModel):
         if self.level > 3:
             raise ValueError("El nivel máximo permitido es 3")
         
+        old_path = self.path
+        if self.pk:
+            self.path = self._build_path()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'path'}
+        
         super().save(*args, **kwargs)
         
-        self._update_descendants_levels()
+        if not self.path:
+            self.path = self._build_path()
+            BusinessLine.objects.filter(pk=self.pk).update(path=self.path)
+        
+        if old_path and old_path != self.path:
+            self._update_descendants(old_path, self.path)
 
-    def _update_descendants_levels(self):
-        BusinessLine.objects.filter(parent=self).update(level=self.level + 1)
-        for child in self.children.all():
-            child._update_descendants_levels()
+    def _build_path(self):
+        parent_path = self.parent.path if self.parent_id else ''
+        return f"{parent_path}{self.pk}/"
+
+    def _update_descendants(self, old_path, new_path):
+        # Un único UPDATE reescribe el prefijo de ruta y el nivel de todo el subárbol
+        level_delta = self.level - old_path.count('/')
+        BusinessLine.objects.filter(
+            path__startswith=old_path
+        ).exclude(pk=self.pk).update(
+            path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+            level=F('level') + level_delta
+        )
 
     def _generate_unique_slug(self):
         base_slug = slugify(self.name)
@@ -125,16 +157,38 @@ class BusinessLine(TimeStampedModel):
         
         return '/'.join(path_parts)
     
-    def get_descendant_ids(self):
-        descendant_ids = {self.id}
-        self._collect_descendant_ids(descendant_ids)
-        return descendant_ids
+    def get_subtree_q(self, field_prefix=''):
+        """Q que selecciona la línea y todos sus descendientes mediante la ruta materializada."""
+        if not self.path:
+            # Sin ruta (cadena huérfana que la migración no pudo calcular) un prefijo
+            # vacío seleccionaría todas las líneas; sólo se devuelve la propia línea
+            return models.Q(**{f'{field_prefix}pk': self.pk})
+        return models.Q(**{f'{field_prefix}path__startswith': self.path})
     
-    def _collect_descendant_ids(self, id_set):
-        children = BusinessLine.objects.filter(parent=self)
-        for child in children:
-            id_set.add(child.id)
-            child._collect_descendant_ids(id_set)
+    def get_active_subtree_q(self, field_prefix=''):
+        """
+        Q que selecciona la línea y los descendientes alcanzables sólo a través
+        de sublíneas activas: el recorrido se detiene en una sublínea inactiva,
+        que queda fuera junto con todo lo que cuelga de ella.
+        """
+        inactive_paths = list(
+            BusinessLine.objects.filter(self.get_subtree_q(), is_active=False)
+            .exclude(pk=self.pk)
+            .values_list('path', flat=True)
+        )
+        subtree_q = self.get_subtree_q(field_prefix)
+        for inactive_path in inactive_paths:
+            subtree_q &= ~models.Q(**{f'{field_prefix}path__startswith': inactive_path})
+        return models.Q(**{f'{field_prefix}pk': self.pk}) | subtree_q
+
+    def get_descendants(self, include_self=True):
+        queryset = BusinessLine.objects.filter(self.get_subtree_q())
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def get_descendant_ids(self):
+        return set(self.get_descendants().values_list('id', flat=True))
 
     def update_active_status(self):
         from apps.business_lines.services.business_line_service import BusinessLineService
@@ -1,19 +1,20 @@
+from django.db import connection, transaction
 from django.db.models import Exists, OuterRef, Max
 
 class BusinessLineService:
-    
+
+    PENDING_STATUS_ATTR = '_pending_business_line_status_updates'
+
     @staticmethod
     def check_line_has_active_services(business_line):
         return business_line.client_services.filter(is_active=True).exists()
     
     @staticmethod
     def check_line_has_active_sublines(business_line):
-        for child in business_line.children.all():
-            if BusinessLineService.check_line_has_active_services(child):
-                return True
-            if BusinessLineService.check_line_has_active_sublines(child):
-                return True
-        return False
+        return business_line.client_services.model.objects.filter(
+            business_line.get_subtree_q('business_line__'),
+            is_active=True
+        ).exclude(business_line=business_line).exists()
     
     @staticmethod
     def update_business_line_status(business_line):
@@ -26,8 +27,10 @@ class BusinessLineService:
         new_status = has_active_services or has_active_sublines
         if business_line.is_active != new_status:
             from apps.business_lines.models import BusinessLine
+            from apps.core.services.tenant_cache import TenantCache
             BusinessLine.objects.filter(pk=business_line.pk).update(is_active=new_status)
             business_line.is_active = new_status
+            TenantCache.invalidate(TenantCache.HIERARCHY)
             if business_line.parent:
                 BusinessLineService.update_business_line_status(business_line.parent)
     
@@ -45,3 +48,39 @@ class BusinessLineService:
             lines_at_level = BusinessLine.objects.filter(level=level)
             for line in lines_at_level:
                 BusinessLineService.update_business_line_status(line)
+    
+    @staticmethod
+    def schedule_business_line_status_update(business_line_id):
+        """
+        Recalcula el estado de la línea una sola vez por transacción, tras el commit.
+        
+        Fuera de una transacción el recálculo se ejecuta en el momento.
+        """
+        if business_line_id is None:
+            return
+        
+        pending = getattr(connection, BusinessLineService.PENDING_STATUS_ATTR, None)
+        if pending is not None and BusinessLineService._is_status_flush_scheduled():
+            pending.add(business_line_id)
+            return
+        
+        setattr(connection, BusinessLineService.PENDING_STATUS_ATTR, {business_line_id})
+        transaction.on_commit(BusinessLineService.flush_business_line_status_updates)
+    
+    @staticmethod
+    def flush_business_line_status_updates():
+        from apps.business_lines.models import BusinessLine
+        
+        line_ids = getattr(connection, BusinessLineService.PENDING_STATUS_ATTR, None)
+        setattr(connection, BusinessLineService.PENDING_STATUS_ATTR, None)
+        if not line_ids:
+            return
+        
+        for business_line in BusinessLine.objects.filter(id__in=line_ids):
+            BusinessLineService.update_business_line_status(business_line)
+    
+    @staticmethod
+    def _is_status_flush_scheduled():
+        # Un rollback descarta el callback pendiente; en ese caso hay que registrarlo de nuevo
+        flush = BusinessLineService.flush_business_line_status_updates
+        return any(entry[1] == flush for entry in connection.run_on_commit)
@@ -1,14 +1,22 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import BusinessLine
+from .services.business_line_service import BusinessLineService
 from apps.accounting.models import ClientService
 
 
 @receiver(post_save, sender=ClientService)
 def update_business_line_status_on_service_change(sender, instance, **kwargs):
-    instance.business_line.update_active_status()
+    BusinessLineService.schedule_business_line_status_update(instance.business_line_id)
 
 
 @receiver(post_delete, sender=ClientService)
 def update_business_line_status_on_service_delete(sender, instance, **kwargs):
-    instance.business_line.update_active_status()
+    BusinessLineService.schedule_business_line_status_update(instance.business_line_id)
+
+
+@receiver(post_save, sender=BusinessLine)
+@receiver(post_delete, sender=BusinessLine)
+def invalidate_hierarchy_cache(sender, **kwargs):
+    from apps.core.services.tenant_cache import TenantCache
+    TenantCache.invalidate(TenantCache.HIERARCHY)
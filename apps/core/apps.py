@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
+    
+    def ready(self):
+        from apps.core.services.schema_capabilities import SchemaCapabilities
+        post_migrate.connect(SchemaCapabilities.clear, dispatch_uid='core_clear_schema_capabilities')
@@ -0,0 +1,116 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class RequestDiagnostics:
+    """
+    Búfer circular, por proceso, con las últimas peticiones muestreadas.
+    
+    Cada registro es un dict con método, ruta, estado, esquema del tenant,
+    duración, número y tiempo de consultas SQL y tamaño de la respuesta.
+    """
+    
+    _records = deque(maxlen=200)
+    _lock = threading.Lock()
+    
+    @classmethod
+    def configure(cls, size):
+        with cls._lock:
+            if cls._records.maxlen != size:
+                cls._records = deque(cls._records, maxlen=size)
+    
+    @classmethod
+    def record(cls, entry):
+        cls._records.append(entry)
+    
+    @classmethod
+    def recent(cls, limit=None):
+        records = list(cls._records)
+        return records[-limit:] if limit else records
+    
+    @classmethod
+    def clear(cls):
+        cls._records.clear()
+
+
+class QueryCounter:
+    """Envoltorio de ejecución de la conexión que cuenta y cronometra las consultas."""
+    
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+    
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestDiagnosticsMiddleware:
+    """
+    Diagnóstico de peticiones muestreado y condicionado al nivel de log.
+    
+    Con REQUEST_DIAGNOSTICS_SAMPLE_RATE a 0 (por defecto) el middleware se
+    retira de la cadena al arrancar y no añade ningún coste. Activo, las
+    peticiones no muestreadas sólo pagan una llamada a random(); las
+    muestreadas se guardan en RequestDiagnostics y, si el logger tiene
+    habilitado el nivel configurado, se emiten como una línea JSON.
+    
+    Debe ir el primero de MIDDLEWARE para medir la petición completa.
+    """
+    
+    def __init__(self, get_response, sample_rate=None):
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_DIAGNOSTICS_SAMPLE_RATE if sample_rate is None else sample_rate
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        
+        self.log_level = logging.getLevelName(settings.REQUEST_DIAGNOSTICS_LOG_LEVEL)
+        RequestDiagnostics.configure(settings.REQUEST_DIAGNOSTICS_BUFFER_SIZE)
+    
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+        
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'schema': getattr(connection, 'schema_name', None),
+            'duration_ms': round(duration * 1000, 2),
+            'queries': counter.count,
+            'query_ms': round(counter.duration * 1000, 2),
+            'response_bytes': self._response_size(response),
+        }
+        RequestDiagnostics.record(entry)
+        
+        if logger.isEnabledFor(self.log_level):
+            logger.log(self.log_level, json.dumps(entry))
+        
+        return response
+    
+    @staticmethod
+    def _response_size(response):
+        if getattr(response, 'streaming', False):
+            length = response.get('Content-Length')
+            return int(length) if length else None
+        return len(response.content)
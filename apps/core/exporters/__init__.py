@@ -1,14 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Iterator, Union
 from django.db import models
 from django.forms.models import model_to_dict
 
 
 class BaseExporter(ABC):
+    # Filas que se leen de la base de datos en cada viaje del cursor
+    CHUNK_SIZE = 2000
+    
     @abstractmethod
-    def get_data(self) -> List[Dict[str, Any]]:
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
         pass
     
+    def get_data(self) -> List[Dict[str, Any]]:
+        return list(self.iter_rows())
+    
     @classmethod
     @abstractmethod
     def get_display_name(cls) -> str:
@@ -38,7 +44,38 @@ class BaseExporter(ABC):
         return data
     
     def serialize_queryset(self, queryset: Union[models.QuerySet, List[models.Model]]) -> List[Dict[str, Any]]:
-        return [self.serialize_model_instance(obj) for obj in queryset]
+        return list(self.iter_serialized(queryset))
+    
+    @staticmethod
+    def get_exportable_fields(model) -> List[models.Field]:
+        """Campos que incluiría model_to_dict(), en el mismo orden."""
+        return [field for field in model._meta.concrete_fields if getattr(field, 'editable', False)]
+    
+    def serialize_values_row(self, model, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Equivalente a serialize_model_instance() para filas de values(). Las claves
+        foráneas se exportan como id; el nombre relacionado debe venir anotado.
+        """
+        data = {}
+        for field in self.get_exportable_fields(model):
+            value = row.get(field.attname)
+            if isinstance(field, (models.DateTimeField, models.DateField)) and value:
+                value = value.isoformat()
+            elif isinstance(field, models.DecimalField) and value is not None:
+                value = str(value)
+            data[field.name] = value
+        return data
+    
+    def iter_serialized(self, queryset: Union[models.QuerySet, List[models.Model]]) -> Iterator[Dict[str, Any]]:
+        if isinstance(queryset, models.QuerySet):
+            # serialize_model_instance() usa str() de cada clave foránea: se cargan con JOIN
+            foreign_keys = [
+                field.name for field in self.get_exportable_fields(queryset.model)
+                if isinstance(field, models.ForeignKey)
+            ]
+            queryset = queryset.select_related(*foreign_keys).iterator(chunk_size=self.CHUNK_SIZE)
+        for obj in queryset:
+            yield self.serialize_model_instance(obj)
 
 
 from . import accounting
@@ -1,6 +1,6 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from django.utils import timezone
-from django.db.models import Sum, Count, Avg
+from django.db.models import Sum, Count, Avg, Q
 from . import BaseExporter
 from ..services.export_registry import register_exporter
 
@@ -9,42 +9,38 @@ from ..services.export_registry import register_exporter
 class ClientExporter(BaseExporter):
     """Exportador de clientes con resumen de servicios"""
     
-    def get_data(self) -> List[Dict[str, Any]]:
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
         try:
-            from apps.accounting.models import Client, ClientService
+            from apps.accounting.models import Client
             from django_tenants.utils import connection
             
             tenant = connection.tenant
             if not tenant or tenant.schema_name == 'public':
-                return []
+                return
             
-            clients = Client.objects.filter(is_active=True).prefetch_related('services')
-            data = []
+            # Estadísticas de servicios calculadas en la misma consulta que los clientes
+            active_services = Q(services__is_active=True)
+            client_fields = [field.attname for field in self.get_exportable_fields(Client)]
+            clients = Client.objects.filter(is_active=True).annotate(
+                total_servicios=Count('services', filter=active_services),
+                valor_total=Sum('services__price', filter=active_services),
+                valor_promedio=Avg('services__price', filter=active_services)
+            ).values(*client_fields, 'total_servicios', 'valor_total', 'valor_promedio').order_by('pk')
             
-            for client in clients:
-                # Estadísticas de servicios para este cliente
-                services_stats = client.services.filter(is_active=True).aggregate(
-                    total_servicios=Count('id'),
-                    valor_total=Sum('price'),
-                    valor_promedio=Avg('price')
-                )
-                
-                client_data = self.serialize_model_instance(client)
+            for row in clients.iterator(chunk_size=self.CHUNK_SIZE):
+                client_data = self.serialize_values_row(Client, row)
                 
                 # Agregar estadísticas de servicios
                 client_data.update({
-                    'total_servicios': services_stats['total_servicios'] or 0,
-                    'valor_total_servicios': float(services_stats['valor_total'] or 0),
-                    'valor_promedio_servicios': float(services_stats['valor_promedio'] or 0),
+                    'total_servicios': row['total_servicios'] or 0,
+                    'valor_total_servicios': float(row['valor_total'] or 0),
+                    'valor_promedio_servicios': float(row['valor_promedio'] or 0),
                 })
                 
-                data.append(client_data)
-            
-            return data
+                yield client_data
             
         except Exception as e:
             print(f"Error exporting clients: {e}")
-            return []
     
     @classmethod
     def get_display_name(cls) -> str:
@@ -55,21 +51,20 @@ class ClientExporter(BaseExporter):
 class ServiceExporter(BaseExporter):
     """Exportador de servicios de clientes"""
     
-    def get_data(self) -> List[Dict[str, Any]]:
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
         try:
             from apps.accounting.models import ClientService
             from django_tenants.utils import connection
             
             tenant = connection.tenant
             if not tenant or tenant.schema_name == 'public':
-                return []
+                return
             
             services = ClientService.objects.filter(is_active=True).select_related('client')
-            return self.serialize_queryset(services)
+            yield from self.iter_serialized(services)
             
         except Exception as e:
             print(f"Error exporting services: {e}")
-            return []
     
     @classmethod
     def get_display_name(cls) -> str:
@@ -80,21 +75,22 @@ class ServiceExporter(BaseExporter):
 class PaymentExporter(BaseExporter):
     """Exportador de pagos de servicios"""
     
-    def get_data(self) -> List[Dict[str, Any]]:
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
         try:
             from apps.accounting.models import ServicePayment
             from django_tenants.utils import connection
             
             tenant = connection.tenant
             if not tenant or tenant.schema_name == 'public':
-                return []
+                return
             
-            payments = ServicePayment.objects.all().select_related('client_service', 'client_service__client')
-            return self.serialize_queryset(payments)
+            payments = ServicePayment.objects.all().select_related(
+                'client_service', 'client_service__client', 'client_service__business_line'
+            )
+            yield from self.iter_serialized(payments)
             
         except Exception as e:
             print(f"Error exporting payments: {e}")
-            return []
     
     @classmethod
     def get_display_name(cls) -> str:
@@ -1,10 +1,15 @@
 class BaseExporter:
+    
+    CHUNK_SIZE = 2000
   
     def __init__(self):
         self.name = self.__class__.__name__
     
+    def iter_rows(self):
+        raise NotImplementedError("Subclasses must implement iter_rows()")
+    
     def get_data(self):
-        raise NotImplementedError("Subclasses must implement get_data()")
+        return list(self.iter_rows())
     
     def get_name(self):
         return self.name.replace('Exporter', '').lower()
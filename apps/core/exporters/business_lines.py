@@ -1,4 +1,5 @@
-from typing import List, Dict, Any
+from typing import Dict, Any
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
 from .base import BaseExporter
 from ..services.export_registry import register_exporter
 
@@ -6,69 +7,71 @@ from ..services.export_registry import register_exporter
 @register_exporter('business_lines')
 class BusinessLineExporter(BaseExporter):
     
-    def get_data(self):
+    def iter_rows(self):
         try:
             from apps.business_lines.models import BusinessLine
+            from apps.accounting.models import ClientService, ServicePayment
             
-            lines = BusinessLine.objects.prefetch_related(
-                'client_services__client',
-                'client_services__payments',
-                'children'
-            ).order_by('level', 'order', 'name')
+            # Nombre y padre de todas las líneas para montar las rutas en memoria
+            hierarchy = {
+                line_id: (name, parent_id)
+                for line_id, name, parent_id in BusinessLine.objects.values_list('id', 'name', 'parent_id')
+            }
             
-            if not lines.exists():
-                return []
+            # Estadísticas calculadas en la misma consulta que las líneas; las sumas
+            # van en subconsultas para que los JOIN no multipliquen los importes
+            active_services = Q(client_services__is_active=True)
+            services_price = (
+                ClientService.objects
+                .filter(business_line=OuterRef('pk'), is_active=True)
+                .values('business_line')
+                .annotate(total=Sum('price'))
+                .values('total')
+            )
+            paid_payments = (
+                ServicePayment.objects
+                .filter(
+                    client_service__business_line=OuterRef('pk'),
+                    client_service__is_active=True,
+                    status=ServicePayment.StatusChoices.PAID
+                )
+                .values('client_service__business_line')
+            )
+            lines = BusinessLine.objects.annotate(
+                total_servicios=Count('client_services', filter=active_services, distinct=True),
+                clientes_unicos=Count('client_services__client', filter=active_services, distinct=True),
+                numero_sublineas=Count('children', distinct=True),
+                ingresos_estimados=Subquery(services_price),
+                ingresos_reales=Subquery(paid_payments.annotate(total=Sum('amount')).values('total')),
+                pagos_realizados=Subquery(paid_payments.annotate(total=Count('id')).values('total')),
+            ).order_by('level', 'order', 'name')
             
-            data = []
-            for line in lines:
-                # Información básica de la línea
-                line_data = {
+            for line in lines.iterator(chunk_size=self.CHUNK_SIZE):
+                parent = hierarchy.get(line.parent_id)
+                yield {
                     'nombre': line.name,
                     'nivel': line.level,
-                    'padre': line.parent.name if line.parent else 'Línea raíz',
-                    'ruta_completa': self._get_full_path(line),
+                    'padre': parent[0] if parent else 'Línea raíz',
+                    'ruta_completa': self._get_full_path(line.id, hierarchy),
                     'orden': line.order,
                     'activa': 'Sí' if line.is_active else 'No',
                     'fecha_creacion': line.created.strftime('%Y-%m-%d'),
+                    'total_servicios': line.total_servicios,
+                    'clientes_unicos': line.clientes_unicos,
+                    'ingresos_estimados': float(line.ingresos_estimados or 0),
+                    'ingresos_reales': float(line.ingresos_reales or 0),
+                    'pagos_realizados': line.pagos_realizados or 0,
+                    'tiene_sublíneas': line.numero_sublineas > 0,
+                    'numero_sublíneas': line.numero_sublineas,
                 }
-                
-                # Estadísticas de servicios
-                services = line.client_services.filter(is_active=True)
-                total_servicios = services.count()
-                clientes_unicos = services.values('client').distinct().count()
-                
-                # Estadísticas financieras
-                total_ingresos = sum(s.price for s in services)
-                pagos_realizados = 0
-                ingresos_reales = 0
-                
-                for service in services:
-                    pagos = service.payments.filter(status='PAID')
-                    pagos_realizados += pagos.count()
-                    ingresos_reales += sum(p.amount for p in pagos if p.amount)
-                
-                line_data.update({
-                    'total_servicios': total_servicios,
-                    'clientes_unicos': clientes_unicos,
-                    'ingresos_estimados': float(total_ingresos),
-                    'ingresos_reales': float(ingresos_reales),
-                    'pagos_realizados': pagos_realizados,
-                    'tiene_sublíneas': line.children.exists(),
-                    'numero_sublíneas': line.children.count(),
-                })
-                
-                data.append(line_data)
-            
-            return data
             
         except Exception as e:
             print(f"Error exporting business lines: {e}")
-            return []
     
-    def _get_full_path(self, line):
-        path = [line.name]
-        current = line.parent
-        while current:
-            path.insert(0, current.name)
-            current = current.parent
+    def _get_full_path(self, line_id, hierarchy: Dict[int, Any]):
+        path = []
+        current = line_id
+        while current in hierarchy:
+            name, current = hierarchy[current]
+            path.insert(0, name)
         return ' > '.join(path)
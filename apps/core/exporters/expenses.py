@@ -1,4 +1,4 @@
-from typing import List, Dict, Any
+from typing import Dict, Any, Iterator
 from django.utils import timezone
 from django.db.models import Sum, Count, Avg
 from . import BaseExporter
@@ -9,28 +9,23 @@ from ..services.export_registry import register_exporter
 class ExpenseCategoryExporter(BaseExporter):
     """Exportador de categorías de gastos con estadísticas"""
     
-    def get_data(self) -> List[Dict[str, Any]]:
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
         try:
-            from apps.expenses.models import ExpenseCategory, Expense
+            from apps.expenses.models import ExpenseCategory
             from django_tenants.utils import connection
             
             tenant = connection.tenant
             if not tenant or tenant.schema_name == 'public':
-                return []
+                return
             
-            categories = ExpenseCategory.objects.all()
-            data = []
+            # Estadísticas de gastos calculadas en la misma consulta que las categorías
+            categories = ExpenseCategory.objects.annotate(
+                total_gastos=Count('expenses'),
+                monto_total=Sum('expenses__amount'),
+                monto_promedio=Avg('expenses__amount')
+            )
             
-            for category in categories:
-                # Estadísticas de gastos para esta categoría
-                expense_stats = Expense.objects.filter(
-                    category=category
-                ).aggregate(
-                    total_gastos=Count('id'),
-                    monto_total=Sum('amount'),
-                    monto_promedio=Avg('amount')
-                )
-                
+            for category in categories.iterator(chunk_size=self.CHUNK_SIZE):
                 category_data = {
                     'id': category.id,
                     'nombre': category.name,
@@ -40,17 +35,14 @@ class ExpenseCategoryExporter(BaseExporter):
                     'fecha_modificacion': category.modified.isoformat() if category.modified else '',
                     
                     # Estadísticas
-                    'total_gastos': expense_stats['total_gastos'] or 0,
-                    'monto_total': float(expense_stats['monto_total'] or 0),
-                    'monto_promedio': float(expense_stats['monto_promedio'] or 0),
+                    'total_gastos': category.total_gastos or 0,
+                    'monto_total': float(category.monto_total or 0),
+                    'monto_promedio': float(category.monto_promedio or 0),
                 }
-                data.append(category_data)
-            
-            return data
+                yield category_data
             
         except Exception as e:
             print(f"Error exporting expense categories: {e}")
-            return []
     
     @classmethod
     def get_display_name(cls) -> str:
@@ -61,21 +53,20 @@ class ExpenseCategoryExporter(BaseExporter):
 class ExpenseExporter(BaseExporter):
     """Exportador de gastos individuales"""
     
-    def get_data(self) -> List[Dict[str, Any]]:
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
         try:
             from apps.expenses.models import Expense
             from django_tenants.utils import connection
             
             tenant = connection.tenant
             if not tenant or tenant.schema_name == 'public':
-                return []
+                return
             
             expenses = Expense.objects.all().select_related('category')
-            return self.serialize_queryset(expenses)
+            yield from self.iter_serialized(expenses)
             
         except Exception as e:
             print(f"Error exporting expenses: {e}")
-            return []
     
     @classmethod
     def get_display_name(cls) -> str:
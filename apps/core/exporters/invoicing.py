@@ -1,4 +1,5 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+from django.db.models import Count
 from ..services.export_registry import register_exporter
 from . import BaseExporter
 
@@ -10,20 +11,20 @@ from ..services.export_registry import register_exporter
 @register_exporter('companies')
 class CompanyExporter(BaseExporter):
     
-    def get_data(self):
+    def iter_rows(self):
         try:
             from apps.invoicing.models import Company
             
             companies = Company.objects.all().order_by('-created')
             
             if not companies.exists():
-                return [{
+                yield {
                     'mensaje': 'No hay información de empresa configurada',
                     'recomendacion': 'Configure los datos de su empresa en el módulo de facturación'
-                }]
+                }
+                return
             
-            data = []
-            for company in companies:
+            for company in companies.iterator(chunk_size=self.CHUNK_SIZE):
                 company_data = {
                     'forma_legal': company.get_legal_form_display() if company.legal_form else '',
                     'nombre_comercial': company.business_name or '',
@@ -41,62 +42,68 @@ class CompanyExporter(BaseExporter):
                     'tiene_logo': 'Sí' if company.logo else 'No',
                     'fecha_creacion': company.created.strftime('%Y-%m-%d %H:%M') if hasattr(company, 'created') else '',
                 }
-                data.append(company_data)
-            
-            return data
+                yield company_data
             
         except Exception as e:
             print(f"Error exporting companies: {e}")
-            return []
 
 
 @register_exporter('invoices')
 class InvoiceExporter(BaseExporter):
     """Exportador profesional de facturas"""
     
-    def get_data(self):
+    def iter_rows(self):
         try:
             from apps.invoicing.models import Invoice
             
-            invoices = Invoice.objects.select_related('company').prefetch_related(
-                'items'
+            invoices = Invoice.objects.annotate(
+                numero_items=Count('items'),
+            ).values(
+                'reference', 'issue_date', 'client_name', 'client_tax_id', 'client_address',
+                'client_type', 'payment_terms', 'status', 'pdf_file', 'created',
+                'company__business_name', 'numero_items',
+                'base_amount', 'vat_amount', 'irpf_amount', 'total_amount',
             ).order_by('-issue_date', '-id')
             
             if not invoices.exists():
-                return [{
+                yield {
                     'mensaje': 'No hay facturas emitidas',
                     'recomendacion': 'Las facturas aparecerán aquí cuando empiece a facturar'
-                }]
+                }
+                return
+            
+            client_types = dict(Invoice.CLIENT_TYPES)
+            statuses = dict(Invoice.STATUS_CHOICES)
             
-            data = []
-            for invoice in invoices:
+            for invoice in invoices.iterator(chunk_size=self.CHUNK_SIZE):
                 invoice_data = {
-                    'referencia': invoice.reference or '',
-                    'fecha_emision': invoice.issue_date.strftime('%Y-%m-%d'),
-                    'cliente_nombre': invoice.client_name or '',
-                    'cliente_nif': invoice.client_tax_id or '',
-                    'cliente_direccion': invoice.client_address or '',  
-                    'tipo_cliente': invoice.get_client_type_display() if hasattr(invoice, 'get_client_type_display') else '',
-                    'condiciones_pago': invoice.payment_terms or '',
-                    'estado': invoice.get_status_display() if hasattr(invoice, 'get_status_display') else 'Emitida',
-                    'numero_items': invoice.items.count() if hasattr(invoice, 'items') else 0,
-                    'empresa_emisora': invoice.company.business_name if invoice.company else '',
-                    'tiene_pdf': 'Sí' if getattr(invoice, 'pdf_file', None) else 'No',
-                    'fecha_creacion': invoice.created.strftime('%Y-%m-%d %H:%M') if hasattr(invoice, 'created') else '',
+                    'referencia': invoice['reference'] or '',
+                    'fecha_emision': invoice['issue_date'].strftime('%Y-%m-%d'),
+                    'cliente_nombre': invoice['client_name'] or '',
+                    'cliente_nif': invoice['client_tax_id'] or '',
+                    'cliente_direccion': invoice['client_address'] or '',
+                    'tipo_cliente': client_types.get(invoice['client_type'], invoice['client_type'] or ''),
+                    'condiciones_pago': invoice['payment_terms'] or '',
+                    'estado': statuses.get(invoice['status'], 'Emitida'),
+                    'numero_items': invoice['numero_items'],
+                    'base_imponible': float(invoice['base_amount']),
+                    'importe_iva': float(invoice['vat_amount']),
+                    'importe_irpf': float(invoice['irpf_amount']),
+                    'importe_total': float(invoice['total_amount']),
+                    'empresa_emisora': invoice['company__business_name'] or '',
+                    'tiene_pdf': 'Sí' if invoice['pdf_file'] else 'No',
+                    'fecha_creacion': invoice['created'].strftime('%Y-%m-%d %H:%M') if invoice['created'] else '',
                 }
-                data.append(invoice_data)
-            
-            return data
+                yield invoice_data
             
         except Exception as e:
             print(f"Error exporting invoices: {e}")
-            return []
 
 
 @register_exporter('invoice_items')
 class InvoiceItemExporter(BaseExporter):
     
-    def get_data(self):
+    def iter_rows(self):
         try:
             from apps.invoicing.models import InvoiceItem
             
@@ -105,13 +112,13 @@ class InvoiceItemExporter(BaseExporter):
             )
             
             if not items.exists():
-                return [{
+                yield {
                     'mensaje': 'No hay conceptos de factura',
                     'recomendacion': 'Los conceptos de factura aparecerán cuando empiece a facturar servicios'
-                }]
+                }
+                return
             
-            data = []
-            for item in items:
+            for item in items.iterator(chunk_size=self.CHUNK_SIZE):
                 item_data = {
                     'factura_referencia': item.invoice.reference if item.invoice.reference else f'ID-{item.invoice.id}',
                     'factura_fecha': item.invoice.issue_date.strftime('%Y-%m-%d'),
@@ -122,10 +129,7 @@ class InvoiceItemExporter(BaseExporter):
                     'cliente_factura': item.invoice.client_name if item.invoice.client_name else '',
                     'fecha_creacion': item.created.strftime('%Y-%m-%d %H:%M') if hasattr(item, 'created') else '',
                 }
-                data.append(item_data)
-            
-            return data
+                yield item_data
             
         except Exception as e:
             print(f"Error exporting invoice items: {e}")
-            return []
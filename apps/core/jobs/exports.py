@@ -0,0 +1,22 @@
+from ..services.job_registry import register_job_handler
+
+
+@register_job_handler('core.tenant_export')
+def run_tenant_export(job, output, report_progress):
+    from ..services.tenant_export_engine import ExportManager
+    
+    def on_table(index, total, name):
+        report_progress(index * 100 / max(total, 1), f"Exportando {name}")
+    
+    exporter = ExportManager.create_export(
+        format=job.params.get('format', 'excel'),
+        progress_callback=on_table
+    )
+    for chunk in exporter.stream():
+        output.write(chunk)
+    
+    return {
+        'filename': exporter.get_filename(),
+        'content_type': exporter.content_type,
+        'message': 'Exportación completada',
+    }
@@ -0,0 +1,63 @@
+from ..services.job_registry import register_job_handler
+
+
+@register_job_handler('invoicing.bulk_pdf')
+def run_bulk_pdf(job, output, report_progress):
+    from apps.invoicing.services import BulkPDFService
+    from ..services.job_service import JobService
+    
+    params = job.params
+    invoices = BulkPDFService.get_period_invoices(
+        params['period_type'],
+        year=params.get('year'),
+        month=params.get('month'),
+        quarter=params.get('quarter'),
+        status=params.get('status')
+    )
+    
+    def on_invoice(done, total):
+        report_progress(done * 100 / max(total, 1), f"{done} de {total} facturas generadas")
+    
+    if params.get('output_format') == 'pdf':
+        def on_layout(done, total):
+            report_progress(done * 100 / max(total, 1), f"{done} de {total} facturas maquetadas")
+        
+        count = BulkPDFService.write_combined_pdf(invoices, output, on_layout)
+        if count == 0:
+            raise ValueError('No hay facturas para generar el PDF')
+        
+        return {
+            'filename': params['filename'],
+            'content_type': 'application/pdf',
+            'message': f'{count} facturas en un único PDF',
+        }
+    
+    estimate = BulkPDFService.estimate_output_size(invoices)
+    parts = BulkPDFService.plan_zip_parts(invoices, params['filename'], estimate)
+    
+    if len(parts) > 1:
+        # Descarga grande: un ZIP por parte en el directorio de la tarea
+        directory = JobService.get_result_dir(job)
+        success_count, error_count, written_parts = BulkPDFService.write_bulk_pdf_parts(
+            invoices, parts, directory, on_invoice
+        )
+    else:
+        success_count, error_count = BulkPDFService.write_bulk_pdfs_zip(invoices, output, on_invoice)
+        written_parts = []
+    
+    if success_count == 0:
+        raise ValueError('No se pudo generar ningún PDF')
+    
+    message = f'{success_count} facturas generadas'
+    if error_count:
+        message += f', {error_count} errores'
+    
+    if len(written_parts) > 1:
+        message += f' en {len(written_parts)} ficheros'
+    
+    return {
+        'filename': params['filename'],
+        'content_type': 'application/zip',
+        'message': message,
+        'parts': written_parts or None,
+    }
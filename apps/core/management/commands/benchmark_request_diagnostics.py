@@ -0,0 +1,56 @@
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from apps.core.diagnostics import RequestDiagnostics, RequestDiagnosticsMiddleware
+
+
+class Command(BaseCommand):
+    help = 'Mide el coste por petición del middleware de diagnóstico (desactivado, sin muestrear y muestreado)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=100000,
+            help='Peticiones simuladas por escenario (por defecto 100000)',
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        request = RequestFactory().get('/benchmark/')
+        response = HttpResponse(b'ok')
+
+        def view(request):
+            return response
+
+        baseline = self._measure(view, request, iterations)
+        self.stdout.write(f'Sin middleware:      {baseline * 1e6:8.3f} µs/petición')
+
+        try:
+            RequestDiagnosticsMiddleware(view, sample_rate=0)
+        except MiddlewareNotUsed:
+            self.stdout.write('Desactivado:         se retira de la cadena al arrancar (coste 0)')
+
+        scenarios = [
+            ('Activo, no muestreada', 1e-9),
+            ('Activo, muestreada', 1.0),
+        ]
+        for label, sample_rate in scenarios:
+            middleware = RequestDiagnosticsMiddleware(view, sample_rate=sample_rate)
+            elapsed = self._measure(middleware, request, iterations)
+            self.stdout.write(
+                f'{label + ":":<21}{elapsed * 1e6:8.3f} µs/petición '
+                f'(+{(elapsed - baseline) * 1e6:.3f} µs)'
+            )
+        RequestDiagnostics.clear()
+
+    @staticmethod
+    def _measure(handler, request, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            handler(request)
+        return (time.perf_counter() - start) / iterations
@@ -0,0 +1,105 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django_tenants.utils import get_tenant_model, schema_context
+
+from apps.core.services.job_service import JobService
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de tareas en segundo plano (descargas masivas, exportaciones) de todos los tenants'
+
+    # Segundos entre limpiezas de tareas expiradas o interrumpidas
+    CLEANUP_INTERVAL = 300
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesa las tareas pendientes y termina en lugar de quedarse esperando',
+        )
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Procesar solo el tenant con este schema',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='Segundos de espera cuando no hay tareas pendientes (por defecto 5)',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Termina tras procesar este número de tareas (0 = sin límite)',
+        )
+
+    def handle(self, *args, **options):
+        self.schema_name = options.get('tenant')
+        self.max_jobs = options['max_jobs']
+        self.processed = 0
+        self.last_cleanup = None
+
+        self.stdout.write(self.style.SUCCESS('Worker de tareas iniciado'))
+
+        try:
+            while True:
+                close_old_connections()
+                processed_in_cycle = self._run_cycle()
+
+                if options['once'] or self._limit_reached():
+                    break
+                if processed_in_cycle == 0:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\nWorker detenido'))
+
+        self.stdout.write(self.style.SUCCESS(f'\nProceso completado: {self.processed} tareas ejecutadas'))
+
+    def _limit_reached(self):
+        return bool(self.max_jobs) and self.processed >= self.max_jobs
+
+    def _cleanup(self, schema_name):
+        cleaned = JobService.cleanup()
+        if cleaned['expired'] or cleaned['stale']:
+            self.stdout.write(
+                f"  {schema_name}: {cleaned['expired']} tareas expiradas eliminadas, "
+                f"{cleaned['stale']} interrumpidas"
+            )
+
+    def _run_cycle(self):
+        TenantModel = get_tenant_model()
+        tenants_qs = TenantModel.objects.exclude(schema_name='public').filter(is_deleted=False)
+
+        if self.schema_name:
+            tenants_qs = tenants_qs.filter(schema_name=self.schema_name)
+
+        run_cleanup = self.last_cleanup is None or time.monotonic() - self.last_cleanup >= self.CLEANUP_INTERVAL
+        if run_cleanup:
+            self.last_cleanup = time.monotonic()
+
+        processed_in_cycle = 0
+        for schema_name in tenants_qs.values_list('schema_name', flat=True):
+            with schema_context(schema_name):
+                if run_cleanup:
+                    self._cleanup(schema_name)
+
+                while not self._limit_reached():
+                    job = JobService.claim_next()
+                    if job is None:
+                        break
+
+                    job = JobService.run(job)
+                    self.processed += 1
+                    processed_in_cycle += 1
+
+                    style = self.style.SUCCESS if job.status == job.StatusChoices.COMPLETED else self.style.ERROR
+                    self.stdout.write(style(f'  {schema_name}: {job}'))
+
+            if self._limit_reached():
+                break
+
+        return processed_in_cycle
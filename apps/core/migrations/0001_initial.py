@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='Fecha de modificación')),
+                ('job_type', models.CharField(max_length=100, verbose_name='Tipo de tarea')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('RUNNING', 'En ejecución'), ('COMPLETED', 'Completada'), ('FAILED', 'Fallida')], default='PENDING', max_length=10, verbose_name='Estado')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='Mensaje')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('requested_by', models.CharField(blank=True, max_length=150, verbose_name='Solicitada por')),
+                ('result_path', models.CharField(blank=True, max_length=500, verbose_name='Ruta del resultado')),
+                ('result_filename', models.CharField(blank=True, max_length=255, verbose_name='Nombre del fichero')),
+                ('result_content_type', models.CharField(blank=True, max_length=100, verbose_name='Tipo de contenido')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Expira')),
+            ],
+            options={
+                'verbose_name': 'Tarea en segundo plano',
+                'verbose_name_plural': 'Tareas en segundo plano',
+                'db_table': 'background_jobs',
+                'ordering': ['-created'],
+                'indexes': [
+                    models.Index(fields=['status', 'created'], name='background__status_e3533f_idx'),
+                    models.Index(fields=['expires_at'], name='background__expires_1e792e_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='result_parts',
+            field=models.JSONField(blank=True, default=list, verbose_name='Partes del resultado'),
+        ),
+    ]
@@ -228,9 +228,7 @@ class ServiceCategoryMixin(CategoryNormalizationMixin):
     def get_category_counts(self, business_line):
         from apps.accounting.models import ClientService
         
-        descendant_ids = business_line.get_descendant_ids()
-        base_queryset = ClientService.objects.filter(
-            business_line__id__in=descendant_ids,
+        base_queryset = ClientService.objects.in_business_line_tree(business_line).filter(
             is_active=True
         )
         
@@ -1,3 +1,4 @@
+import os
 from django.db import models
 from django.utils import timezone
 
@@ -27,3 +28,128 @@ class SoftDeleteModel(models.Model):
         self.is_deleted = False
         self.deleted_at = None
         self.save(update_fields=['is_deleted', 'deleted_at'])
+
+
+class BackgroundJob(TimeStampedModel):
+    """
+    Tarea larga encolada desde la web y ejecutada por `manage.py run_jobs`.
+
+    Vive en el esquema de cada tenant; el fichero resultante se guarda en disco
+    local bajo JOB_RESULTS_ROOT y se elimina al expirar.
+    """
+    
+    class StatusChoices(models.TextChoices):
+        PENDING = 'PENDING', 'Pendiente'
+        RUNNING = 'RUNNING', 'En ejecución'
+        COMPLETED = 'COMPLETED', 'Completada'
+        FAILED = 'FAILED', 'Fallida'
+    
+    job_type = models.CharField(
+        max_length=100,
+        verbose_name="Tipo de tarea"
+    )
+    
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Parámetros"
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+        verbose_name="Estado"
+    )
+    
+    progress = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Progreso (%)"
+    )
+    
+    message = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Mensaje"
+    )
+    
+    error = models.TextField(
+        blank=True,
+        verbose_name="Error"
+    )
+    
+    requested_by = models.CharField(
+        max_length=150,
+        blank=True,
+        verbose_name="Solicitada por"
+    )
+    
+    result_path = models.CharField(
+        max_length=500,
+        blank=True,
+        verbose_name="Ruta del resultado"
+    )
+    
+    result_filename = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Nombre del fichero"
+    )
+    
+    result_content_type = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Tipo de contenido"
+    )
+    
+    # Descargas divididas en varios ficheros: [{'filename': ..., 'size': ...}]
+    result_parts = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Partes del resultado"
+    )
+    
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Inicio"
+    )
+    
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Fin"
+    )
+    
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Expira"
+    )
+    
+    class Meta:
+        db_table = 'background_jobs'
+        verbose_name = "Tarea en segundo plano"
+        verbose_name_plural = "Tareas en segundo plano"
+        ordering = ['-created']
+        indexes = [
+            models.Index(fields=['status', 'created']),
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.job_type} #{self.pk} ({self.get_status_display()})"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.StatusChoices.COMPLETED, self.StatusChoices.FAILED)
+    
+    @property
+    def has_result(self):
+        return self.status == self.StatusChoices.COMPLETED and bool(self.result_path)
+    
+    def get_part_path(self, index):
+        """Ruta de la parte `index` del resultado, o None si no existe."""
+        if not 0 <= index < len(self.result_parts):
+            return None
+        return os.path.join(os.path.dirname(self.result_path), self.result_parts[index]['filename'])
@@ -0,0 +1,218 @@
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import ContextDecorator
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.response import SimpleTemplateResponse
+
+from apps.core import diagnostics
+from apps.core.diagnostics import QueryCounter
+
+logger = logging.getLogger(__name__)
+
+APPS_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Envoltorios de ejecución que pueden aparecer en la pila por encima del origen real
+_INSTRUMENTATION_FILES = {os.path.abspath(__file__), os.path.abspath(diagnostics.__file__)}
+
+_IN_LIST = re.compile(r'\((?:\s*%s\s*,)*\s*%s\s*\)')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+\b')
+
+
+def sql_shape(sql):
+    """
+    Forma de una consulta: el SQL sin valores concretos.
+    
+    Las listas IN de distinta longitud y los literales incrustados (LIMIT,
+    OFFSET, cadenas) se normalizan para que las consultas que sólo difieren
+    en sus parámetros compartan forma.
+    """
+    sql = _IN_LIST.sub('(%s, ...)', sql)
+    sql = _STRING_LITERAL.sub("'?'", sql)
+    return _NUMBER_LITERAL.sub('?', sql)
+
+
+def find_call_site():
+    """Primer marco de la pila que pertenece al código de apps/, sin contar la instrumentación."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APPS_ROOT) and filename not in _INSTRUMENTATION_FILES:
+            return f'{os.path.relpath(filename, os.path.dirname(APPS_ROOT))}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Se ha superado el presupuesto de consultas declarado."""
+    
+    def __init__(self, message, recorder):
+        super().__init__(message)
+        self.recorder = recorder
+
+
+class QueryRecorder(QueryCounter):
+    """QueryCounter que además agrupa las consultas por forma y recuerda desde dónde se lanzó cada una."""
+    
+    def __init__(self):
+        super().__init__()
+        self.shapes = Counter()
+        self.call_sites = {}
+    
+    def __call__(self, execute, sql, params, many, context):
+        shape = sql_shape(sql)
+        self.shapes[shape] += 1
+        if shape not in self.call_sites:
+            self.call_sites[shape] = find_call_site()
+        return super().__call__(execute, sql, params, many, context)
+    
+    def repeated(self, threshold):
+        """Formas lanzadas al menos `threshold` veces: (forma, veces, origen)."""
+        return [
+            (shape, count, self.call_sites.get(shape))
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+    
+    def describe(self, limit=5):
+        lines = []
+        for shape, count, call_site in self.repeated(1)[:limit]:
+            lines.append(f'  {count}x {call_site or "?"}: {shape}')
+        return '\n'.join(lines)
+
+
+class QueryBudget(ContextDecorator):
+    """
+    Presupuesto de consultas SQL para un bloque, una vista o una llamada a un servicio.
+    
+    Uso como context manager o decorador:
+        
+        with QueryBudget(10, name='exportación'):
+            ...
+        
+        @query_budget(15)
+        def revenue_summary_view(request): ...
+        
+        @method_decorator(query_budget(20), name='dispatch')
+        class ExpiringServicesView(ListView): ...
+    
+    `max_queries` limita el total y `max_repeats` las veces que puede
+    repetirse una misma forma de consulta (N+1). Al superarse se aplica
+    `action` (por defecto QUERY_BUDGET_ACTION): RAISE lanza
+    QueryBudgetExceeded, LOG emite un warning con las consultas más
+    repetidas y su origen, OFF no mide nada.
+    
+    Como decorador, las TemplateResponse se renderizan dentro del
+    presupuesto para que cuenten las consultas de la plantilla.
+    """
+    
+    RAISE = 'raise'
+    LOG = 'log'
+    OFF = 'off'
+    
+    def __init__(self, max_queries=None, name=None, action=None, max_repeats=None):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+        self.name = name
+        self.action = action
+        self.recorder = None
+        self._wrapper = None
+    
+    def _recreate_cm(self):
+        return type(self)(self.max_queries, self.name, self.action, self.max_repeats)
+    
+    def get_action(self):
+        return self.action or settings.QUERY_BUDGET_ACTION
+    
+    def __call__(self, func):
+        if self.name is None:
+            self.name = getattr(func, '__qualname__', repr(func))
+        
+        @wraps(func)
+        def inner(*args, **kwargs):
+            with self._recreate_cm():
+                result = func(*args, **kwargs)
+                if isinstance(result, SimpleTemplateResponse) and not result.is_rendered:
+                    result.render()
+                return result
+        return inner
+    
+    def __enter__(self):
+        self.recorder = QueryRecorder()
+        if self.get_action() != self.OFF:
+            self._wrapper = connection.execute_wrapper(self.recorder)
+            self._wrapper.__enter__()
+        return self.recorder
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._wrapper is None:
+            return False
+        self._wrapper.__exit__(exc_type, exc_value, traceback)
+        self._wrapper = None
+        
+        if exc_type is None:
+            problems = self.get_problems()
+            if problems:
+                self.report(problems)
+        return False
+    
+    def get_problems(self):
+        problems = []
+        if self.max_queries is not None and self.recorder.count > self.max_queries:
+            problems.append(f'{self.recorder.count} consultas (máximo {self.max_queries})')
+        if self.max_repeats is not None:
+            for shape, count, call_site in self.recorder.repeated(self.max_repeats + 1):
+                problems.append(
+                    f'{count} consultas con la misma forma (máximo {self.max_repeats}) desde {call_site or "?"}'
+                )
+        return problems
+    
+    def report(self, problems):
+        message = (
+            f'Presupuesto de consultas superado en {self.name or "bloque"}: '
+            + '; '.join(problems)
+            + '\n' + self.recorder.describe()
+        )
+        if self.get_action() == self.RAISE:
+            raise QueryBudgetExceeded(message, self.recorder)
+        logger.warning(message)
+
+
+def query_budget(max_queries=None, name=None, action=None, max_repeats=None):
+    return QueryBudget(max_queries, name=name, action=action, max_repeats=max_repeats)
+
+
+class QueryInspectionMiddleware:
+    """
+    Detección de N+1 en desarrollo.
+    
+    Agrupa las consultas de cada petición por forma y registra un warning,
+    con el origen en apps/, para cada forma repetida al menos
+    QUERY_INSPECTION_REPEAT_THRESHOLD veces. Con QUERY_INSPECTION_ENABLED a
+    False (por defecto fuera de DEBUG) se retira de la cadena al arrancar.
+    """
+    
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.QUERY_INSPECTION_REPEAT_THRESHOLD
+    
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        
+        for shape, count, call_site in recorder.repeated(self.threshold):
+            logger.warning(
+                'Posible N+1 en %s %s: %d consultas con la misma forma desde %s: %s',
+                request.method, request.path, count, call_site or '?', shape
+            )
+        return response
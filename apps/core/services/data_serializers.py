@@ -1,57 +1,110 @@
 import csv
 import json
-from io import StringIO, BytesIO, TextIOWrapper
-from typing import Dict, List, Any, Optional
+import tempfile
+from io import StringIO
+from itertools import chain
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
 from abc import ABC, abstractmethod
-from django.utils import timezone
 import zipfile
 
 
+TableRows = Tuple[str, Iterable[Dict[str, Any]]]
+
+
 class BaseDataSerializer(ABC):
+    content_type = 'application/octet-stream'
+    
+    # Tamaño aproximado de cada bloque de bytes que se entrega al cliente
+    CHUNK_SIZE = 64 * 1024
+    
     @abstractmethod
-    def serialize(self, data: Dict[str, List[Dict[str, Any]]], metadata: Dict[str, Any]) -> bytes:
+    def stream(self, tables: Iterable[TableRows], metadata: Dict[str, Any]) -> Iterator[bytes]:
+        """
+        Serializa las tablas de forma incremental.
+        
+        `tables` es un iterable de pares (nombre, filas) en el que las filas se
+        consumen una sola vez; las tablas sin filas se omiten.
+        """
         pass
+    
+    def serialize(self, data: Dict[str, List[Dict[str, Any]]], metadata: Dict[str, Any]) -> bytes:
+        return b''.join(self.stream(data.items(), metadata))
+    
+    @staticmethod
+    def _non_empty(rows: Iterable[Dict[str, Any]]) -> Optional[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+        """Devuelve la primera fila y un iterador con todas, o None si no hay filas."""
+        rows = iter(rows)
+        first_row = next(rows, None)
+        if first_row is None:
+            return None
+        return first_row, chain([first_row], rows)
+    
+    def _csv_chunks(self, first_row: Dict[str, Any], rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        buffer = StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(first_row.keys()))
+        writer.writeheader()
+        
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= self.CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        yield buffer.getvalue()
 
 
 class CSVDataSerializer(BaseDataSerializer):
-    def serialize(self, data: Dict[str, List[Dict[str, Any]]], metadata: Dict[str, Any]) -> bytes:
-        output = BytesIO()
-        
-        for table_name, records in data.items():
-            if not records:
+    content_type = 'text/csv'
+    
+    def stream(self, tables: Iterable[TableRows], metadata: Dict[str, Any]) -> Iterator[bytes]:
+        for table_name, records in tables:
+            table = self._non_empty(records)
+            if not table:
                 continue
-                
-            csv_output = StringIO()
-            if records:
-                fieldnames = records[0].keys()
-                writer = csv.DictWriter(csv_output, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(records)
             
-            output.write(f"=== {table_name.upper()} ===\n".encode('utf-8'))
-            output.write(csv_output.getvalue().encode('utf-8'))
-            output.write(b"\n\n")
-        
-        output.seek(0)
-        return output.getvalue()
+            yield f"=== {table_name.upper()} ===\n".encode('utf-8')
+            for chunk in self._csv_chunks(*table):
+                yield chunk.encode('utf-8')
+            yield b"\n\n"
+
+
+class _ZipStreamBuffer:
+    """Destino no posicionable para ZipFile: acumula lo escrito hasta que se drena."""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
 
 
 class ZIPDataSerializer(BaseDataSerializer):
-    def serialize(self, data: Dict[str, List[Dict[str, Any]]], metadata: Dict[str, Any]) -> bytes:
-        output = BytesIO()
-        zip_buffer = zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED)
+    content_type = 'application/zip'
+    
+    def stream(self, tables: Iterable[TableRows], metadata: Dict[str, Any]) -> Iterator[bytes]:
+        buffer = _ZipStreamBuffer()
+        zip_file = zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED)
         
-        for table_name, records in data.items():
-            if not records:
+        for table_name, records in tables:
+            table = self._non_empty(records)
+            if not table:
                 continue
-                
-            csv_output = StringIO()
-            fieldnames = records[0].keys()
-            writer = csv.DictWriter(csv_output, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(records)
             
-            zip_buffer.writestr(f"{table_name}.csv", csv_output.getvalue())
+            with zip_file.open(f"{table_name}.csv", 'w', force_zip64=True) as entry:
+                for chunk in self._csv_chunks(*table):
+                    entry.write(chunk.encode('utf-8'))
+                    yield buffer.drain()
+            yield buffer.drain()
         
         metadata_output = StringIO()
         metadata_writer = csv.DictWriter(metadata_output, fieldnames=['key', 'value'])
@@ -59,101 +112,113 @@ class ZIPDataSerializer(BaseDataSerializer):
         for key, value in metadata.items():
             metadata_writer.writerow({'key': key, 'value': str(value)})
         
-        zip_buffer.writestr("metadata.csv", metadata_output.getvalue())
-        zip_buffer.close()
-        
-        output.seek(0)
-        return output.getvalue()
+        zip_file.writestr("metadata.csv", metadata_output.getvalue())
+        zip_file.close()
+        yield buffer.drain()
 
 
 class ExcelDataSerializer(BaseDataSerializer):
-    def serialize(self, data: Dict[str, List[Dict[str, Any]]], metadata: Dict[str, Any]) -> bytes:
+    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    
+    MAX_COLUMN_WIDTH = 50
+    MIN_COLUMN_WIDTH = 12
+    
+    def stream(self, tables: Iterable[TableRows], metadata: Dict[str, Any]) -> Iterator[bytes]:
         try:
             from openpyxl import Workbook
+            from openpyxl.cell import WriteOnlyCell
             from openpyxl.styles import Font, PatternFill, Alignment
+            from openpyxl.utils import get_column_letter
         except ImportError:
             raise ImportError("openpyxl is required for Excel export. Install it with: pip install openpyxl")
         
-        wb = Workbook()
-        
-        # Remover la hoja por defecto
-        wb.remove(wb.active)
+        # Modo solo escritura: las filas se vuelcan a disco según se añaden
+        wb = Workbook(write_only=True)
         
-        # Crear hoja de metadatos
-        metadata_ws = wb.create_sheet("Información General")
-        metadata_ws.append(["Campo", "Valor"])
-        
-        # Estilos para encabezados
         header_font = Font(bold=True, color="FFFFFF")
         header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        header_alignment = Alignment(horizontal="center")
         
+        def header_row(ws, headers):
+            cells = []
+            for header in headers:
+                cell = WriteOnlyCell(ws, value=header)
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.alignment = header_alignment
+                cells.append(cell)
+            return cells
+        
+        # Crear hoja de metadatos
+        metadata_ws = wb.create_sheet("Información General")
+        metadata_ws.append(header_row(metadata_ws, ["Campo", "Valor"]))
         for key, value in metadata.items():
             metadata_ws.append([key, str(value)])
         
-        # Aplicar estilos a encabezados de metadatos
-        for cell in metadata_ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center")
-        
         # Crear hojas para cada tabla de datos
-        for table_name, records in data.items():
-            if not records:
+        for table_name, records in tables:
+            table = self._non_empty(records)
+            if not table:
                 continue
-                
+            first_row, rows = table
+            
             ws = wb.create_sheet(table_name.replace('_', ' ').title())
+            headers = list(first_row.keys())
+            
+            # Sin acceso posterior a las celdas, el ancho se fija según el encabezado
+            for index, header in enumerate(headers, start=1):
+                width = min(max(len(str(header)) + 2, self.MIN_COLUMN_WIDTH), self.MAX_COLUMN_WIDTH)
+                ws.column_dimensions[get_column_letter(index)].width = width
             
-            if records:
-                # Añadir encabezados
-                headers = list(records[0].keys())
-                ws.append(headers)
-                
-                # Aplicar estilos a encabezados
-                for cell in ws[1]:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = Alignment(horizontal="center")
-                
-                # Añadir datos
-                for record in records:
-                    row_data = []
-                    for header in headers:
-                        value = record.get(header, '')
-                        # Convertir valores complejos a string
-                        if value is None:
-                            value = ''
-                        elif not isinstance(value, (str, int, float, bool)):
-                            value = str(value)
-                        row_data.append(value)
-                    ws.append(row_data)
-                
-                # Ajustar ancho de columnas
-                for column in ws.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    ws.column_dimensions[column_letter].width = adjusted_width
+            ws.append(header_row(ws, headers))
+            
+            for record in rows:
+                row_data = []
+                for header in headers:
+                    value = record.get(header, '')
+                    # Convertir valores complejos a string
+                    if value is None:
+                        value = ''
+                    elif not isinstance(value, (str, int, float, bool)):
+                        value = str(value)
+                    row_data.append(value)
+                ws.append(row_data)
         
-        # Guardar en memoria
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return output.getvalue()
+        with tempfile.TemporaryFile() as output:
+            wb.save(output)
+            output.seek(0)
+            while True:
+                chunk = output.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
 
 
 class JSONDataSerializer(BaseDataSerializer):
-    def serialize(self, data: Dict[str, List[Dict[str, Any]]], metadata: Dict[str, Any]) -> bytes:
-        export_data = {
-            'metadata': metadata,
-            'data': data
-        }
-        return json.dumps(export_data, indent=2, default=str).encode('utf-8')
+    content_type = 'application/json'
+    
+    def stream(self, tables: Iterable[TableRows], metadata: Dict[str, Any]) -> Iterator[bytes]:
+        yield b'{\n  "metadata": '
+        yield json.dumps(metadata, default=str).encode('utf-8')
+        yield b',\n  "data": {'
+        
+        first_table = True
+        for table_name, records in tables:
+            table = self._non_empty(records)
+            if not table:
+                continue
+            
+            prefix = '\n    ' if first_table else ',\n    '
+            first_table = False
+            yield f'{prefix}{json.dumps(table_name)}: ['.encode('utf-8')
+            
+            separator = '\n      '
+            for record in table[1]:
+                yield f'{separator}{json.dumps(record, default=str)}'.encode('utf-8')
+                separator = ',\n      '
+            yield b'\n    ]'
+        
+        yield b'\n  }\n}\n'
 
 
 class DataSerializerFactory:
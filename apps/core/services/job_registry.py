@@ -0,0 +1,47 @@
+from typing import Callable, Dict, List
+
+
+class JobRegistry:
+    _handlers: Dict[str, Callable] = {}
+    _loaded = False
+    
+    @classmethod
+    def _ensure_loaded(cls):
+        if not cls._loaded:
+            cls._load_handlers()
+            cls._loaded = True
+    
+    @classmethod
+    def _load_handlers(cls):
+        from ..jobs import exports
+        from ..jobs import invoicing
+    
+    @classmethod
+    def register(cls, job_type: str, handler: Callable):
+        cls._handlers[job_type] = handler
+    
+    @classmethod
+    def get_handler(cls, job_type: str) -> Callable:
+        cls._ensure_loaded()
+        return cls._handlers.get(job_type)
+    
+    @classmethod
+    def list_registered(cls) -> List[str]:
+        cls._ensure_loaded()
+        return list(cls._handlers.keys())
+
+
+def register_job_handler(job_type: str):
+    """
+    Registra la función que ejecuta un tipo de tarea.
+    
+    La función recibe `(job, output, report_progress)`: escribe el resultado en
+    el fichero binario `output`, informa del avance con
+    `report_progress(porcentaje, mensaje)` y devuelve un dict con `filename`,
+    `content_type` y opcionalmente `message`. Si en lugar de `output` escribe
+    varios ficheros en el directorio de la tarea, los lista en `parts`.
+    """
+    def decorator(handler: Callable):
+        JobRegistry.register(job_type, handler)
+        return handler
+    return decorator
@@ -0,0 +1,179 @@
+import logging
+import os
+import shutil
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from apps.core.models import BackgroundJob
+from .job_registry import JobRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class JobService:
+    """
+    Cola de tareas largas respaldada por la tabla `background_jobs` del tenant.
+    
+    La web sólo encola y consulta el estado; `manage.py run_jobs` reclama las
+    tareas pendientes con `SELECT ... FOR UPDATE SKIP LOCKED`, de modo que
+    varios workers pueden repartirse la cola sin pisarse.
+    """
+    
+    PARTIAL_FILENAME = 'result.part'
+    
+    @staticmethod
+    def enqueue(job_type: str, params: Optional[Dict[str, Any]] = None, requested_by: str = '') -> BackgroundJob:
+        if JobRegistry.get_handler(job_type) is None:
+            raise ValueError(f"Tipo de tarea no registrado: {job_type}")
+        
+        return BackgroundJob.objects.create(
+            job_type=job_type,
+            params=params or {},
+            requested_by=requested_by or '',
+            message='En cola'
+        )
+    
+    @staticmethod
+    def claim_next() -> Optional[BackgroundJob]:
+        with transaction.atomic():
+            job = (
+                BackgroundJob.objects
+                .select_for_update(skip_locked=True)
+                .filter(status=BackgroundJob.StatusChoices.PENDING)
+                .order_by('created')
+                .first()
+            )
+            if job is None:
+                return None
+            
+            job.status = BackgroundJob.StatusChoices.RUNNING
+            job.started_at = timezone.now()
+            job.progress = 0
+            job.message = 'En ejecución'
+            job.save(update_fields=['status', 'started_at', 'progress', 'message', 'modified'])
+        return job
+    
+    @staticmethod
+    def get_result_dir(job: BackgroundJob) -> str:
+        return os.path.join(settings.JOB_RESULTS_ROOT, connection.schema_name, str(job.pk))
+    
+    @staticmethod
+    def run(job: BackgroundJob) -> BackgroundJob:
+        directory = JobService.get_result_dir(job)
+        os.makedirs(directory, exist_ok=True)
+        partial_path = os.path.join(directory, JobService.PARTIAL_FILENAME)
+        
+        last_progress = {'value': None}
+        
+        def report_progress(percent, message=''):
+            percent = max(0, min(int(percent), 99))
+            if percent == last_progress['value']:
+                return
+            last_progress['value'] = percent
+            BackgroundJob.objects.filter(pk=job.pk).update(
+                progress=percent, message=message[:255], modified=timezone.now()
+            )
+        
+        try:
+            handler = JobRegistry.get_handler(job.job_type)
+            if handler is None:
+                raise ValueError(f"Tipo de tarea no registrado: {job.job_type}")
+            
+            with open(partial_path, 'wb') as output:
+                result = handler(job, output, report_progress)
+            
+            parts = result.get('parts')
+            if parts:
+                # El handler ha escrito varios ficheros en el directorio de la tarea
+                os.remove(partial_path)
+                # Las partes sin ningún fichero generado se descartan
+                parts = [name for name in parts if os.path.exists(os.path.join(directory, name))]
+                if not parts:
+                    raise ValueError('La tarea no generó ningún fichero')
+                job.result_parts = [
+                    {'filename': name, 'size': os.path.getsize(os.path.join(directory, name))}
+                    for name in parts
+                ]
+                filename = parts[0]
+                result_path = os.path.join(directory, filename)
+            else:
+                filename = get_valid_filename(result['filename'])
+                result_path = os.path.join(directory, filename)
+                os.replace(partial_path, result_path)
+            
+            now = timezone.now()
+            job.status = BackgroundJob.StatusChoices.COMPLETED
+            job.progress = 100
+            job.message = result.get('message', '')[:255]
+            job.result_path = result_path
+            job.result_filename = filename
+            job.result_content_type = result.get('content_type', 'application/octet-stream')
+            job.finished_at = now
+            job.expires_at = now + timedelta(hours=settings.JOB_RESULT_TTL_HOURS)
+            logger.info(f"Job {job.pk} ({job.job_type}) completed: {filename}")
+        except Exception as e:
+            logger.exception(f"Job {job.pk} ({job.job_type}) failed")
+            shutil.rmtree(directory, ignore_errors=True)
+            
+            now = timezone.now()
+            job.status = BackgroundJob.StatusChoices.FAILED
+            job.error = str(e)
+            job.message = 'Error al ejecutar la tarea'
+            job.finished_at = now
+            job.expires_at = now + timedelta(hours=settings.JOB_RESULT_TTL_HOURS)
+        
+        job.save()
+        return job
+    
+    @staticmethod
+    def cleanup(now=None) -> Dict[str, int]:
+        """
+        Borra las tareas expiradas junto con sus ficheros y marca como fallidas
+        las que llevan más de JOB_STALE_MINUTES en ejecución (worker caído).
+        """
+        now = now or timezone.now()
+        
+        stale_count = BackgroundJob.objects.filter(
+            status=BackgroundJob.StatusChoices.RUNNING,
+            started_at__lt=now - timedelta(minutes=settings.JOB_STALE_MINUTES)
+        ).update(
+            status=BackgroundJob.StatusChoices.FAILED,
+            error='La tarea se interrumpió antes de terminar',
+            message='Error al ejecutar la tarea',
+            finished_at=now,
+            expires_at=now + timedelta(hours=settings.JOB_RESULT_TTL_HOURS),
+            modified=now
+        )
+        
+        expired = BackgroundJob.objects.filter(expires_at__lt=now)
+        for job in expired.only('pk'):
+            shutil.rmtree(JobService.get_result_dir(job), ignore_errors=True)
+        expired_count, _ = expired.delete()
+        
+        return {'expired': expired_count, 'stale': stale_count}
+    
+    @staticmethod
+    def get_status_data(job: BackgroundJob, download_url: str = '') -> Dict[str, Any]:
+        parts = []
+        if job.has_result and download_url:
+            parts = [
+                {'filename': part['filename'], 'size': part['size'], 'url': f"{download_url}?part={index}"}
+                for index, part in enumerate(job.result_parts)
+            ]
+        return {
+            'job_id': job.pk,
+            'job_type': job.job_type,
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'progress': job.progress,
+            'message': job.message,
+            'error': job.error,
+            'finished': job.is_finished,
+            'download_url': download_url if job.has_result else '',
+            'parts': parts,
+        }
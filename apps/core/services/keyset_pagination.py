@@ -0,0 +1,105 @@
+import base64
+import json
+from typing import Any, List, Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+
+class KeysetPage:
+    """Página obtenida por cursor; no conoce el número total de páginas."""
+    
+    def __init__(self, object_list: List[Any], next_cursor: Optional[str], previous_cursor: Optional[str]):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+    
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+    
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+    
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+    
+    def __iter__(self):
+        return iter(self.object_list)
+    
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginación por cursor sobre un campo de ordenación más la clave primaria.
+    
+    Cada página se obtiene con un WHERE (campo, pk) > cursor y un LIMIT, de
+    modo que su coste depende del tamaño de la página y no de la posición en
+    el histórico, y no hace falta contar las filas. El cursor codifica el
+    valor del campo y la pk de la última (o primera) fila mostrada.
+    """
+    
+    def __init__(self, queryset: QuerySet, ordering: str, per_page: int):
+        self.queryset = queryset
+        self.field_name = ordering.lstrip('-')
+        self.descending = ordering.startswith('-')
+        self.per_page = per_page
+        self.field = queryset.model._meta.get_field(self.field_name)
+    
+    def encode_cursor(self, obj) -> str:
+        payload = [self.field.value_to_string(obj), obj.pk]
+        return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+    
+    def decode_cursor(self, cursor: str):
+        """Devuelve (valor, pk) o None si el cursor no es válido."""
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return self.field.to_python(value), int(pk)
+        except (ValueError, TypeError, UnicodeError, ValidationError):
+            return None
+    
+    def _seek(self, queryset, position, descending):
+        value, pk = position
+        lookup = 'lt' if descending else 'gt'
+        # La condición redundante lte/gte acota el recorrido del índice sobre el campo
+        return queryset.filter(
+            Q(**{f'{self.field_name}__{lookup}e': value}),
+            Q(**{f'{self.field_name}__{lookup}': value}) |
+            Q(**{self.field_name: value, f'pk__{lookup}': pk})
+        )
+    
+    def _order(self, queryset, descending):
+        prefix = '-' if descending else ''
+        return queryset.order_by(f'{prefix}{self.field_name}', f'{prefix}pk')
+    
+    def get_page(self, after: Optional[str] = None, before: Optional[str] = None) -> KeysetPage:
+        position = None
+        backwards = False
+        if before:
+            position = self.decode_cursor(before)
+            backwards = position is not None
+        if position is None and after:
+            position = self.decode_cursor(after)
+        
+        # Hacia atrás se recorre en orden inverso y se da la vuelta al resultado
+        descending = self.descending != backwards
+        queryset = self.queryset
+        if position is not None:
+            queryset = self._seek(queryset, position, descending)
+        
+        rows = list(self._order(queryset, descending)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0]) if rows and has_previous else None,
+        )
@@ -0,0 +1,52 @@
+import threading
+
+from django.db import connection
+
+
+class SchemaCapabilities:
+    """
+    Detección de columnas opcionales del esquema activo, cacheada por proceso.
+    
+    Cada combinación (esquema, tabla, columna) se consulta en information_schema
+    una sola vez; las peticiones siguientes no hacen consultas al catálogo.
+    La caché se vacía con post_migrate (ver CoreConfig.ready); los procesos que
+    no ejecutan la migración la renuevan al reiniciarse tras el despliegue.
+    Los errores de consulta no se cachean.
+    """
+    
+    _columns = {}
+    _lock = threading.Lock()
+    
+    @classmethod
+    def has_column(cls, table_name, column_name):
+        key = (getattr(connection, 'schema_name', None), table_name, column_name)
+        cached = cls._columns.get(key)
+        if cached is not None:
+            return cached
+        
+        try:
+            exists = cls._query_column(table_name, column_name)
+        except Exception:
+            return False
+        
+        with cls._lock:
+            cls._columns[key] = exists
+        return exists
+    
+    @staticmethod
+    def _query_column(table_name, column_name):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT 1
+                FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                AND table_name = %s
+                AND column_name = %s
+            """, [table_name, column_name])
+            return cursor.fetchone() is not None
+    
+    @classmethod
+    def clear(cls, **kwargs):
+        """Vacía la caché; admite los argumentos de una señal para usarse como receptor."""
+        with cls._lock:
+            cls._columns.clear()
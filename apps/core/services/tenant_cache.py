@@ -0,0 +1,190 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """LRU en memoria del proceso con caducidad por entrada."""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any, timeout) -> None:
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+
+class TenantCache:
+    """
+    Caché de resultados calculados, aislada por esquema de tenant.
+    
+    Las claves llevan el esquema activo y la generación de cada espacio de
+    invalidación del que depende el resultado (REVENUE, EXPENSES,
+    HIERARCHY). Invalidar un espacio es escribir una generación nueva: las
+    entradas anteriores dejan de ser alcanzables sin recorrer el backend y
+    caducan solas. Los valores se sirven primero desde un LRU local del
+    proceso y, si no están, desde el backend compartido (TENANT_CACHE_ALIAS);
+    las generaciones se leen siempre del backend, de modo que una escritura
+    en un proceso invalida también lo cacheado en los demás.
+    
+    La invalidación se aplica tras el commit. Mientras la transacción en
+    curso tenga invalidaciones pendientes, los resultados que dependen de
+    ellas se calculan sin caché para no guardar datos no confirmados.
+    
+    Los valores devueltos son compartidos y no deben modificarse.
+    """
+    
+    REVENUE = 'revenue'
+    EXPENSES = 'expenses'
+    HIERARCHY = 'hierarchy'
+    
+    PENDING_INVALIDATIONS_ATTR = '_pending_tenant_cache_invalidations'
+    
+    _local = None
+    
+    @classmethod
+    def get_backend(cls):
+        return caches[settings.TENANT_CACHE_ALIAS]
+    
+    @classmethod
+    def get_local(cls) -> LocalLRUCache:
+        if cls._local is None:
+            cls._local = LocalLRUCache(settings.TENANT_CACHE_LOCAL_MAX_ENTRIES)
+        return cls._local
+    
+    @staticmethod
+    def _schema() -> str:
+        return getattr(connection, 'schema_name', 'public')
+    
+    @staticmethod
+    def _generation_key(schema: str, namespace: str) -> str:
+        return f'tenant:{schema}:generation:{namespace}'
+    
+    @classmethod
+    def _get_generations(cls, schema: str, namespaces: Iterable[str]) -> Tuple[str, ...]:
+        backend = cls.get_backend()
+        keys = [cls._generation_key(schema, namespace) for namespace in namespaces]
+        stored = backend.get_many(keys)
+        
+        generations = []
+        for key in keys:
+            generation = stored.get(key)
+            if generation is None:
+                # Primera lectura o generación expulsada: se abre una nueva, nunca se
+                # vuelve a una anterior que pudiera tener entradas obsoletas
+                token = uuid.uuid4().hex
+                backend.add(key, token, None)
+                generation = backend.get(key) or token
+            generations.append(generation)
+        return tuple(generations)
+    
+    @classmethod
+    def make_key(cls, name: str, parts: tuple, depends_on: Iterable[str]) -> str:
+        schema = cls._schema()
+        generations = cls._get_generations(schema, depends_on)
+        digest = hashlib.sha1(repr((parts, generations)).encode('utf-8')).hexdigest()
+        return f'tenant:{schema}:{name}:{digest}'
+    
+    @classmethod
+    def get_or_set(cls, name: str, parts: tuple, builder: Callable[[], Any],
+                   depends_on: Iterable[str], timeout=None) -> Any:
+        """
+        Devuelve el resultado cacheado de `name` para `parts` o lo calcula con
+        `builder`. `parts` debe identificar por completo los argumentos del
+        cálculo (fechas incluidas) y tener un repr estable.
+        """
+        depends_on = tuple(depends_on)
+        if cls._has_pending_invalidations(depends_on):
+            return builder()
+        
+        timeout = settings.TENANT_CACHE_TIMEOUT if timeout is None else timeout
+        key = cls.make_key(name, parts, depends_on)
+        
+        local = cls.get_local()
+        value = local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        
+        backend = cls.get_backend()
+        value = backend.get(key, _MISSING)
+        if value is _MISSING:
+            value = builder()
+            backend.set(key, value, timeout)
+        local.set(key, value, timeout)
+        return value
+    
+    @classmethod
+    def invalidate(cls, *namespaces: str) -> None:
+        """
+        Invalida, tras el commit, los resultados del tenant activo que dependen
+        de los espacios indicados. Fuera de una transacción es inmediato.
+        """
+        schema = cls._schema()
+        entries = {(schema, namespace) for namespace in namespaces}
+        
+        pending = getattr(connection, cls.PENDING_INVALIDATIONS_ATTR, None)
+        if pending is not None and cls._is_flush_scheduled():
+            pending.update(entries)
+            return
+        
+        setattr(connection, cls.PENDING_INVALIDATIONS_ATTR, entries)
+        transaction.on_commit(cls.flush_invalidations)
+    
+    @classmethod
+    def flush_invalidations(cls) -> None:
+        entries = getattr(connection, cls.PENDING_INVALIDATIONS_ATTR, None)
+        setattr(connection, cls.PENDING_INVALIDATIONS_ATTR, None)
+        if not entries:
+            return
+        
+        cls.get_backend().set_many(
+            {cls._generation_key(schema, namespace): uuid.uuid4().hex for schema, namespace in entries},
+            None
+        )
+    
+    @classmethod
+    def _has_pending_invalidations(cls, namespaces: Tuple[str, ...]) -> bool:
+        pending = getattr(connection, cls.PENDING_INVALIDATIONS_ATTR, None)
+        if not pending or not cls._is_flush_scheduled():
+            return False
+        schema = cls._schema()
+        return any((schema, namespace) in pending for namespace in namespaces)
+    
+    @classmethod
+    def _is_flush_scheduled(cls) -> bool:
+        # Un rollback descarta el callback pendiente; en ese caso hay que registrarlo de nuevo
+        return any(entry[1] == cls.flush_invalidations for entry in connection.run_on_commit)
@@ -1,5 +1,5 @@
 import uuid
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterator, Optional, Tuple
 from django.utils import timezone
 from django_tenants.utils import connection, tenant_context
 from .export_registry import ExportRegistry
@@ -7,30 +7,38 @@ from .data_serializers import DataSerializerFactory
 
 
 class TenantDataExporter:
-    def __init__(self, tenant=None, format='zip', options=None):
+    def __init__(self, tenant=None, format='zip', options=None, progress_callback=None):
         self.tenant = tenant or connection.tenant
         self.format = format
         self.options = options or {}
+        # progress_callback(tablas_iniciadas, total_tablas, nombre)
+        self.progress_callback = progress_callback
         self.export_id = str(uuid.uuid4())
         self.serializer = DataSerializerFactory.get(format)
     
     def export_all(self) -> bytes:
+        return b''.join(self.stream())
+    
+    def stream(self) -> Iterator[bytes]:
+        """
+        Genera la exportación por bloques: cada exportador entrega sus filas desde
+        un cursor y el serializador las escribe según llegan, con memoria constante.
+        """
         with tenant_context(self.tenant):
-            return self._perform_export()
+            yield from self.serializer.stream(self._iter_tables(), self._build_metadata())
+    
+    @property
+    def content_type(self) -> str:
+        return self.serializer.content_type
     
-    def _perform_export(self) -> bytes:
+    def _iter_tables(self) -> Iterator[Tuple[str, Iterator[Dict[str, Any]]]]:
         exporters = ExportRegistry.get_tenant_exporters(self.tenant)
-        data = {}
-        
-        for name, exporter_class in exporters.items():
-            if self._should_export(name):
-                exporter = exporter_class()
-                table_data = exporter.get_data()
-                if table_data:
-                    data[name] = table_data
+        selected = [(name, exporter_class) for name, exporter_class in exporters.items() if self._should_export(name)]
         
-        metadata = self._build_metadata()
-        return self.serializer.serialize(data, metadata)
+        for index, (name, exporter_class) in enumerate(selected):
+            if self.progress_callback:
+                self.progress_callback(index, len(selected), name)
+            yield name, exporter_class().iter_rows()
     
     def _should_export(self, exporter_name: str) -> bool:
         if not self.options.get('selected_exporters'):
@@ -64,8 +72,8 @@ class TenantDataExporter:
 
 class ExportManager:
     @classmethod
-    def create_export(cls, tenant=None, format='zip', options=None) -> TenantDataExporter:
-        return TenantDataExporter(tenant=tenant, format=format, options=options)
+    def create_export(cls, tenant=None, format='zip', options=None, progress_callback=None) -> TenantDataExporter:
+        return TenantDataExporter(tenant=tenant, format=format, options=options, progress_callback=progress_callback)
     
     @classmethod
     def get_available_formats(cls) -> List[str]:
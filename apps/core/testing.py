@@ -0,0 +1,23 @@
+from apps.core.query_budget import QueryBudget
+
+
+class QueryBudgetTestMixin:
+    """
+    Aserciones de presupuesto de consultas para TestCase.
+    
+    Fallan siempre (QueryBudgetExceeded es un AssertionError), sea cual sea
+    QUERY_BUDGET_ACTION, así que sirven igual con el runner de Django que
+    con pytest:
+        
+        with self.assertQueryBudget(12):
+            self.client.get(url)
+        
+        with self.assertNoRepeatedQueries(max_repeats=2):
+            build_report()
+    """
+    
+    def assertQueryBudget(self, max_queries, max_repeats=None, name=None):
+        return QueryBudget(max_queries, name=name or self.id(), action=QueryBudget.RAISE, max_repeats=max_repeats)
+    
+    def assertNoRepeatedQueries(self, max_repeats=1, name=None):
+        return QueryBudget(name=name or self.id(), action=QueryBudget.RAISE, max_repeats=max_repeats)
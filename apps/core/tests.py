@@ -0,0 +1,265 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django_tenants.test.cases import TenantTestCase
+
+from apps.accounting.models import Client, ClientService, ServicePayment
+from apps.business_lines.models import BusinessLine
+from apps.core.diagnostics import RequestDiagnostics, RequestDiagnosticsMiddleware
+from apps.core.exporters.accounting import ClientExporter
+from apps.core.exporters.business_lines import BusinessLineExporter
+from apps.core.exporters.expenses import ExpenseCategoryExporter
+from apps.core.exporters.invoicing import InvoiceExporter
+from apps.core.models import BackgroundJob
+from apps.core.query_budget import QueryBudget, QueryBudgetExceeded, sql_shape
+from apps.core.testing import QueryBudgetTestMixin
+from apps.core.views.job_views import job_download, job_status
+from apps.expenses.models import Expense, ExpenseCategory
+from apps.invoicing.models import Company, Invoice, InvoiceItem
+
+
+class ExporterQueryCountTestCase(TenantTestCase):
+    
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Export Test'
+        tenant.email = 'export@test.com'
+    
+    def setUp(self):
+        self.business_line = BusinessLine.objects.create(name='Consulta', slug='consulta', level=1)
+        self.company = Company.objects.create(
+            legal_form='AUTONOMO',
+            business_name='Test Company',
+            tax_id='12345678Z',
+            address='Calle Test 1',
+            postal_code='28001',
+            city='Madrid',
+            bank_name='Test Bank',
+            iban='ES0000000000000000000000'
+        )
+    
+    def _create_clients(self, count, offset=0):
+        for index in range(offset, offset + count):
+            client = Client.objects.create(
+                full_name=f'Cliente {index}',
+                dni=f'{index:08d}X',
+                gender='F'
+            )
+            for _ in range(2):
+                ClientService.objects.create(
+                    client=client,
+                    business_line=self.business_line,
+                    category=ClientService.CategoryChoices.PERSONAL,
+                    price=Decimal('50.00'),
+                    start_date=date(2024, 1, 1)
+                )
+    
+    def _create_invoices(self, count):
+        for index in range(count):
+            invoice = Invoice.objects.create(
+                company=self.company,
+                client_type='INDIVIDUAL',
+                client_name=f'Cliente {index}',
+                client_address='Calle Cliente 1'
+            )
+            for _ in range(3):
+                InvoiceItem.objects.create(
+                    invoice=invoice,
+                    description='Consulta',
+                    quantity=1,
+                    unit_price=Decimal('40.00')
+                )
+    
+    def _create_business_lines(self, count, offset=0):
+        client = Client.objects.create(full_name='Cliente Líneas', dni=f'L{offset:07d}X', gender='F')
+        for index in range(offset, offset + count):
+            line = BusinessLine.objects.create(
+                name=f'Línea {index}', slug=f'linea-{index}', parent=self.business_line
+            )
+            service = ClientService.objects.create(
+                client=client,
+                business_line=line,
+                category=ClientService.CategoryChoices.PERSONAL,
+                price=Decimal('50.00'),
+                start_date=date(2024, 1, 1)
+            )
+            for _ in range(2):
+                ServicePayment.objects.create(
+                    client_service=service,
+                    amount=Decimal('25.00'),
+                    payment_date=date(2024, 1, 10),
+                    period_start=date(2024, 1, 1),
+                    period_end=date(2024, 1, 31),
+                    status=ServicePayment.StatusChoices.PAID
+                )
+    
+    def _create_expense_categories(self, count, offset=0):
+        for index in range(offset, offset + count):
+            category = ExpenseCategory.objects.create(
+                name=f'Categoría {index}',
+                category_type=ExpenseCategory.CategoryTypeChoices.FIXED
+            )
+            for amount in (Decimal('100.00'), Decimal('50.00')):
+                Expense.objects.create(
+                    category=category,
+                    amount=amount,
+                    date=date(2024, 1, 1),
+                    description='Gasto'
+                )
+    
+    def _export(self, exporter_class):
+        with CaptureQueriesContext(connection) as queries:
+            rows = exporter_class().get_data()
+        return rows, len(queries)
+    
+    def test_client_exporter_query_count_does_not_grow_with_clients(self):
+        self._create_clients(2)
+        rows, queries_for_few = self._export(ClientExporter)
+        self.assertEqual(len(rows), 2)
+        
+        self._create_clients(10, offset=2)
+        rows, queries_for_many = self._export(ClientExporter)
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(queries_for_few, queries_for_many)
+        self.assertEqual(rows[0]['total_servicios'], 2)
+        self.assertEqual(rows[0]['valor_total_servicios'], 100.0)
+    
+    def test_invoice_exporter_query_count_does_not_grow_with_invoices(self):
+        self._create_invoices(2)
+        rows, queries_for_few = self._export(InvoiceExporter)
+        self.assertEqual(len(rows), 2)
+        
+        self._create_invoices(10)
+        rows, queries_for_many = self._export(InvoiceExporter)
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(queries_for_few, queries_for_many)
+        self.assertEqual(rows[0]['numero_items'], 3)
+        self.assertEqual(rows[0]['base_imponible'], 120.0)
+    
+    def test_business_line_exporter_query_count_does_not_grow_with_lines(self):
+        self._create_business_lines(2)
+        rows, queries_for_few = self._export(BusinessLineExporter)
+        self.assertEqual(len(rows), 3)
+        
+        self._create_business_lines(10, offset=2)
+        rows, queries_for_many = self._export(BusinessLineExporter)
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(queries_for_few, queries_for_many)
+        
+        root, child = rows[0], rows[1]
+        self.assertEqual(root['numero_sublíneas'], 12)
+        self.assertEqual(child['ruta_completa'], f"Consulta > {child['nombre']}")
+        self.assertEqual(child['total_servicios'], 1)
+        self.assertEqual(child['ingresos_estimados'], 50.0)
+        self.assertEqual(child['ingresos_reales'], 50.0)
+        self.assertEqual(child['pagos_realizados'], 2)
+    
+    def test_expense_category_exporter_query_count_does_not_grow_with_categories(self):
+        self._create_expense_categories(2)
+        rows, queries_for_few = self._export(ExpenseCategoryExporter)
+        self.assertEqual(len(rows), 2)
+        
+        self._create_expense_categories(10, offset=2)
+        rows, queries_for_many = self._export(ExpenseCategoryExporter)
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(queries_for_few, queries_for_many)
+        self.assertEqual(rows[0]['total_gastos'], 2)
+        self.assertEqual(rows[0]['monto_total'], 150.0)
+        self.assertEqual(rows[0]['monto_promedio'], 75.0)
+
+
+class RequestDiagnosticsMiddlewareTestCase(TenantTestCase):
+    
+    def setUp(self):
+        RequestDiagnostics.clear()
+        self.request = RequestFactory().get('/facturas/')
+    
+    def _view(self, request):
+        list(Invoice.objects.all())
+        list(Company.objects.all())
+        return HttpResponse(b'x' * 128)
+    
+    def test_disabled_middleware_is_removed_from_the_chain(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestDiagnosticsMiddleware(self._view, sample_rate=0)
+    
+    def test_unsampled_requests_are_not_recorded(self):
+        middleware = RequestDiagnosticsMiddleware(self._view, sample_rate=1e-12)
+        for _ in range(20):
+            middleware(self.request)
+        self.assertEqual(RequestDiagnostics.recent(), [])
+    
+    def test_sampled_request_records_queries_schema_and_size(self):
+        middleware = RequestDiagnosticsMiddleware(self._view, sample_rate=1)
+        middleware(self.request)
+        
+        [entry] = RequestDiagnostics.recent()
+        self.assertEqual(entry['path'], '/facturas/')
+        self.assertEqual(entry['status'], 200)
+        self.assertEqual(entry['queries'], 2)
+        self.assertEqual(entry['schema'], connection.schema_name)
+        self.assertEqual(entry['response_bytes'], 128)
+
+
+class QueryBudgetTestCase(QueryBudgetTestMixin, TenantTestCase):
+    
+    def _query_invoices(self, times):
+        for index in range(times):
+            list(Invoice.objects.filter(pk__in=list(range(index + 1))))
+    
+    def test_shape_ignores_parameter_values(self):
+        self.assertEqual(
+            sql_shape('SELECT "id" FROM "t" WHERE "id" IN (%s, %s, %s) LIMIT 21'),
+            sql_shape('SELECT "id" FROM "t" WHERE "id" IN (%s) LIMIT 1')
+        )
+    
+    def test_exceeded_budget_reports_repeated_shape_and_call_site(self):
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with QueryBudget(2, action=QueryBudget.RAISE):
+                self._query_invoices(3)
+        
+        [(shape, count, call_site)] = raised.exception.recorder.repeated(3)
+        self.assertEqual(count, 3)
+        self.assertIn('apps/core/tests.py', call_site)
+        self.assertIn('_query_invoices', call_site)
+    
+    def test_repeated_queries_fail_within_total_budget(self):
+        with self.assertRaises(AssertionError):
+            with self.assertQueryBudget(10, max_repeats=2):
+                self._query_invoices(3)
+    
+    def test_log_action_warns_instead_of_raising(self):
+        with self.assertLogs('apps.core.query_budget', 'WARNING'):
+            with QueryBudget(0, action=QueryBudget.LOG):
+                self._query_invoices(1)
+    
+    def test_off_action_does_not_measure(self):
+        with QueryBudget(0, action=QueryBudget.OFF) as recorder:
+            self._query_invoices(2)
+        self.assertEqual(recorder.count, 0)
+
+
+class JobViewsOwnershipTestCase(TenantTestCase):
+    
+    def setUp(self):
+        self.job = BackgroundJob.objects.create(job_type='export', requested_by='owner')
+    
+    def _request(self, username):
+        request = RequestFactory().get('/jobs/')
+        request.user = get_user_model()(username=username)
+        return request
+    
+    def test_owner_can_poll_job(self):
+        response = job_status(self._request('owner'), self.job.pk)
+        self.assertEqual(response.status_code, 200)
+    
+    def test_other_users_cannot_poll_or_download_job(self):
+        for view in (job_status, job_download):
+            with self.assertRaises(Http404):
+                view(self._request('intruder'), self.job.pk)
@@ -1,8 +1,11 @@
 from django.urls import path
 from .views.export_views import export_data
+from .views.job_views import job_download, job_status
 
 app_name = 'core'
 
 urlpatterns = [
     path('export/', export_data, name='export_data'),
+    path('jobs/<int:pk>/', job_status, name='job_status'),
+    path('jobs/<int:pk>/download/', job_download, name='job_download'),
 ]
@@ -0,0 +1,60 @@
+import os
+
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
+
+from apps.core.models import BackgroundJob
+from apps.core.services.job_service import JobService
+
+
+def get_user_job(request, pk):
+    """Sólo quien encoló la tarea puede consultarla o descargar su resultado."""
+    return get_object_or_404(BackgroundJob, pk=pk, requested_by=request.user.get_username())
+
+
+def job_accepted_response(job):
+    """Respuesta estándar al encolar una tarea: la UI sondea `status_url`."""
+    return JsonResponse({
+        'success': True,
+        'job_id': job.pk,
+        'status_url': reverse('core:job_status', args=[job.pk]),
+    }, status=202)
+
+
+@login_required
+@require_http_methods(["GET"])
+def job_status(request, pk):
+    job = get_user_job(request, pk)
+    download_url = reverse('core:job_download', args=[job.pk])
+    return JsonResponse(JobService.get_status_data(job, download_url))
+
+
+@login_required
+@require_http_methods(["GET"])
+def job_download(request, pk):
+    job = get_user_job(request, pk)
+    path, filename = job.result_path, job.result_filename
+    
+    part = request.GET.get('part')
+    if part is not None and job.result_parts:
+        try:
+            index = int(part)
+        except ValueError:
+            raise Http404("Parte no válida")
+        path = job.get_part_path(index)
+        if path is None:
+            raise Http404("Parte no válida")
+        filename = job.result_parts[index]['filename']
+    
+    if not job.has_result or not os.path.exists(path):
+        raise Http404("El resultado de esta tarea no está disponible")
+    
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=filename,
+        content_type=job.result_content_type
+    )
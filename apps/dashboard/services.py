@@ -3,16 +3,23 @@ from django.db.models.functions import Coalesce, TruncMonth
 from django.utils import timezone
 from datetime import timedelta
 
-from apps.accounting.models import ClientService, ServicePayment
+from apps.accounting.models import ClientService, ServicePayment, FinancialMonthlyRollup
 from apps.expenses.models import Expense, ExpenseCategory
 from apps.business_lines.models import BusinessLine
 from apps.accounting.services.business_line_service import BusinessLineService
+from apps.accounting.services.financial_rollup_service import FinancialRollupService
+from apps.core.services.tenant_cache import TenantCache
 
 
 class DashboardDataService:
     
     BUSINESS_CATEGORY = 'business'
     
+    # Los resultados se cachean por tenant y se invalidan con las escrituras de
+    # pagos, servicios, gastos y líneas de negocio (ver TenantCache)
+    FINANCIAL_DEPENDENCIES = (TenantCache.REVENUE, TenantCache.EXPENSES, TenantCache.HIERARCHY)
+    REVENUE_DEPENDENCIES = (TenantCache.REVENUE, TenantCache.HIERARCHY)
+    
     @staticmethod
     def get_net_revenue_aggregation():
         from django.db import models
@@ -23,14 +30,34 @@ class DashboardDataService:
         return Expense.objects.filter(service_category=cls.BUSINESS_CATEGORY)
     
     @classmethod
-    def get_business_payments_queryset(cls):
-        active_lines = BusinessLine.objects.filter(is_active=True)
-        all_descendant_ids = set()
-        for line in active_lines:
-            all_descendant_ids.update(line.get_descendant_ids())
+    def get_business_scope_line_ids(cls):
+        return TenantCache.get_or_set(
+            'dashboard.business_scope', (), cls._build_business_scope_line_ids,
+            depends_on=(TenantCache.HIERARCHY,)
+        )
+    
+    @classmethod
+    def _build_business_scope_line_ids(cls):
+        lines = {
+            line_id: (parent_id, is_active)
+            for line_id, parent_id, is_active in BusinessLine.objects.values_list('id', 'parent_id', 'is_active')
+        }
         
+        scope_ids = set()
+        for line_id in lines:
+            current_id = line_id
+            while current_id is not None:
+                parent_id, is_active = lines[current_id]
+                if is_active:
+                    scope_ids.add(line_id)
+                    break
+                current_id = parent_id
+        return scope_ids
+    
+    @classmethod
+    def get_business_payments_queryset(cls):
         business_services = ClientService.objects.filter(
-            business_line__id__in=all_descendant_ids,
+            business_line__id__in=cls.get_business_scope_line_ids(),
             category=cls.BUSINESS_CATEGORY
         )
         return ServicePayment.objects.filter(client_service__in=business_services)
@@ -44,21 +71,34 @@ class DashboardDataService:
     @classmethod
     def get_financial_summary(cls):
         today = timezone.now().date()
+        return TenantCache.get_or_set(
+            'dashboard.financial_summary', (today,), lambda: cls._build_financial_summary(today),
+            depends_on=cls.FINANCIAL_DEPENDENCIES
+        )
+    
+    @classmethod
+    def _build_financial_summary(cls, today):
         start_of_month = today.replace(day=1)
         
-        net_revenue_agg = cls.get_net_revenue_aggregation()
-        business_payments = cls.get_business_payments_queryset()
-        business_expenses = cls.get_business_expenses_queryset()
-        
-        total_ingresos = business_payments.aggregate(total=net_revenue_agg)['total'] or 0
-        ingresos_mes = business_payments.filter(
-            payment_date__gte=start_of_month
-        ).aggregate(total=net_revenue_agg)['total'] or 0
-        
-        total_gastos = business_expenses.aggregate(total=Sum('amount'))['total'] or 0
-        gastos_mes = business_expenses.filter(
-            date__gte=start_of_month
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        payment_filters = {
+            'category': cls.BUSINESS_CATEGORY,
+            'business_line_ids': cls.get_business_scope_line_ids(),
+        }
+        expense_filters = {'category': cls.BUSINESS_CATEGORY}
+        
+        total_ingresos = FinancialRollupService.get_totals(
+            FinancialMonthlyRollup.SourceChoices.PAYMENT, **payment_filters
+        )['amount']
+        ingresos_mes = FinancialRollupService.get_totals(
+            FinancialMonthlyRollup.SourceChoices.PAYMENT, month_from=start_of_month, **payment_filters
+        )['amount']
+        
+        total_gastos = FinancialRollupService.get_totals(
+            FinancialMonthlyRollup.SourceChoices.EXPENSE, **expense_filters
+        )['amount']
+        gastos_mes = FinancialRollupService.get_totals(
+            FinancialMonthlyRollup.SourceChoices.EXPENSE, month_from=start_of_month, **expense_filters
+        )['amount']
         
         resultado_total = total_ingresos - total_gastos
         resultado_mes = ingresos_mes - gastos_mes
@@ -79,29 +119,29 @@ class DashboardDataService:
     @classmethod
     def get_temporal_data(cls):
         today = timezone.now().date()
+        return TenantCache.get_or_set(
+            'dashboard.temporal', (today,), lambda: cls._build_temporal_data(today),
+            depends_on=cls.FINANCIAL_DEPENDENCIES
+        )
+    
+    @classmethod
+    def _build_temporal_data(cls, today):
         start_date = today.replace(day=1) - timedelta(days=365)
         
-        business_payments = cls.get_business_payments_queryset().filter(
-            payment_date__gte=start_date
+        ingresos_por_mes = FinancialRollupService.get_monthly_totals(
+            FinancialMonthlyRollup.SourceChoices.PAYMENT,
+            category=cls.BUSINESS_CATEGORY,
+            business_line_ids=cls.get_business_scope_line_ids(),
+            month_from=start_date,
         )
-        business_expenses = cls.get_business_expenses_queryset().filter(
-            date__gte=start_date
+        gastos_por_mes = FinancialRollupService.get_monthly_totals(
+            FinancialMonthlyRollup.SourceChoices.EXPENSE,
+            category=cls.BUSINESS_CATEGORY,
+            month_from=start_date,
         )
         
-        ingresos_por_mes = business_payments.annotate(
-            mes=TruncMonth('payment_date')
-        ).values('mes').annotate(
-            total=cls.get_net_revenue_aggregation()
-        ).order_by('mes')
-        
-        gastos_por_mes = business_expenses.annotate(
-            mes=TruncMonth('date')
-        ).values('mes').annotate(
-            total=Sum('amount')
-        ).order_by('mes')
-        
-        ingresos_dict = {item['mes'].strftime('%Y-%m'): float(item['total'] or 0) for item in ingresos_por_mes}
-        gastos_dict = {item['mes'].strftime('%Y-%m'): float(item['total'] or 0) for item in gastos_por_mes}
+        ingresos_dict = {month: float(totals['amount']) for month, totals in ingresos_por_mes.items()}
+        gastos_dict = {month: float(totals['amount']) for month, totals in gastos_por_mes.items()}
         
         months = []
         current_date = start_date
@@ -135,12 +175,36 @@ class DashboardDataService:
         if level:
             accessible_lines = accessible_lines.filter(level=level)
         
-        business_lines = []
+        # Los totales por línea no dependen del usuario; se filtran después por acceso
+        totals = TenantCache.get_or_set(
+            'dashboard.business_lines', (start_date, end_date, level),
+            lambda: cls._build_business_line_totals(start_date, end_date, level),
+            depends_on=cls.REVENUE_DEPENDENCIES
+        )
+        business_lines = [
+            dict(totals[line_id])
+            for line_id in accessible_lines.values_list('id', flat=True)
+            if line_id in totals
+        ]
+        
+        business_lines = sorted(business_lines, key=lambda x: x['total_ingresos'], reverse=True)
+        total_ingresos = sum(bl['total_ingresos'] for bl in business_lines)
+        
+        for bl in business_lines:
+            bl['porcentaje'] = (bl['total_ingresos'] / total_ingresos * 100) if total_ingresos > 0 else 0
+        
+        return business_lines
+    
+    @classmethod
+    def _build_business_line_totals(cls, start_date, end_date, level):
+        lines = BusinessLine.objects.filter(is_active=True)
+        if level:
+            lines = lines.filter(level=level)
+        
+        totals = {}
         
-        for bl in accessible_lines:
-            descendant_ids = bl.get_descendant_ids()
-            servicios = ClientService.objects.filter(
-                business_line__id__in=descendant_ids,
+        for bl in lines:
+            servicios = ClientService.objects.in_business_line_tree(bl).filter(
                 category=ClientService.CategoryChoices.BUSINESS
             )
             pagos = ServicePayment.objects.filter(client_service__in=servicios)
@@ -154,22 +218,24 @@ class DashboardDataService:
                 total=cls.get_net_revenue_aggregation()
             )['total'] or 0
             
-            business_lines.append({
+            totals[bl.id] = {
                 'name': bl.name,
                 'total_ingresos': ingresos_netos,
                 'num_servicios': servicios.count(),
-            })
-        
-        business_lines = sorted(business_lines, key=lambda x: x['total_ingresos'], reverse=True)
-        total_ingresos = sum(bl['total_ingresos'] for bl in business_lines)
+            }
         
-        for bl in business_lines:
-            bl['porcentaje'] = (bl['total_ingresos'] / total_ingresos * 100) if total_ingresos > 0 else 0
-        
-        return business_lines
+        return totals
+    
+    @classmethod
+    def get_expense_categories_data(cls, start_date=None, end_date=None):
+        return TenantCache.get_or_set(
+            'dashboard.expense_categories', (start_date, end_date),
+            lambda: cls._build_expense_categories_data(start_date, end_date),
+            depends_on=(TenantCache.EXPENSES,)
+        )
     
     @staticmethod
-    def get_expense_categories_data(start_date=None, end_date=None):
+    def _build_expense_categories_data(start_date, end_date):
         expense_filter = Q(expenses__service_category=Expense.ServiceCategoryChoices.BUSINESS)
         if start_date:
             expense_filter &= Q(expenses__date__gte=start_date)
@@ -135,11 +135,31 @@ class Expense(TimeStampedModel):
             models.Index(fields=['service_category', 'date']),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        from apps.accounting.services.financial_rollup_service import FinancialRollupService
+        instance = super().from_db(db, field_names, values)
+        tracked_fields = FinancialRollupService.EXPENSE_TRACKED_FIELDS
+        if all(field in field_names for field in tracked_fields):
+            instance._rollup_state = FinancialRollupService.snapshot(instance, tracked_fields)
+        return instance
+
     def save(self, *args, **kwargs):
+        from apps.accounting.services.financial_rollup_service import FinancialRollupService
         if self.date:
             self.accounting_year = self.date.year
             self.accounting_month = self.date.month
+        
+        previous_rollup_state = None
+        if not self._state.adding:
+            previous_rollup_state = getattr(self, '_rollup_state', None)
+            if previous_rollup_state is None:
+                tracked_fields = FinancialRollupService.EXPENSE_TRACKED_FIELDS
+                values = Expense.objects.filter(pk=self.pk).values_list(*tracked_fields).first()
+                previous_rollup_state = dict(zip(tracked_fields, values)) if values else None
+        
         super().save(*args, **kwargs)
+        self._rollup_state = FinancialRollupService.record_expense_change(self, previous_rollup_state)
 
     def __str__(self):
         return f"{self.category.name} - {self.amount}€ ({self.date})"
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Expense, ExpenseCategory
+
+
+@receiver(post_delete, sender=Expense)
+def remove_expense_from_rollup(sender, instance, **kwargs):
+    from apps.accounting.services.financial_rollup_service import FinancialRollupService
+    FinancialRollupService.record_expense_removal(
+        instance, state=getattr(instance, '_rollup_state', None)
+    )
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=ExpenseCategory)
+@receiver(post_delete, sender=ExpenseCategory)
+def invalidate_expenses_cache(sender, **kwargs):
+    from apps.core.services.tenant_cache import TenantCache
+    TenantCache.invalidate(TenantCache.EXPENSES)
@@ -0,0 +1,61 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django_tenants.test.cases import TenantTestCase
+
+from apps.core.services.schema_capabilities import SchemaCapabilities
+from apps.expenses.models import Expense, ExpenseCategory
+from apps.expenses.views import ExpenseListView
+
+
+class ExpenseListQueryCountTestCase(TenantTestCase):
+    
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Expenses Test'
+        tenant.email = 'expenses@test.com'
+    
+    def setUp(self):
+        SchemaCapabilities.clear()
+        self.category = ExpenseCategory.objects.create(
+            name='Alquiler',
+            category_type=ExpenseCategory.CategoryTypeChoices.FIXED
+        )
+        for day in range(1, 4):
+            Expense.objects.create(
+                category=self.category,
+                amount=Decimal('100.00'),
+                date=date(date.today().year, 1, day),
+                description='Alquiler local'
+            )
+        self.user = get_user_model()(username='expenses-test')
+    
+    def _list_expenses(self):
+        request = RequestFactory().get('/expenses/business/type/FIXED/')
+        request.user = self.user
+        request.tenant = self.tenant
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = ExpenseListView.as_view()(request, service_category='business', category_type='FIXED')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context_data['expense_count'], 3)
+        return [query['sql'] for query in queries]
+    
+    def test_schema_is_introspected_once_per_process(self):
+        cold = self._list_expenses()
+        warm = self._list_expenses()
+        
+        self.assertEqual(sum('information_schema' in sql for sql in cold), 1)
+        self.assertFalse(any('information_schema' in sql for sql in warm))
+        self.assertEqual(len(warm), len(cold) - 1)
+    
+    def test_cleared_cache_introspects_again(self):
+        self._list_expenses()
+        SchemaCapabilities.clear()
+        
+        queries = self._list_expenses()
+        self.assertEqual(sum('information_schema' in sql for sql in queries), 1)
@@ -8,13 +8,18 @@ from django.contrib import messages
 from django.shortcuts import redirect, get_object_or_404
 from django.http import Http404
 from django.core.exceptions import FieldError
-from django.db import connection
 
 from apps.expenses.models import Expense, ExpenseCategory
 from apps.expenses.forms import ExpenseForm, ExpenseCategoryForm
 from apps.core.mixins import TemporalFilterMixin
 from apps.core.constants import SUCCESS_MESSAGES, ERROR_MESSAGES
 from apps.core.services import parse_temporal_filters, get_temporal_context
+from apps.core.services.schema_capabilities import SchemaCapabilities
+
+
+def _has_service_category_column():
+    """Verificar si la columna service_category existe en la tabla expenses del tenant"""
+    return SchemaCapabilities.has_column(Expense._meta.db_table, 'service_category')
 
 
 class ExpenseCategoryView(LoginRequiredMixin, TemplateView):
@@ -40,7 +45,7 @@ class ExpenseCategoryView(LoginRequiredMixin, TemplateView):
         year = filters['year']
         month = filters['month']
         
-        if self._has_service_category_column():
+        if _has_service_category_column():
             expense_filter['service_category'] = service_category
         
         category_totals = {}
@@ -67,7 +72,7 @@ class ExpenseCategoryView(LoginRequiredMixin, TemplateView):
         base_filter = Q(expenses__accounting_year=year)
         if month:
             base_filter &= Q(expenses__accounting_month=month)
-        if self._has_service_category_column():
+        if _has_service_category_column():
             try:
                 base_filter &= Q(expenses__service_category=service_category)
             except FieldError:
@@ -86,24 +91,11 @@ class ExpenseCategoryView(LoginRequiredMixin, TemplateView):
             'category_totals': category_totals,
             'total_general': total_general,
             'categories': categories,
-            'has_service_category': self._has_service_category_column(),
+            'has_service_category': _has_service_category_column(),
             **get_temporal_context(year, month)
         })
         
         return context
-    
-    def _has_service_category_column(self):
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'expenses' 
-                    AND column_name = 'service_category'
-                """)
-                return cursor.fetchone() is not None
-        except Exception:
-            return False
 
 
 class ExpenseListView(LoginRequiredMixin, TemporalFilterMixin, ListView):
@@ -126,7 +118,7 @@ class ExpenseListView(LoginRequiredMixin, TemporalFilterMixin, ListView):
         elif category_type:
             queryset = queryset.filter(category__category_type=category_type)
         
-        if service_category and self._has_service_category_column():
+        if service_category and _has_service_category_column():
             try:
                 queryset = queryset.filter(service_category=service_category)
             except FieldError:
@@ -138,20 +130,6 @@ class ExpenseListView(LoginRequiredMixin, TemporalFilterMixin, ListView):
         
         return queryset.select_related('category').order_by('-date', '-created')
     
-    def _has_service_category_column(self):
-        """Verificar si la columna service_category existe en la tabla expenses"""
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'expenses' 
-                    AND column_name = 'service_category'
-                """)
-                return cursor.fetchone() is not None
-        except Exception:
-            return False
-    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
@@ -168,7 +146,7 @@ class ExpenseListView(LoginRequiredMixin, TemporalFilterMixin, ListView):
             'service_category_display': 'Personal' if service_category == 'personal' else 'Business',
             'category_type': category_type,
             'category_slug': category_slug,
-            'has_service_category': self._has_service_category_column(),
+            'has_service_category': _has_service_category_column(),
             **get_temporal_context(year, month)
         })
         
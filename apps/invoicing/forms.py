@@ -108,6 +108,59 @@ class BaseInvoiceItemFormSet(forms.BaseInlineFormSet):
         
         if valid_forms < 1:
             raise forms.ValidationError('Debe añadir al menos un producto o servicio.')
+    
+    def save(self, commit=True):
+        """
+        Guarda las líneas en bloque: un DELETE, un UPDATE y un INSERT como
+        máximo, y un único recálculo de los totales de la factura, sea cual
+        sea el número de líneas.
+        """
+        if not commit:
+            return super().save(commit=False)
+        
+        from django.db import transaction
+        from .pdf_cache import InvoicePDFCache
+        from .signals import suspend_item_signals
+        
+        fields = InvoiceItemForm._meta.fields
+        self.new_objects = []
+        self.changed_objects = []
+        self.deleted_objects = []
+        
+        for form in self.initial_forms:
+            if form.instance.pk is None:
+                continue
+            if self.can_delete and self._should_delete_form(form):
+                self.deleted_objects.append(form.instance)
+            elif form.has_changed():
+                self.changed_objects.append((form.save(commit=False), form.changed_data))
+        
+        for form in self.extra_forms:
+            if not form.has_changed() or (self.can_delete and self._should_delete_form(form)):
+                continue
+            item = form.save(commit=False)
+            item.invoice = self.instance
+            self.new_objects.append(item)
+        
+        changed_items = [item for item, _ in self.changed_objects]
+        with transaction.atomic(), suspend_item_signals():
+            if self.deleted_objects:
+                InvoiceItem.objects.filter(
+                    invoice=self.instance,
+                    pk__in=[item.pk for item in self.deleted_objects]
+                ).delete()
+            if changed_items:
+                InvoiceItem.objects.bulk_update(changed_items, fields)
+            if self.new_objects:
+                InvoiceItem.objects.bulk_create(self.new_objects)
+            
+            Invoice.refresh_totals([self.instance.pk])
+            # El UPDATE no toca la instancia; se recargan los totales para que un
+            # save() posterior no vuelva a escribir los anteriores
+            self.instance.refresh_from_db(fields=list(Invoice.computed_totals()))
+        
+        InvoicePDFCache.invalidate_invoice(self.instance.pk)
+        return changed_items + self.new_objects
 
 InvoiceItemFormSet = inlineformset_factory(
     Invoice, 
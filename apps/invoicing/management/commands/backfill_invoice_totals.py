@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Func, Q
+from django_tenants.utils import get_tenant_model, schema_context
+from apps.invoicing.models import Invoice, AMOUNT_FIELD
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los totales persistidos de las facturas (base, IVA, IRPF y total) a partir de sus líneas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra cuántas facturas tienen totales desactualizados sin hacer cambios',
+        )
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Procesar solo el tenant con este schema',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        schema_name = options.get('tenant')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Modo DRY-RUN activado'))
+
+        TenantModel = get_tenant_model()
+        tenants_qs = TenantModel.objects.exclude(schema_name='public').filter(is_deleted=False)
+
+        if schema_name:
+            tenants_qs = tenants_qs.filter(schema_name=schema_name)
+
+        total = 0
+        for tenant in tenants_qs:
+            with schema_context(tenant.schema_name):
+                if dry_run:
+                    count = self._count_outdated()
+                else:
+                    count = Invoice.refresh_totals()
+
+            total += count
+            label = 'desactualizadas' if dry_run else 'recalculadas'
+            self.stdout.write(f'  {tenant.schema_name}: {count} facturas {label}')
+
+        self.stdout.write(self.style.SUCCESS(f'\nProceso completado: {total} facturas'))
+
+    def _count_outdated(self):
+        computed = {
+            f'computed_{field}': Func(expression, 2, function='ROUND', output_field=AMOUNT_FIELD)
+            for field, expression in Invoice.computed_totals().items()
+        }
+        mismatch = Q()
+        for field in computed:
+            mismatch |= ~Q(**{field.replace('computed_', '', 1): F(field)})
+        return Invoice.objects.annotate(**computed).filter(mismatch).count()
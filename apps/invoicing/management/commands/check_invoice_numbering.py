@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_tenant_model, schema_context
+from apps.invoicing.models import Company
+from apps.invoicing.numbering import InvoiceNumberAllocator
+
+
+class Command(BaseCommand):
+    help = 'Informa de los huecos en la numeración de facturas de cada tenant'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Procesar solo el tenant con este schema',
+        )
+
+    def handle(self, *args, **options):
+        schema_name = options.get('tenant')
+
+        TenantModel = get_tenant_model()
+        tenants_qs = TenantModel.objects.exclude(schema_name='public').filter(is_deleted=False)
+
+        if schema_name:
+            tenants_qs = tenants_qs.filter(schema_name=schema_name)
+
+        total_gaps = 0
+        for tenant in tenants_qs:
+            with schema_context(tenant.schema_name):
+                for company in Company.objects.all():
+                    gaps = InvoiceNumberAllocator.find_gaps(company)
+                    last_number = InvoiceNumberAllocator.last_number(company)
+                    total_gaps += len(gaps)
+
+                    if gaps:
+                        numbers = ', '.join(str(number) for number in gaps)
+                        self.stdout.write(self.style.WARNING(
+                            f'  {tenant.schema_name}: {len(gaps)} huecos hasta el número {last_number}: {numbers}'
+                        ))
+                    else:
+                        self.stdout.write(f'  {tenant.schema_name}: numeración correlativa hasta el número {last_number}')
+
+        self.stdout.write(self.style.SUCCESS(f'\nProceso completado: {total_gaps} huecos'))
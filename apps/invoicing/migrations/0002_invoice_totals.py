@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_invoice_totals(apps, schema_editor):
+    """
+    Carga inicial de los totales persistidos a partir de las líneas existentes.
+    """
+    Invoice = apps.get_model('invoicing', 'Invoice')
+    InvoiceItem = apps.get_model('invoicing', 'InvoiceItem')
+
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    line_total = ExpressionWrapper(F('quantity') * F('unit_price'), output_field=amount)
+    vat = ExpressionWrapper(line_total * F('vat_rate') / 100, output_field=amount)
+    irpf = ExpressionWrapper(line_total * F('irpf_rate') / 100, output_field=amount)
+    expressions = {
+        'base_amount': line_total,
+        'vat_amount': vat,
+        'irpf_amount': irpf,
+        'total_amount': ExpressionWrapper(line_total + vat - irpf, output_field=amount),
+    }
+
+    Invoice.objects.update(**{
+        field: Coalesce(
+            Subquery(
+                InvoiceItem.objects
+                .filter(invoice=OuterRef('pk'))
+                .values('invoice')
+                .annotate(total=Sum(expression))
+                .values('total'),
+                output_field=amount
+            ),
+            Value(Decimal('0.00')),
+            output_field=amount
+        )
+        for field, expression in expressions.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='base_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Base imponible €'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='vat_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='IVA €'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='irpf_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='IRPF €'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Total €'),
+        ),
+        migrations.RunPython(populate_invoice_totals, migrations.RunPython.noop),
+    ]
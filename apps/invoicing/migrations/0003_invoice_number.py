@@ -0,0 +1,55 @@
+import re
+
+from django.db import migrations, models
+
+
+# Referencias emitidas con cualquier prefijo anterior de la empresa: <prefijo><número>_<año>
+LEGACY_REFERENCE_PATTERN = re.compile(r'(\d+)_\d{2}$')
+
+
+def parse_invoice_number(reference, prefix):
+    """
+    Número correlativo de una referencia. Se prueba primero con el prefijo
+    actual, por si termina en dígitos, y si no con el patrón independiente del
+    prefijo para las facturas emitidas antes de un cambio de prefijo.
+    """
+    match = re.match(rf'^{re.escape(prefix)}(\d+)_\d{{2}}$', reference) or LEGACY_REFERENCE_PATTERN.search(reference)
+    return int(match.group(1)) if match else None
+
+
+def populate_invoice_numbers(apps, schema_editor):
+    """
+    Extrae el número correlativo de las referencias ya emitidas y crea la
+    secuencia de cada empresa a continuación del último número usado.
+    """
+    Company = apps.get_model('invoicing', 'Company')
+    Invoice = apps.get_model('invoicing', 'Invoice')
+
+    for company in Company.objects.all():
+        invoices = []
+        for invoice in Invoice.objects.filter(company=company, reference__isnull=False).only('id', 'reference'):
+            number = parse_invoice_number(invoice.reference, company.invoice_prefix)
+            if number is not None:
+                invoice.number = number
+                invoices.append(invoice)
+        Invoice.objects.bulk_update(invoices, ['number'], batch_size=500)
+
+        last_number = max([company.current_number] + [invoice.number for invoice in invoices])
+        name = schema_editor.connection.ops.quote_name(f'invoice_number_seq_{company.pk}')
+        schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS {name} START WITH {last_number + 1}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0002_invoice_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='number',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(populate_invoice_numbers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0003_invoice_number'),
+    ]
+
+    operations = [
+        # En public para que lo compartan todos los esquemas de tenant
+        migrations.RunSQL(
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['issue_date', 'id'], name='invoicing_i_issue_d_173219_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'issue_date', 'id'], name='invoicing_i_status_cfa014_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['total_amount', 'id'], name='invoicing_i_total_a_5849aa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('reference'), name='gin_trgm_ops'), name='invoice_reference_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('client_name'), name='gin_trgm_ops'), name='invoice_client_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('client_tax_id'), name='gin_trgm_ops'), name='invoice_client_tax_id_trgm_idx'),
+        ),
+    ]
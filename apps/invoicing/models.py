@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from decimal import Decimal
@@ -7,6 +10,9 @@ from apps.core.models import TimeStampedModel
 from django.conf import settings
 
 
+AMOUNT_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
 class Company(TimeStampedModel):
     LEGAL_FORMS = [
         ('AUTONOMO', 'Autónomo/a'),
@@ -77,6 +83,8 @@ class Invoice(TimeStampedModel):
     
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
     reference = models.CharField(max_length=50, unique=True, null=True, blank=True)
+    # Número correlativo dentro de la serie de la empresa; se asigna al emitirse
+    number = models.PositiveIntegerField(null=True, blank=True, editable=False, db_index=True)
     issue_date = models.DateField(default=date.today, verbose_name="Fecha de emisión")
     client_type = models.CharField(max_length=20, choices=CLIENT_TYPES, verbose_name="Tipo de cliente")
     client_name = models.CharField(max_length=200, verbose_name="Nombre del cliente")
@@ -85,34 +93,51 @@ class Invoice(TimeStampedModel):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT', verbose_name="Estado")
     payment_terms = models.TextField(default="Transferencia bancaria", verbose_name="Condiciones de pago")
     pdf_file = models.FileField(upload_to='invoices/pdfs/', blank=True)
-
-    @property
-    def base_amount(self):
-        return sum(item.line_total for item in self.items.all())
-
-    @property
-    def vat_amount(self):
-        return sum(item.vat_amount for item in self.items.all())
-
-    @property
-    def irpf_amount(self):
-        return sum(item.irpf_amount for item in self.items.all())
-
-    @property
-    def total_amount(self):
-        return self.base_amount + self.vat_amount - self.irpf_amount
+    
+    # Totales desnormalizados: se recalculan en SQL al guardar o borrar líneas
+    base_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="Base imponible €")
+    vat_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="IVA €")
+    irpf_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="IRPF €")
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="Total €")
+
+    @classmethod
+    def computed_totals(cls):
+        """Totales calculados desde las líneas, como subconsultas por factura."""
+        return {
+            field: Coalesce(
+                Subquery(
+                    InvoiceItem.objects
+                    .filter(invoice=OuterRef('pk'))
+                    .values('invoice')
+                    .annotate(total=Sum(expression))
+                    .values('total'),
+                    output_field=AMOUNT_FIELD
+                ),
+                Value(Decimal('0.00')),
+                output_field=AMOUNT_FIELD
+            )
+            for field, expression in InvoiceItem.total_expressions().items()
+        }
+
+    @classmethod
+    def refresh_totals(cls, invoice_ids=None):
+        """
+        Recalcula los totales persistidos con un único UPDATE.
+        Sin `invoice_ids` recorre todas las facturas.
+        """
+        queryset = cls.objects.all()
+        if invoice_ids is not None:
+            queryset = queryset.filter(pk__in=list(invoice_ids))
+        return queryset.update(**cls.computed_totals())
 
     def generate_reference(self):
         if not self.issue_date:
             self.issue_date = date.today()
         year = self.issue_date.year % 100
         
-        from django.db import transaction
-        with transaction.atomic():
-            company = Company.objects.select_for_update().get(pk=self.company.pk)
-            company.current_number += 1
-            company.save()
-            return f"{company.invoice_prefix}{company.current_number:03d}_{year}"
+        from .numbering import InvoiceNumberAllocator
+        self.number = InvoiceNumberAllocator.allocate(self.company)
+        return f"{self.company.invoice_prefix}{self.number:03d}_{year}"
 
     def assign_reference_if_needed(self):
         if not self.reference and self.status != 'DRAFT' and self.company:
@@ -132,6 +157,15 @@ class Invoice(TimeStampedModel):
 
     class Meta:
         ordering = ['-issue_date']
+        indexes = [
+            models.Index(fields=['issue_date', 'id']),
+            models.Index(fields=['status', 'issue_date', 'id']),
+            models.Index(fields=['total_amount', 'id']),
+            # Búsqueda icontains: Django compara UPPER(columna) LIKE UPPER(patrón)
+            GinIndex(OpClass(Upper('reference'), name='gin_trgm_ops'), name='invoice_reference_trgm_idx'),
+            GinIndex(OpClass(Upper('client_name'), name='gin_trgm_ops'), name='invoice_client_name_trgm_idx'),
+            GinIndex(OpClass(Upper('client_tax_id'), name='gin_trgm_ops'), name='invoice_client_tax_id_trgm_idx'),
+        ]
 
 
 class InvoiceItem(models.Model):
@@ -154,6 +188,19 @@ class InvoiceItem(models.Model):
         verbose_name="IRPF (%)"
     )
     
+    @staticmethod
+    def total_expressions():
+        """Importe de cada línea por concepto, como expresiones SQL."""
+        line_total = ExpressionWrapper(F('quantity') * F('unit_price'), output_field=AMOUNT_FIELD)
+        vat = ExpressionWrapper(line_total * F('vat_rate') / 100, output_field=AMOUNT_FIELD)
+        irpf = ExpressionWrapper(line_total * F('irpf_rate') / 100, output_field=AMOUNT_FIELD)
+        return {
+            'base_amount': line_total,
+            'vat_amount': vat,
+            'irpf_amount': irpf,
+            'total_amount': ExpressionWrapper(line_total + vat - irpf, output_field=AMOUNT_FIELD),
+        }
+    
     @property
     def line_total(self):
         return self.quantity * self.unit_price
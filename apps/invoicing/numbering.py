@@ -0,0 +1,97 @@
+from django.db import IntegrityError, ProgrammingError, connection, transaction
+from django.db.models import Max
+
+
+class InvoiceNumberAllocator:
+    """
+    Numeración de facturas basada en una secuencia de PostgreSQL por serie.
+    
+    nextval() no bloquea filas ni espera a otras transacciones, así que emitir
+    facturas a la vez ya no serializa las peticiones sobre la fila de Company
+    durante toda la transacción. Los números se entregan en orden creciente.
+    
+    Un número obtenido en una transacción que después se revierte no se
+    reutiliza (reasignarlo rompería el orden cronológico de la serie); queda
+    como hueco y find_gaps() permite localizarlo para justificarlo.
+    
+    Company.current_number se mantiene como reflejo del último número emitido
+    y se actualiza tras el commit con un UPDATE independiente y monótono.
+    """
+    
+    SEQUENCE_PREFIX = 'invoice_number_seq_'
+    
+    @classmethod
+    def get_sequence_name(cls, company):
+        return f'{cls.SEQUENCE_PREFIX}{company.pk}'
+    
+    @classmethod
+    def ensure_sequence(cls, company):
+        """Crea la secuencia de la serie continuando desde el último número emitido."""
+        from .models import Invoice
+        
+        last_number = max(
+            company.current_number or 0,
+            Invoice.objects.filter(company=company).aggregate(last=Max('number'))['last'] or 0
+        )
+        name = connection.ops.quote_name(cls.get_sequence_name(company))
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {name} START WITH {last_number + 1}')
+        except IntegrityError:
+            # Otra transacción la ha creado a la vez
+            pass
+    
+    @classmethod
+    def drop_sequence(cls, company):
+        name = connection.ops.quote_name(cls.get_sequence_name(company))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP SEQUENCE IF EXISTS {name}')
+    
+    @classmethod
+    def _nextval(cls, company):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [cls.get_sequence_name(company)])
+            return cursor.fetchone()[0]
+    
+    @classmethod
+    def allocate(cls, company):
+        """Reserva el siguiente número de la serie sin bloquear la empresa."""
+        try:
+            with transaction.atomic():
+                number = cls._nextval(company)
+        except ProgrammingError:
+            cls.ensure_sequence(company)
+            number = cls._nextval(company)
+        
+        transaction.on_commit(lambda: cls._sync_current_number(company.pk, number))
+        return number
+    
+    @staticmethod
+    def _sync_current_number(company_id, number):
+        from .models import Company
+        
+        Company.objects.filter(pk=company_id, current_number__lt=number).update(current_number=number)
+    
+    @classmethod
+    def last_number(cls, company):
+        """Último número entregado por la secuencia (incluidos los no confirmados)."""
+        name = connection.ops.quote_name(cls.get_sequence_name(company))
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT last_value, is_called FROM {name}')
+                    last_value, is_called = cursor.fetchone()
+        except ProgrammingError:
+            return company.current_number or 0
+        return last_value if is_called else last_value - 1
+    
+    @classmethod
+    def find_gaps(cls, company):
+        """Números asignados por la serie que no corresponden a ninguna factura."""
+        from .models import Invoice
+        
+        used = set(
+            Invoice.objects.filter(company=company, number__isnull=False).values_list('number', flat=True)
+        )
+        return [number for number in range(1, cls.last_number(company) + 1) if number not in used]
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+
+from .utils import generate_invoice_pdf
+
+logger = logging.getLogger(__name__)
+
+
+class InvoicePDFCache:
+    """
+    Almacén en disco local de PDFs de facturas direccionado por contenido.
+    
+    La clave es un SHA-256 de los campos de la factura, sus líneas y los datos
+    de la empresa, de modo que cualquier cambio produce una clave nueva y la
+    versión anterior nunca se sirve. La clave se usa además como ETag.
+    
+    Estructura: <INVOICE_PDF_CACHE_ROOT>/<esquema>/<id factura>/<clave>.pdf
+    """
+    
+    # Incrementar al cambiar la maquetación del PDF para descartar lo cacheado
+    RENDER_VERSION = '1'
+    
+    INVOICE_EXCLUDED_FIELDS = {'created', 'modified', 'pdf_file'}
+    # current_number cambia con cada factura emitida y no aparece en los PDFs
+    COMPANY_EXCLUDED_FIELDS = {'created', 'modified', 'current_number'}
+    ITEM_FIELDS = ('id', 'description', 'quantity', 'unit_price', 'vat_rate', 'irpf_rate')
+    
+    @staticmethod
+    def _field_values(instance, excluded=()):
+        return {
+            field.attname: getattr(instance, field.attname)
+            for field in instance._meta.concrete_fields
+            if field.name not in excluded
+        }
+    
+    @classmethod
+    def compute_key(cls, invoice, items=None):
+        if items is None:
+            items = list(invoice.items.all())
+        
+        payload = [
+            cls.RENDER_VERSION,
+            cls._field_values(invoice, cls.INVOICE_EXCLUDED_FIELDS),
+            sorted(([getattr(item, field) for field in cls.ITEM_FIELDS] for item in items), key=lambda row: row[0]),
+            cls._field_values(invoice.company, cls.COMPANY_EXCLUDED_FIELDS),
+        ]
+        serialized = json.dumps(payload, default=str, sort_keys=True)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def get_schema_dir():
+        return os.path.join(settings.INVOICE_PDF_CACHE_ROOT, connection.schema_name)
+    
+    @classmethod
+    def get_invoice_dir(cls, invoice_id):
+        return os.path.join(cls.get_schema_dir(), str(invoice_id))
+    
+    @classmethod
+    def get_path(cls, invoice_id, key):
+        return os.path.join(cls.get_invoice_dir(invoice_id), f"{key}.pdf")
+    
+    @classmethod
+    def get_or_render(cls, invoice, key=None):
+        """
+        Devuelve (ruta, clave) del PDF de la factura, generándolo sólo si no
+        existe ya una copia para el contenido actual.
+        """
+        key = key or cls.compute_key(invoice)
+        path = cls.get_path(invoice.pk, key)
+        if os.path.exists(path):
+            return path, key
+        
+        pdf_content = generate_invoice_pdf(invoice)
+        cls._store(invoice.pk, path, pdf_content)
+        return path, key
+    
+    @classmethod
+    def get_pdf_content(cls, invoice):
+        path, _ = cls.get_or_render(invoice)
+        with open(path, 'rb') as pdf_file:
+            return pdf_file.read()
+    
+    @classmethod
+    def get_average_size(cls, invoice_ids, sample_size=50):
+        """
+        Tamaño medio en bytes de los PDFs ya cacheados de una muestra de
+        `invoice_ids`, o None si ninguno está en caché.
+        """
+        sizes = []
+        for invoice_id in list(invoice_ids)[:sample_size]:
+            directory = cls.get_invoice_dir(invoice_id)
+            try:
+                filenames = os.listdir(directory)
+            except OSError:
+                continue
+            for filename in filenames:
+                if filename.endswith('.pdf'):
+                    try:
+                        sizes.append(os.path.getsize(os.path.join(directory, filename)))
+                    except OSError:
+                        pass
+                    break
+        return sum(sizes) // len(sizes) if sizes else None
+    
+    @classmethod
+    def _store(cls, invoice_id, path, pdf_content):
+        directory = cls.get_invoice_dir(invoice_id)
+        os.makedirs(directory, exist_ok=True)
+        
+        # Las versiones anteriores de la factura ya no se volverán a pedir
+        for filename in os.listdir(directory):
+            if filename.endswith('.pdf') and os.path.join(directory, filename) != path:
+                try:
+                    os.remove(os.path.join(directory, filename))
+                except OSError:
+                    pass
+        
+        # Escritura atómica: otro proceso nunca ve un PDF a medio escribir
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(pdf_content)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    @classmethod
+    def invalidate_invoice(cls, invoice_id):
+        shutil.rmtree(cls.get_invoice_dir(invoice_id), ignore_errors=True)
+    
+    @classmethod
+    def invalidate_all(cls):
+        shutil.rmtree(cls.get_schema_dir(), ignore_errors=True)
+        logger.info(f"Invoice PDF cache cleared for schema {connection.schema_name}")
@@ -0,0 +1,32 @@
+"""
+Funciones ejecutadas por los procesos que generan PDFs de facturas en paralelo.
+
+Se arrancan con el método 'spawn', así que este módulo no debe importar modelos
+a nivel de módulo: Django aún no está cargado cuando el worker lo importa.
+"""
+
+
+def init_pdf_worker(schema_name):
+    """Carga Django en el proceso y fija el esquema del tenant en su conexión."""
+    import django
+    django.setup()
+    
+    from django.db import connection
+    connection.set_schema(schema_name)
+
+
+def render_invoice_pdf(invoice_id):
+    """Devuelve (contenido, None) o (None, mensaje de error)."""
+    from .models import Invoice
+    from .pdf_cache import InvoicePDFCache
+    
+    try:
+        invoice = (
+            Invoice.objects
+            .select_related('company')
+            .prefetch_related('items')
+            .get(pk=invoice_id)
+        )
+        return InvoicePDFCache.get_pdf_content(invoice), None
+    except Exception as e:
+        return None, str(e)
@@ -1,13 +1,20 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, Min, Sum
 from django.utils import timezone
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime, timedelta
 from decimal import Decimal
+import multiprocessing
+import os
 import zipfile
-import io
 import logging
 
 from .models import Invoice
-from .utils import generate_invoice_pdf
+from .pdf_workers import init_pdf_worker, render_invoice_pdf
+from .pdf_cache import InvoicePDFCache
+from .utils import InvoicePDFRenderer
 
 logger = logging.getLogger(__name__)
 
@@ -67,57 +74,237 @@ class BulkPDFService:
         
         return queryset.order_by('issue_date', 'reference')
     
+    # Por debajo de este número de facturas no compensa arrancar procesos
+    PARALLEL_MIN_INVOICES = 8
+    
     @staticmethod
-    def generate_bulk_pdfs_zip(invoices, filename_prefix):
-        buffer = io.BytesIO()
-        success_count = 0
-        error_count = 0
+    def get_worker_count(invoice_count):
+        workers = getattr(settings, 'INVOICE_PDF_WORKERS', 0) or os.cpu_count() or 1
+        if invoice_count < BulkPDFService.PARALLEL_MIN_INVOICES:
+            return 1
+        return max(1, min(workers, invoice_count))
+    
+    @staticmethod
+    def get_pdf_filename(invoice_id, reference):
+        return f"{reference or f'borrador_{invoice_id}'}.pdf"
+    
+    @staticmethod
+    def iter_rendered_pdfs(invoices):
+        """
+        Genera los PDFs y los devuelve como tuplas (id, nombre, contenido, error)
+        en el mismo orden que `invoices`.
+        
+        Con más de un worker, cada proceso abre su propia conexión y activa el
+        esquema del tenant actual; el padre sólo mantiene en vuelo una ventana
+        acotada de facturas para no acumular todos los PDFs en memoria.
+        """
+        if hasattr(invoices, 'values_list'):
+            targets = list(invoices.values_list('id', 'reference'))
+        else:
+            invoices = list(invoices)
+            targets = [(invoice.id, invoice.reference) for invoice in invoices]
         
-        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        workers = BulkPDFService.get_worker_count(len(targets))
+        if workers == 1:
+            if hasattr(invoices, 'prefetch_related'):
+                invoices = invoices.select_related('company').prefetch_related('items')
             for invoice in invoices:
+                pdf_filename = BulkPDFService.get_pdf_filename(invoice.id, invoice.reference)
+                try:
+                    yield invoice.id, pdf_filename, InvoicePDFCache.get_pdf_content(invoice), None
+                except Exception as e:
+                    yield invoice.id, pdf_filename, None, str(e)
+            return
+        
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=init_pdf_worker,
+            initargs=(connection.schema_name,)
+        ) as executor:
+            pending = deque()
+            remaining = iter(targets)
+            
+            def submit_next():
+                target = next(remaining, None)
+                if target is not None:
+                    pending.append((target, executor.submit(render_invoice_pdf, target[0])))
+            
+            for _ in range(workers * 2):
+                submit_next()
+            
+            while pending:
+                (invoice_id, reference), future = pending.popleft()
+                submit_next()
                 try:
-                    pdf_content = generate_invoice_pdf(invoice)
-                    pdf_filename = f"{invoice.reference or f'borrador_{invoice.id}'}.pdf"
+                    pdf_content, error = future.result()
+                except Exception as e:
+                    pdf_content, error = None, str(e)
+                yield invoice_id, BulkPDFService.get_pdf_filename(invoice_id, reference), pdf_content, error
+    
+    @staticmethod
+    def write_bulk_pdfs_zip(invoices, output, progress_callback=None):
+        """
+        Escribe en `output` (fichero binario) un ZIP con los PDFs de `invoices`.
+        
+        `progress_callback(procesadas, total)` se invoca tras cada factura.
+        Devuelve (generados, errores).
+        """
+        total = len(invoices) if isinstance(invoices, (list, tuple)) else invoices.count()
+        success_count = 0
+        error_count = 0
+        
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for invoice_id, pdf_filename, pdf_content, error in BulkPDFService.iter_rendered_pdfs(invoices):
+                if error:
+                    error_count += 1
+                    logger.error(f"Error generating PDF for invoice {invoice_id}: {error}")
+                else:
                     zip_file.writestr(pdf_filename, pdf_content)
                     success_count += 1
                     logger.info(f"PDF added to ZIP: {pdf_filename}")
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"Error generating PDF for invoice {invoice.id}: {str(e)}")
-                    continue
+                
+                if progress_callback:
+                    progress_callback(success_count + error_count, total)
         
-        zip_content = buffer.getvalue()
-        buffer.close()
+        return success_count, error_count
+    
+    @staticmethod
+    def write_combined_pdf(invoices, output, progress_callback=None):
+        """
+        Escribe en `output` un único PDF con todas las facturas, pensado para
+        imprimir un periodo completo. Comparte plantilla, marco y contexto de
+        empresa entre facturas. Devuelve el número de facturas incluidas.
+        """
+        if hasattr(invoices, 'prefetch_related'):
+            invoices = invoices.select_related('company').prefetch_related('items')
+        return InvoicePDFRenderer.current().render_combined(invoices, output, progress_callback)
+    
+    # Tamaño supuesto de un PDF cuando no hay ninguno de la muestra en caché
+    DEFAULT_PDF_SIZE = 60 * 1024
+    
+    @staticmethod
+    def estimate_output_size(invoices):
+        """
+        Estimación previa del tamaño de la descarga a partir de los PDFs ya
+        cacheados, y de cuántas facturas caben en cada parte del ZIP.
+        """
+        invoice_ids = list(invoices.values_list('id', flat=True))
+        average_size = InvoicePDFCache.get_average_size(invoice_ids) or BulkPDFService.DEFAULT_PDF_SIZE
+        max_part_bytes = settings.BULK_ZIP_PART_MAX_MB * 1024 * 1024
+        
+        return {
+            'count': len(invoice_ids),
+            'estimated_bytes': average_size * len(invoice_ids),
+            'max_part_bytes': max_part_bytes,
+            'max_invoices_per_part': max(1, max_part_bytes // average_size),
+        }
+    
+    @staticmethod
+    def plan_zip_parts(invoices, filename, estimate):
+        """
+        Reparte las facturas en partes según `estimate_output_size`.
         
-        if success_count == 0:
-            logger.warning("No PDFs generated for ZIP file")
-            return None, 0, error_count
+        Si la descarga estimada cabe en BULK_ZIP_PART_MAX_MB se genera un solo
+        ZIP. Si no, una parte por mes cuando el periodo abarca varios y, dentro
+        de cada mes, bloques de `max_invoices_per_part`. Devuelve una lista de
+        (nombre del ZIP, ids) en orden de emisión.
+        """
+        base_name = filename[:-len('.zip')] if filename.endswith('.zip') else filename
         
-        return zip_content, success_count, error_count
+        months = {}
+        for invoice_id, issue_date in invoices.order_by('issue_date', 'id').values_list('id', 'issue_date'):
+            months.setdefault((issue_date.year, issue_date.month), []).append(invoice_id)
+        
+        if estimate['estimated_bytes'] <= estimate['max_part_bytes']:
+            return [(f"{base_name}.zip", [invoice_id for ids in months.values() for invoice_id in ids])]
+        
+        max_invoices_per_part = estimate['max_invoices_per_part']
+        parts = []
+        for (year, month), invoice_ids in months.items():
+            chunks = [
+                invoice_ids[index:index + max_invoices_per_part]
+                for index in range(0, len(invoice_ids), max_invoices_per_part)
+            ]
+            for number, chunk in enumerate(chunks, start=1):
+                name = base_name
+                if len(months) > 1:
+                    name += f"_{year}-{month:02d}"
+                if len(chunks) > 1:
+                    name += f"_parte{number}"
+                parts.append((f"{name}.zip", chunk))
+        return parts
     
     @staticmethod
-    def create_zip_response(zip_content, filename):
-        response = HttpResponse(zip_content, content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+    def write_bulk_pdf_parts(invoices, parts, directory, progress_callback=None):
+        """
+        Escribe cada parte de `plan_zip_parts` como un ZIP en `directory`.
+        
+        Sólo se generan las facturas fijadas en el plan, en orden, y los PDFs
+        se vuelcan a disco según llegan, así que la memoria no depende del
+        número de facturas. Una parte sin ningún PDF generado no llega a
+        crearse. Devuelve (generados, errores, nombres de las partes escritas).
+        """
+        part_by_invoice = {
+            invoice_id: index
+            for index, (_, invoice_ids) in enumerate(parts)
+            for invoice_id in invoice_ids
+        }
+        total = len(part_by_invoice)
+        success_count = 0
+        error_count = 0
+        written_parts = []
+        current_part = None
+        zip_file = None
+        
+        try:
+            planned = invoices.filter(id__in=list(part_by_invoice)).order_by('issue_date', 'id')
+            for invoice_id, pdf_filename, pdf_content, error in BulkPDFService.iter_rendered_pdfs(planned):
+                if error:
+                    error_count += 1
+                    logger.error(f"Error generating PDF for invoice {invoice_id}: {error}")
+                else:
+                    part_index = part_by_invoice[invoice_id]
+                    if part_index != current_part:
+                        if zip_file:
+                            zip_file.close()
+                        current_part = part_index
+                        written_parts.append(parts[part_index][0])
+                        zip_file = zipfile.ZipFile(
+                            os.path.join(directory, parts[part_index][0]), 'w', zipfile.ZIP_DEFLATED
+                        )
+                    zip_file.writestr(pdf_filename, pdf_content)
+                    success_count += 1
+                
+                if progress_callback:
+                    progress_callback(success_count + error_count, total)
+        finally:
+            if zip_file:
+                zip_file.close()
+        
+        return success_count, error_count, written_parts
     
     @staticmethod
     def get_period_summary(invoices):
-        if not invoices:
+        summary = invoices.aggregate(
+            count=Count('id'),
+            total_amount=Sum('total_amount'),
+            start_date=Min('issue_date'),
+            end_date=Max('issue_date')
+        )
+        
+        if not summary['count']:
             return {
                 'count': 0,
                 'total_amount': '0.00',
                 'date_range': 'Sin facturas'
             }
         
-        total_amount = sum(invoice.total_amount for invoice in invoices)
-        start_date = invoices.first().issue_date
-        end_date = invoices.last().issue_date
-        
         return {
-            'count': invoices.count(),
-            'total_amount': f"{total_amount:.2f}",
-            'date_range': f"{start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"
+            'count': summary['count'],
+            'total_amount': f"{summary['total_amount'] or 0:.2f}",
+            'date_range': f"{summary['start_date'].strftime('%d/%m/%Y')} - {summary['end_date'].strftime('%d/%m/%Y')}"
         }
     
     @staticmethod
@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Company, Invoice, InvoiceItem
+from .numbering import InvoiceNumberAllocator
+from .pdf_cache import InvoicePDFCache
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invalidate_invoice_pdf_on_invoice_change(sender, instance, **kwargs):
+    InvoicePDFCache.invalidate_invoice(instance.pk)
+
+
+_item_signals_suspended = ContextVar('item_signals_suspended', default=False)
+
+
+@contextmanager
+def suspend_item_signals():
+    """
+    Desactiva el recálculo de totales y la invalidación del PDF por línea.
+    Quien guarda líneas en bloque debe hacer ambas cosas una vez al terminar.
+    """
+    token = _item_signals_suspended.set(True)
+    try:
+        yield
+    finally:
+        _item_signals_suspended.reset(token)
+
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+def refresh_invoice_totals_on_item_change(sender, instance, **kwargs):
+    if _item_signals_suspended.get():
+        return
+    Invoice.refresh_totals([instance.invoice_id])
+
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+def invalidate_invoice_pdf_on_item_change(sender, instance, **kwargs):
+    if _item_signals_suspended.get():
+        return
+    InvoicePDFCache.invalidate_invoice(instance.invoice_id)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_invoice_pdfs_on_company_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'current_number'}:
+        return
+    InvoicePDFCache.invalidate_all()
+
+
+@receiver(post_save, sender=Company)
+def create_invoice_number_sequence(sender, instance, created, **kwargs):
+    if created:
+        InvoiceNumberAllocator.ensure_sequence(instance)
+
+
+@receiver(post_delete, sender=Company)
+def drop_invoice_number_sequence(sender, instance, **kwargs):
+    InvoiceNumberAllocator.drop_sequence(instance)
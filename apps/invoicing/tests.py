@@ -0,0 +1,247 @@
+import threading
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django_tenants.test.cases import TenantTestCase
+from django_tenants.utils import get_tenant_model
+
+from apps.invoicing.forms import InvoiceItemFormSet
+from apps.invoicing.models import Company, Invoice, InvoiceItem
+from apps.invoicing.numbering import InvoiceNumberAllocator
+from apps.invoicing.services import BulkPDFService
+
+
+class InvoiceNumberingConcurrencyTestCase(TransactionTestCase):
+    
+    THREADS = 8
+    INVOICES_PER_THREAD = 5
+    
+    def setUp(self):
+        self.tenant = get_tenant_model()(
+            schema_name='numbering_test',
+            name='Numbering Test',
+            email='numbering@test.com'
+        )
+        self.tenant.save(verbosity=0)
+        connection.set_tenant(self.tenant)
+        self.company = Company.objects.create(
+            legal_form='AUTONOMO',
+            business_name='Test Company',
+            tax_id='12345678Z',
+            address='Calle Test 1',
+            postal_code='28001',
+            city='Madrid',
+            bank_name='Test Bank',
+            iban='ES0000000000000000000000'
+        )
+    
+    def tearDown(self):
+        connection.set_schema_to_public()
+        self.tenant.delete(force_drop=True)
+    
+    def _issue_invoice(self, name):
+        return Invoice.objects.create(
+            company=self.company,
+            client_type='INDIVIDUAL',
+            client_name=name,
+            client_address='Calle Cliente 1',
+            status='SENT'
+        )
+    
+    def _issue_invoices_in_thread(self, barrier, results, errors):
+        try:
+            connection.set_tenant(self.tenant)
+            barrier.wait()
+            numbers = []
+            for index in range(self.INVOICES_PER_THREAD):
+                # Cada factura en su propia transacción, como con ATOMIC_REQUESTS
+                with transaction.atomic():
+                    invoice = self._issue_invoice(f'Cliente {threading.get_ident()} {index}')
+                numbers.append(invoice.number)
+                self.assertEqual(invoice.reference, f'FN{invoice.number:03d}_{invoice.issue_date.year % 100}')
+            results.append(numbers)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+    
+    def test_concurrent_invoices_get_unique_ordered_numbers(self):
+        barrier = threading.Barrier(self.THREADS)
+        results, errors = [], []
+        threads = [
+            threading.Thread(target=self._issue_invoices_in_thread, args=(barrier, results, errors))
+            for _ in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.INVOICES_PER_THREAD
+        
+        # Cada hilo recibe números crecientes y entre todos cubren la serie sin huecos
+        for numbers in results:
+            self.assertEqual(numbers, sorted(numbers))
+        all_numbers = sorted(number for numbers in results for number in numbers)
+        self.assertEqual(all_numbers, list(range(1, total + 1)))
+        
+        stored = list(Invoice.objects.order_by('number').values_list('number', flat=True))
+        self.assertEqual(stored, all_numbers)
+        self.assertEqual(Invoice.objects.values('reference').distinct().count(), total)
+        
+        self.company.refresh_from_db()
+        self.assertEqual(self.company.current_number, total)
+        self.assertEqual(InvoiceNumberAllocator.find_gaps(self.company), [])
+    
+    def test_rolled_back_allocation_is_reported_as_gap(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self._issue_invoice('Cliente revertido')
+                raise RuntimeError('rollback')
+        
+        invoice = self._issue_invoice('Cliente')
+        
+        self.assertEqual(invoice.number, 2)
+        self.assertEqual(InvoiceNumberAllocator.find_gaps(self.company), [1])
+
+
+class InvoiceItemFormSetQueryCountTestCase(TenantTestCase):
+    
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Items Test'
+        tenant.email = 'items@test.com'
+    
+    def setUp(self):
+        self.company = Company.objects.create(
+            legal_form='AUTONOMO',
+            business_name='Test Company',
+            tax_id='12345678Z',
+            address='Calle Test 1',
+            postal_code='28001',
+            city='Madrid',
+            bank_name='Test Bank',
+            iban='ES0000000000000000000000'
+        )
+    
+    def _create_invoice(self, item_count):
+        invoice = Invoice.objects.create(
+            company=self.company,
+            client_type='INDIVIDUAL',
+            client_name='Cliente',
+            client_address='Calle Cliente 1'
+        )
+        InvoiceItem.objects.bulk_create([
+            InvoiceItem(invoice=invoice, description=f'Línea {index}', quantity=1, unit_price=Decimal('10.00'))
+            for index in range(item_count)
+        ])
+        return invoice
+    
+    def _formset_data(self, invoice, new_count):
+        items = list(invoice.items.order_by('pk'))
+        data = {
+            'items-TOTAL_FORMS': str(len(items) + new_count),
+            'items-INITIAL_FORMS': str(len(items)),
+            'items-MIN_NUM_FORMS': '0',
+            'items-MAX_NUM_FORMS': '1000',
+        }
+        for index in range(len(items) + new_count):
+            prefix = f'items-{index}'
+            data.update({
+                f'{prefix}-invoice': str(invoice.pk),
+                f'{prefix}-description': f'Servicio {index}',
+                f'{prefix}-quantity': '2',
+                f'{prefix}-unit_price': '25.00',
+                f'{prefix}-vat_rate': '21.00',
+                f'{prefix}-irpf_rate': '0.00',
+            })
+            if index < len(items):
+                data[f'{prefix}-id'] = str(items[index].pk)
+        # La primera línea existente se elimina
+        data['items-0-DELETE'] = 'on'
+        return data
+    
+    def _save_formset(self, existing_count, new_count):
+        invoice = self._create_invoice(existing_count)
+        formset = InvoiceItemFormSet(
+            self._formset_data(invoice, new_count),
+            instance=invoice,
+            form_kwargs={'company': self.company}
+        )
+        self.assertTrue(formset.is_valid(), formset.errors)
+        
+        with CaptureQueriesContext(connection) as queries:
+            formset.save()
+        
+        lines = existing_count - 1 + new_count
+        # La instancia del formset ya tiene los totales recalculados
+        self.assertEqual(invoice.total_amount, Decimal('60.50') * lines)
+        
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.items.count(), lines)
+        self.assertEqual(invoice.base_amount, Decimal('50.00') * lines)
+        self.assertEqual(invoice.total_amount, Decimal('60.50') * lines)
+        return len(queries)
+    
+    def test_formset_save_query_count_does_not_grow_with_lines(self):
+        queries_for_few = self._save_formset(existing_count=2, new_count=1)
+        queries_for_many = self._save_formset(existing_count=40, new_count=10)
+        self.assertEqual(queries_for_few, queries_for_many)
+
+
+class BulkZipPartsPlanTestCase(TenantTestCase):
+    
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Bulk Test'
+        tenant.email = 'bulk@test.com'
+    
+    def setUp(self):
+        company = Company.objects.create(
+            legal_form='AUTONOMO',
+            business_name='Test Company',
+            tax_id='12345678Z',
+            address='Calle Test 1',
+            postal_code='28001',
+            city='Madrid',
+            bank_name='Test Bank',
+            iban='ES0000000000000000000000'
+        )
+        for month in (1, 1, 1, 2):
+            invoice = Invoice.objects.create(
+                company=company,
+                client_type='INDIVIDUAL',
+                client_name='Cliente',
+                client_address='Calle Cliente 1'
+            )
+            Invoice.objects.filter(pk=invoice.pk).update(issue_date=date(2024, month, 10))
+        self.invoices = Invoice.objects.all()
+    
+    def _estimate(self, estimated_bytes, max_invoices_per_part):
+        return {
+            'count': 4,
+            'estimated_bytes': estimated_bytes,
+            'max_part_bytes': 1000,
+            'max_invoices_per_part': max_invoices_per_part,
+        }
+    
+    def test_download_within_limit_is_a_single_zip(self):
+        parts = BulkPDFService.plan_zip_parts(self.invoices, 'facturas_Q1.zip', self._estimate(1000, 2))
+        
+        [(filename, invoice_ids)] = parts
+        self.assertEqual(filename, 'facturas_Q1.zip')
+        self.assertEqual(len(invoice_ids), 4)
+    
+    def test_download_over_limit_is_split_by_month_and_size(self):
+        parts = BulkPDFService.plan_zip_parts(self.invoices, 'facturas_Q1.zip', self._estimate(2000, 2))
+        
+        self.assertEqual([filename for filename, _ in parts], [
+            'facturas_Q1_2024-01_parte1.zip',
+            'facturas_Q1_2024-01_parte2.zip',
+            'facturas_Q1_2024-02.zip',
+        ])
+        self.assertEqual([len(invoice_ids) for _, invoice_ids in parts], [2, 1, 1])
@@ -1,11 +1,17 @@
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.platypus import (
+    BaseDocTemplate, Flowable, Frame, Image, PageBreak, PageTemplate, Paragraph, Spacer, Table, TableStyle
+)
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm, mm
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
+from reportlab.lib.utils import ImageReader
+from collections import OrderedDict
 from io import BytesIO
+from django.db import connection
 import os
+import threading
 
 
 def get_pdf_styles():
@@ -22,23 +28,133 @@ def get_pdf_styles():
     }
 
 
-def create_professional_header(invoice, styles):
-    company_info = [f"<b>{invoice.company.business_name}</b>"]
-    
-    if invoice.company.legal_name and invoice.company.legal_name != invoice.company.business_name:
-        company_info.append(invoice.company.legal_name)
+LAYOUT_TABLE_STYLE = TableStyle([
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+])
+
+SERVICES_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+])
+
+TOTALS_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+])
+
+LOGO_WIDTH = 60
+LOGO_HEIGHT = 30
+
+
+class CachedLogo(Flowable):
+    """Dibuja un logo ya decodificado; el mismo ImageReader sirve para todas las facturas."""
     
-    company_info.extend([
-        f"NIF/CIF: {invoice.company.tax_id}",
-        f"Régimen empresarial: {invoice.company.get_legal_form_display()}" if invoice.company.legal_form else "Régimen empresarial: Empresario Individual",
-        f"Dirección: {invoice.company.get_full_address()}"
-    ])
+    def __init__(self, image_reader, width=LOGO_WIDTH, height=LOGO_HEIGHT):
+        super().__init__()
+        self.image_reader = image_reader
+        self.width = width
+        self.height = height
     
-    if invoice.company.phone:
-        company_info.append(f"Tel: {invoice.company.phone}")
-    if invoice.company.email:
-        company_info.append(f"Email: {invoice.company.email}")
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
     
+    def draw(self):
+        self.canv.drawImage(self.image_reader, 0, 0, self.width, self.height, mask='auto')
+
+
+class PDFRenderContext:
+    """
+    Todo lo que no depende de la factura concreta: estilos, logo decodificado y
+    textos fijos de cabecera y pie de la empresa.
+    
+    Se cachea por proceso con clave (esquema, empresa, fecha de modificación),
+    de modo que editar la empresa invalida la entrada sin señales adicionales.
+    """
+    
+    MAX_CACHED = 32
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+    
+    def __init__(self, company):
+        self.styles = get_pdf_styles()
+        self.logo = self._load_logo(company)
+        
+        company_info = [f"<b>{company.business_name}</b>"]
+        if company.legal_name and company.legal_name != company.business_name:
+            company_info.append(company.legal_name)
+        company_info.extend([
+            f"NIF/CIF: {company.tax_id}",
+            f"Régimen empresarial: {company.get_legal_form_display()}" if company.legal_form else "Régimen empresarial: Empresario Individual",
+            f"Dirección: {company.get_full_address()}"
+        ])
+        if company.phone:
+            company_info.append(f"Tel: {company.phone}")
+        if company.email:
+            company_info.append(f"Email: {company.email}")
+        self.company_markup = "<br/>".join(company_info)
+        
+        self.bank_info = []
+        if company.bank_name and company.iban:
+            self.bank_info = [
+                "<b>Datos bancarios:</b>",
+                f"Banco: {company.bank_name}",
+                f"IBAN: {company.iban}"
+            ]
+        
+        optional_info = []
+        if company.mercantile_registry:
+            optional_info.append(f"Registro Mercantil: {company.mercantile_registry}")
+        if company.share_capital:
+            optional_info.append(f"Capital Social: {company.share_capital:.2f} €")
+        self.optional_info_markup = " | ".join(optional_info)
+        
+        entity_display = "Empresario Individual" if company.is_freelancer else company.get_legal_form_display()
+        self.footer_markup = f"{entity_display} - Página 1"
+    
+    @staticmethod
+    def _load_logo(company):
+        if not company.logo or not os.path.exists(company.logo.path):
+            return None
+        with open(company.logo.path, 'rb') as logo_file:
+            reader = ImageReader(BytesIO(logo_file.read()))
+        # Fuerza la decodificación ahora para no repetirla en cada factura
+        reader.getRGBData()
+        return reader
+    
+    @classmethod
+    def for_company(cls, company):
+        key = (getattr(connection, 'schema_name', None), company.pk, company.modified)
+        with cls._lock:
+            context = cls._cache.get(key)
+            if context is not None:
+                cls._cache.move_to_end(key)
+                return context
+        
+        # Se construye fuera del lock; si otro hilo se adelanta se conserva su entrada
+        context = cls(company)
+        with cls._lock:
+            context = cls._cache.setdefault(key, context)
+            cls._cache.move_to_end(key)
+            while len(cls._cache) > cls.MAX_CACHED:
+                cls._cache.popitem(last=False)
+        return context
+    
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache.clear()
+
+
+def create_professional_header(invoice, context):
     invoice_info = [
         f"<b>FACTURA {invoice.reference or 'BORRADOR'}</b>",
         f"Fecha: {invoice.issue_date.strftime('%d/%m/%Y')}"
@@ -47,26 +163,22 @@ def create_professional_header(invoice, styles):
     if hasattr(invoice, 'due_date') and invoice.due_date:
         invoice_info.append(f"Vencimiento: {invoice.due_date.strftime('%d/%m/%Y')}")
     
-    left_content = company_info
-    if invoice.company.logo and os.path.exists(invoice.company.logo.path):
-        left_content.insert(0, f'<img src="{invoice.company.logo.path}" width="60" height="30" valign="top"/>')
+    left_content = Paragraph(context.company_markup, context.styles['company'])
+    if context.logo:
+        left_content = [CachedLogo(context.logo), left_content]
     
     header_data = [[
-        Paragraph("<br/>".join(left_content), styles['company']),
-        Paragraph("<br/>".join(invoice_info), styles['invoice_data'])
+        left_content,
+        Paragraph("<br/>".join(invoice_info), context.styles['invoice_data'])
     ]]
     
     header_table = Table(header_data, colWidths=[11*cm, 6*cm])
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-    ]))
+    header_table.setStyle(LAYOUT_TABLE_STYLE)
     
     return header_table
 
 
-def create_client_section(invoice, styles):
+def create_client_section(invoice, context):
     client_info = [
         f"<b>FACTURAR A:</b>",
         f"{invoice.client_name}",
@@ -77,14 +189,10 @@ def create_client_section(invoice, styles):
     if invoice.client_tax_id:
         client_info.append(f"NIF/CIF: {invoice.client_tax_id}")
     
-    client_data = [[Paragraph("<br/>".join(client_info), styles['client'])]]
+    client_data = [[Paragraph("<br/>".join(client_info), context.styles['client'])]]
     
     client_table = Table(client_data, colWidths=[17*cm])
-    client_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-    ]))
+    client_table.setStyle(LAYOUT_TABLE_STYLE)
     
     return client_table
 
@@ -96,13 +204,13 @@ def format_percentage(rate):
     return f"{percentage:.0f}%"
 
 
-def create_services_section(invoice, styles):
+def create_services_section(items, context):
     headers = ['Descripción', 'Cant.', 'Precio Unit.', 'IVA', 'IRPF', 'Total']
     service_data = [headers]
     
-    for item in invoice.items.all():
+    for item in items:
         service_data.append([
-            Paragraph(item.description.replace('\n', '<br/>'), styles['table_content']),
+            Paragraph(item.description.replace('\n', '<br/>'), context.styles['table_content']),
             str(item.quantity),
             format_currency(item.unit_price),
             format_percentage(item.vat_rate),
@@ -111,19 +219,26 @@ def create_services_section(invoice, styles):
         ])
     
     service_table = Table(service_data, colWidths=[7*cm, 1*cm, 2*cm, 1.5*cm, 1.5*cm, 2*cm])
-    service_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-    ]))
+    service_table.setStyle(SERVICES_TABLE_STYLE)
     
     return service_table
 
 
-def create_totals_section(invoice, styles):
+def calculate_totals(items):
+    """Totales de la factura a partir de sus líneas ya cargadas (sin consultas extra)."""
+    base_amount = sum(item.line_total for item in items)
+    vat_amount = sum(item.vat_amount for item in items)
+    irpf_amount = sum(item.irpf_amount for item in items)
+    return {
+        'base': base_amount,
+        'vat': vat_amount,
+        'irpf': irpf_amount,
+        'total': base_amount + vat_amount - irpf_amount,
+        'first_item': min(items, key=lambda item: item.pk) if items else None,
+    }
+
+
+def create_totals_section(invoice, totals, context):
     payment_info = []
     if invoice.payment_terms:
         payment_info.extend([
@@ -132,47 +247,33 @@ def create_totals_section(invoice, styles):
             ""
         ])
     
-    if invoice.company.bank_name and invoice.company.iban:
-        payment_info.extend([
-            "<b>Datos bancarios:</b>",
-            f"Banco: {invoice.company.bank_name}",
-            f"IBAN: {invoice.company.iban}"
-        ])
+    payment_info.extend(context.bank_info)
+    first_item = totals['first_item']
     
     totals_data = [
-        ["Subtotal (Base imponible)", format_currency(invoice.base_amount)]
+        ["Subtotal (Base imponible)", format_currency(totals['base'])]
     ]
     
-    if invoice.vat_amount > 0:
-        vat_rate = invoice.items.first().vat_rate if invoice.items.exists() else 0
-        totals_data.append([f"IVA ({format_percentage(vat_rate)})", format_currency(invoice.vat_amount)])
+    if totals['vat'] > 0:
+        vat_rate = first_item.vat_rate if first_item else 0
+        totals_data.append([f"IVA ({format_percentage(vat_rate)})", format_currency(totals['vat'])])
     
-    if invoice.irpf_amount > 0:
-        irpf_rate = invoice.items.first().irpf_rate if invoice.items.exists() else 0
-        totals_data.append([f"Retención IRPF ({format_percentage(irpf_rate)})", f"-{format_currency(invoice.irpf_amount)}"])
+    if totals['irpf'] > 0:
+        irpf_rate = first_item.irpf_rate if first_item else 0
+        totals_data.append([f"Retención IRPF ({format_percentage(irpf_rate)})", f"-{format_currency(totals['irpf'])}"])
     
-    totals_data.append(["TOTAL A PAGAR", format_currency(invoice.total_amount)])
+    totals_data.append(["TOTAL A PAGAR", format_currency(totals['total'])])
     
     totals_table = Table(totals_data, colWidths=[4*cm, 2.5*cm])
-    totals_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-    ]))
+    totals_table.setStyle(TOTALS_TABLE_STYLE)
     
     final_data = [[
-        Paragraph("<br/>".join(payment_info), styles['table_content']),
+        Paragraph("<br/>".join(payment_info), context.styles['table_content']),
         totals_table
     ]]
     
     final_table = Table(final_data, colWidths=[10.5*cm, 6.5*cm])
-    final_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-    ]))
+    final_table.setStyle(LAYOUT_TABLE_STYLE)
     
     return final_table
 
@@ -181,30 +282,24 @@ def format_currency(amount):
     return f"{amount:.2f} €"
 
 
-def generate_invoice_pdf(invoice):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer, 
-        pagesize=A4, 
-        rightMargin=20*mm, 
-        leftMargin=20*mm, 
-        topMargin=20*mm, 
-        bottomMargin=30*mm
-    )
-    
-    styles = get_pdf_styles()
+def build_invoice_story(invoice, context, items=None):
+    """Flowables de una factura; los comparten el PDF individual y el combinado."""
+    styles = context.styles
+    if items is None:
+        items = list(invoice.items.all())
+    totals = calculate_totals(items)
     story = []
     
-    story.append(create_professional_header(invoice, styles))
+    story.append(create_professional_header(invoice, context))
     story.append(Spacer(1, 12*mm))
     
-    story.append(create_client_section(invoice, styles))
+    story.append(create_client_section(invoice, context))
     story.append(Spacer(1, 8*mm))
     
-    story.append(create_services_section(invoice, styles))
+    story.append(create_services_section(items, context))
     story.append(Spacer(1, 8*mm))
     
-    story.append(create_totals_section(invoice, styles))
+    story.append(create_totals_section(invoice, totals, context))
     story.append(Spacer(1, 10*mm))
     
     legal_note = invoice.get_legal_note()
@@ -213,32 +308,117 @@ def generate_invoice_pdf(invoice):
         story.append(Spacer(1, 5*mm))
     
     legal_info = []
-    optional_info = []
     
-    if invoice.company.mercantile_registry:
-        optional_info.append(f"Registro Mercantil: {invoice.company.mercantile_registry}")
-    if invoice.company.share_capital:
-        optional_info.append(f"Capital Social: {invoice.company.share_capital:.2f} €")
-    
-    if invoice.irpf_amount > 0:
+    if totals['irpf'] > 0:
         legal_info.append("Factura sujeta a retención de IRPF según normativa fiscal vigente")
-    if invoice.vat_amount > 0:
+    if totals['vat'] > 0:
         legal_info.append("IVA incluido según legislación vigente")
     
     legal_info.append("Factura emitida según Real Decreto 1619/2012 sobre obligaciones de facturación")
     
-    if optional_info:
-        story.append(Paragraph(" | ".join(optional_info), styles['legal']))
+    if context.optional_info_markup:
+        story.append(Paragraph(context.optional_info_markup, styles['legal']))
         story.append(Spacer(1, 3*mm))
     
     if legal_info:
         story.append(Paragraph(" | ".join(legal_info), styles['legal']))
         story.append(Spacer(1, 5*mm))
     
-    entity_display = "Empresario Individual" if invoice.company.is_freelancer else invoice.company.get_legal_form_display()
-    story.append(Paragraph(f"{entity_display} - Página 1", styles['footer']))
+    story.append(Paragraph(context.footer_markup, styles['footer']))
+    return story
+
+
+class ProgressMarker(Flowable):
+    """Flowable sin tamaño que avisa cuando el documento llega a ese punto."""
+    
+    def __init__(self, callback, *args):
+        super().__init__()
+        self.callback = callback
+        self.args = args
+    
+    def wrap(self, available_width, available_height):
+        return 0, 0
     
-    doc.build(story)
-    pdf = buffer.getvalue()
-    buffer.close()
-    return pdf
+    def draw(self):
+        self.callback(*self.args)
+
+
+class InvoicePDFRenderer:
+    """
+    Genera PDFs de facturas con una única plantilla de página y marco.
+    
+    La plantilla, el marco y el contexto de la empresa (estilos, fuentes ya
+    cargadas por reportlab, logo) se reutilizan entre documentos; por cada
+    factura sólo se construyen sus flowables. Cada hilo usa su propia
+    instancia porque el marco guarda estado mientras se maqueta una página.
+    """
+    
+    PAGE_SIZE = A4
+    LEFT_MARGIN = 20*mm
+    RIGHT_MARGIN = 20*mm
+    TOP_MARGIN = 20*mm
+    BOTTOM_MARGIN = 30*mm
+    
+    _local = threading.local()
+    
+    def __init__(self):
+        page_width, page_height = self.PAGE_SIZE
+        self.frame = Frame(
+            self.LEFT_MARGIN,
+            self.BOTTOM_MARGIN,
+            page_width - self.LEFT_MARGIN - self.RIGHT_MARGIN,
+            page_height - self.TOP_MARGIN - self.BOTTOM_MARGIN,
+            id='normal'
+        )
+        self.page_template = PageTemplate(id='invoice', frames=[self.frame])
+    
+    @classmethod
+    def current(cls):
+        renderer = getattr(cls._local, 'renderer', None)
+        if renderer is None:
+            renderer = cls._local.renderer = cls()
+        return renderer
+    
+    def build(self, output, story):
+        doc = BaseDocTemplate(
+            output,
+            pagesize=self.PAGE_SIZE,
+            pageTemplates=[self.page_template],
+            rightMargin=self.RIGHT_MARGIN,
+            leftMargin=self.LEFT_MARGIN,
+            topMargin=self.TOP_MARGIN,
+            bottomMargin=self.BOTTOM_MARGIN
+        )
+        doc.build(story)
+    
+    def render(self, invoice):
+        buffer = BytesIO()
+        context = PDFRenderContext.for_company(invoice.company)
+        self.build(buffer, build_invoice_story(invoice, context))
+        pdf = buffer.getvalue()
+        buffer.close()
+        return pdf
+    
+    def render_combined(self, invoices, output, progress_callback=None):
+        """
+        Escribe en `output` un único PDF con todas las facturas, cada una a
+        partir de una página nueva. `progress_callback(maquetadas, total)` se
+        invoca según se maqueta cada factura. Devuelve el número de facturas.
+        """
+        invoices = list(invoices)
+        story = []
+        for index, invoice in enumerate(invoices):
+            if index:
+                story.append(PageBreak())
+            context = PDFRenderContext.for_company(invoice.company)
+            story.extend(build_invoice_story(invoice, context))
+            if progress_callback:
+                story.append(ProgressMarker(progress_callback, index + 1, len(invoices)))
+        
+        if story:
+            self.build(output, story)
+        return len(invoices)
+
+
+def generate_invoice_pdf(invoice):
+    return InvoicePDFRenderer.current().render(invoice)
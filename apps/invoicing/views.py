@@ -2,18 +2,23 @@ from django.shortcuts import redirect, get_object_or_404
 from django.views.generic import CreateView, ListView, DetailView, UpdateView
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.http import HttpResponse, Http404, JsonResponse
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, Http404, JsonResponse
+from django.utils.http import parse_etags
 from django.db.models import Q
 from django.db import transaction
+from django.views.decorators.http import require_http_methods
 from datetime import datetime, date, timedelta
 from django.utils import timezone
 import logging
 
 from .models import Company, Invoice, InvoiceItem
 from .forms import CompanyForm, InvoiceForm, InvoiceItemFormSet
-from .utils import generate_invoice_pdf
+from .pdf_cache import InvoicePDFCache
 from .services import BulkPDFService
+from apps.core.services.job_service import JobService
+from apps.core.services.keyset_pagination import KeysetPaginator
 from apps.core.services.temporal_service import get_available_years
+from apps.core.views.job_views import job_accepted_response
 
 logger = logging.getLogger(__name__)
 
@@ -82,12 +87,38 @@ class InvoiceListView(ListView):
     context_object_name = 'invoices'
     paginate_by = 20
     ordering = ['-issue_date']
+    
+    SORT_OPTIONS = [
+        ('-issue_date', 'Más recientes'),
+        ('issue_date', 'Más antiguas'),
+        ('-total_amount', 'Mayor importe'),
+        ('total_amount', 'Menor importe'),
+    ]
+
+    def get_sort(self):
+        sort = self.request.GET.get('sort', '-issue_date')
+        return sort if sort in dict(self.SORT_OPTIONS) else '-issue_date'
+
+    def get_ordering(self):
+        sort = self.get_sort()
+        return [sort, '-id' if sort.startswith('-') else 'id']
+
+    def get_date_range(self):
+        """Fechas desde/hasta indicadas a mano; sustituyen al periodo predefinido."""
+        dates = []
+        for param in ('date_from', 'date_to'):
+            try:
+                dates.append(date.fromisoformat(self.request.GET.get(param, '')))
+            except ValueError:
+                dates.append(None)
+        return dates
 
     def get_queryset(self):
         queryset = super().get_queryset()
         search = self.request.GET.get('search')
         status = self.request.GET.get('status')
         period = self.request.GET.get('period', 'current_month')
+        date_from, date_to = self.get_date_range()
         
         if search:
             queryset = queryset.filter(
@@ -99,10 +130,25 @@ class InvoiceListView(ListView):
         if status:
             queryset = queryset.filter(status=status)
             
-        queryset = self._apply_period_filter(queryset, period)
+        if date_from or date_to:
+            if date_from:
+                queryset = queryset.filter(issue_date__gte=date_from)
+            if date_to:
+                queryset = queryset.filter(issue_date__lte=date_to)
+        else:
+            queryset = self._apply_period_filter(queryset, period)
         
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        # Paginación por cursor: el coste de cada página no depende del histórico
+        paginator = KeysetPaginator(queryset, self.get_sort(), page_size)
+        page = paginator.get_page(
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before')
+        )
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def _apply_period_filter(self, queryset, period_type):
         today = timezone.now().date()
         
@@ -141,6 +187,16 @@ class InvoiceListView(ListView):
         context['search'] = self.request.GET.get('search', '')
         context['status'] = self.request.GET.get('status', '')
         context['period'] = self.request.GET.get('period', 'current_month')
+        context['sort'] = self.get_sort()
+        date_from, date_to = self.get_date_range()
+        context['date_from'] = date_from.isoformat() if date_from else ''
+        context['date_to'] = date_to.isoformat() if date_to else ''
+        
+        filter_params = self.request.GET.copy()
+        for param in ('after', 'before', 'page'):
+            filter_params.pop(param, None)
+        context['filter_query'] = filter_params.urlencode()
+        context['sort_options'] = self.SORT_OPTIONS
         context['has_company'] = Company.objects.exists()
         context['current_year'] = timezone.now().year
         context['available_years'] = get_available_years()
@@ -249,7 +305,7 @@ class InvoiceUpdateView(UpdateView):
                 
                 if old_status == 'DRAFT' and self.object.status != 'DRAFT':
                     self.object.assign_reference_if_needed()
-                    self.object.save(update_fields=['reference'])
+                    self.object.save(update_fields=['reference', 'number'])
                 
                 logger.info(f"Invoice updated: {self.object.reference or 'DRAFT'} for {self.object.client_name}")
                 messages.success(
@@ -264,15 +320,24 @@ class InvoiceUpdateView(UpdateView):
         return reverse_lazy('invoicing:invoice_detail', kwargs={'pk': self.object.pk})
 
 def generate_pdf_view(request, pk):
-    invoice = get_object_or_404(Invoice, pk=pk)
+    invoice = get_object_or_404(Invoice.objects.select_related('company').prefetch_related('items'), pk=pk)
     try:
-        pdf_content = generate_invoice_pdf(invoice)
+        key = InvoicePDFCache.compute_key(invoice)
+        etag = f'"{key}"'
+        
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
         
-        response = HttpResponse(pdf_content, content_type='application/pdf')
+        pdf_path, _ = InvoicePDFCache.get_or_render(invoice, key=key)
         filename = f'factura_{invoice.reference or "borrador"}.pdf'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         
-        logger.info(f"PDF generated for invoice: {invoice.reference or 'DRAFT'}")
+        response = FileResponse(open(pdf_path, 'rb'), as_attachment=True, filename=filename, content_type='application/pdf')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        
+        logger.info(f"PDF served for invoice: {invoice.reference or 'DRAFT'}")
         return response
     except Exception as e:
         logger.error(f"Error generating PDF for invoice {invoice.reference or 'DRAFT'}: {str(e)}")
@@ -280,112 +345,72 @@ def generate_pdf_view(request, pk):
         return redirect('invoicing:invoice_detail', pk=pk)
 
 
+def _enqueue_bulk_download(request, invoices, status, period_label, params):
+    if not invoices.exists():
+        if status == 'SENT':
+            status_text = " enviadas"
+        elif status == 'PAID':
+            status_text = " pagadas"
+        else:
+            status_text = " enviadas o pagadas"
+        return JsonResponse(
+            {'success': False, 'error': f'No se encontraron facturas{status_text} para {period_label}'},
+            status=404
+        )
+    
+    if request.POST.get('output_format') == 'pdf':
+        params = {**params, 'output_format': 'pdf', 'filename': params['filename'].replace('.zip', '.pdf')}
+    
+    job = JobService.enqueue(
+        'invoicing.bulk_pdf',
+        params={**params, 'status': status},
+        requested_by=request.user.get_username()
+    )
+    logger.info(f"Bulk download queued as job {job.pk} for {period_label}")
+    return job_accepted_response(job)
+
+
+@require_http_methods(["POST"])
 def bulk_download_monthly_view(request):
-    year = int(request.GET.get('year', timezone.now().year))
-    month = int(request.GET.get('month', timezone.now().month))
-    status = request.GET.get('status', None)
+    year = int(request.POST.get('year', timezone.now().year))
+    month = int(request.POST.get('month', timezone.now().month))
+    status = request.POST.get('status') or None
     
     try:
         invoices = BulkPDFService.get_period_invoices('monthly', year=year, month=month, status=status)
+        month_name = BulkPDFService.get_months_name()[month - 1][1].lower()
         
-        if not invoices.exists():
-            status_text = ""
-            if status == 'SENT':
-                status_text = " enviadas"
-            elif status == 'PAID':
-                status_text = " pagadas"
-            else:
-                status_text = " enviadas o pagadas"
-            messages.warning(request, f'No se encontraron facturas{status_text} para {month:02d}/{year}')
-            return redirect('invoicing:invoice_list')
-        
-        zip_content, success_count, error_count = BulkPDFService.generate_bulk_pdfs_zip(
-            invoices, 
-            f"facturas_{year}_{month:02d}"
-        )
-        
-        if not zip_content:
-            messages.error(request, 'Error al generar el archivo ZIP')
-            return redirect('invoicing:invoice_list')
-        
-        month_names = {
-            1: 'enero', 2: 'febrero', 3: 'marzo', 4: 'abril',
-            5: 'mayo', 6: 'junio', 7: 'julio', 8: 'agosto',
-            9: 'septiembre', 10: 'octubre', 11: 'noviembre', 12: 'diciembre'
-        }
-        
-        filename = f"facturas_{month_names[month]}_{year}.zip"
-        
-        if error_count > 0:
-            messages.warning(
-                request, 
-                f'Descarga completada: {success_count} facturas generadas, {error_count} errores'
-            )
-        else:
-            messages.success(
-                request, 
-                f'Descarga completada: {success_count} facturas de {month_names[month]} {year}'
-            )
-        
-        logger.info(f"Bulk monthly download: {success_count} invoices for {month:02d}/{year}")
-        
-        return BulkPDFService.create_zip_response(zip_content, filename)
+        return _enqueue_bulk_download(request, invoices, status, f'{month:02d}/{year}', {
+            'period_type': 'monthly',
+            'year': year,
+            'month': month,
+            'filename': f"facturas_{month_name}_{year}.zip",
+        })
         
     except Exception as e:
         logger.error(f"Error in bulk monthly download: {str(e)}")
-        messages.error(request, f'Error al generar la descarga masiva: {str(e)}')
-        return redirect('invoicing:invoice_list')
+        return JsonResponse({'success': False, 'error': f'Error al generar la descarga masiva: {str(e)}'}, status=500)
 
 
+@require_http_methods(["POST"])
 def bulk_download_quarterly_view(request):
-    year = int(request.GET.get('year', timezone.now().year))
-    quarter = int(request.GET.get('quarter', (timezone.now().month - 1) // 3 + 1))
-    status = request.GET.get('status', None)
+    year = int(request.POST.get('year', timezone.now().year))
+    quarter = int(request.POST.get('quarter', (timezone.now().month - 1) // 3 + 1))
+    status = request.POST.get('status') or None
     
     try:
         invoices = BulkPDFService.get_period_invoices('quarterly', year=year, quarter=quarter, status=status)
         
-        if not invoices.exists():
-            status_text = ""
-            if status == 'SENT':
-                status_text = " enviadas"
-            elif status == 'PAID':
-                status_text = " pagadas"
-            else:
-                status_text = " enviadas o pagadas"
-            messages.warning(request, f'No se encontraron facturas{status_text} para Q{quarter}/{year}')
-            return redirect('invoicing:invoice_list')
-        
-        zip_content, success_count, error_count = BulkPDFService.generate_bulk_pdfs_zip(
-            invoices, 
-            f"facturas_{year}_Q{quarter}"
-        )
-        
-        if not zip_content:
-            messages.error(request, 'Error al generar el archivo ZIP')
-            return redirect('invoicing:invoice_list')
-        
-        filename = f"facturas_Q{quarter}_{year}.zip"
-        
-        if error_count > 0:
-            messages.warning(
-                request, 
-                f'Descarga completada: {success_count} facturas generadas, {error_count} errores'
-            )
-        else:
-            messages.success(
-                request, 
-                f'Descarga completada: {success_count} facturas del Q{quarter} {year}'
-            )
-        
-        logger.info(f"Bulk quarterly download: {success_count} invoices for Q{quarter}/{year}")
-        
-        return BulkPDFService.create_zip_response(zip_content, filename)
+        return _enqueue_bulk_download(request, invoices, status, f'Q{quarter}/{year}', {
+            'period_type': 'quarterly',
+            'year': year,
+            'quarter': quarter,
+            'filename': f"facturas_Q{quarter}_{year}.zip",
+        })
         
     except Exception as e:
         logger.error(f"Error in bulk quarterly download: {str(e)}")
-        messages.error(request, f'Error al generar la descarga masiva: {str(e)}')
-        return redirect('invoicing:invoice_list')
+        return JsonResponse({'success': False, 'error': f'Error al generar la descarga masiva: {str(e)}'}, status=500)
 
 
 def bulk_preview_view(request):
@@ -406,12 +431,19 @@ def bulk_preview_view(request):
             return JsonResponse({'error': 'Tipo de período no válido'}, status=400)
         
         summary = BulkPDFService.get_period_summary(invoices)
+        estimate = BulkPDFService.estimate_output_size(invoices)
+        if request.GET.get('output_format') == 'pdf':
+            parts = [None]
+        else:
+            parts = BulkPDFService.plan_zip_parts(invoices, 'facturas.zip', estimate)
         
         return JsonResponse({
             'count': summary['count'],
             'total_amount': summary['total_amount'],
             'date_range': summary['date_range'],
             'period_name': period_name,
+            'estimated_size_mb': round(estimate['estimated_bytes'] / (1024 * 1024), 1),
+            'parts': len(parts),
             'success': True
         })
         
@@ -1,13 +1,16 @@
 from django.conf import settings
 from django_tenants.utils import connection
 
+from apps.tenants.services.tenant_resolution_cache import TenantResolutionCache
+
 
 def tenant_context(request):
     """
     Context processor que proporciona información del tenant
     y URLs correctas para desarrollo y producción
     """
-    current_tenant = connection.tenant
+    # El middleware ya ha resuelto el tenant de la petición
+    current_tenant = getattr(request, 'tenant', None) or connection.tenant
     context = {}
     
     # Información básica del tenant
@@ -17,12 +20,13 @@ def tenant_context(request):
     # En desarrollo, proporcionar URLs que funcionen con el sistema de parámetros
     if settings.DEBUG and hasattr(request, 'user') and request.user.is_authenticated:
         tenant_param = ''
+        user_tenant = TenantResolutionCache.get_by_pk(getattr(request.user, 'tenant_id', None))
         
         # Si estamos en modo desarrollo con parámetro de tenant
         if request.GET.get('tenant'):
             tenant_param = f'?tenant={request.GET.get("tenant")}'
-        elif hasattr(request.user, 'tenant') and request.user.tenant:
-            tenant_param = f'?tenant={request.user.tenant.schema_name}'
+        elif user_tenant:
+            tenant_param = f'?tenant={user_tenant.schema_name}'
         
         context['dev_urls'] = {
             'dashboard': f'/{tenant_param}',
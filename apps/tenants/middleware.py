@@ -1,8 +1,20 @@
 from django.http import HttpResponseRedirect
 from django.urls import reverse
 from django.conf import settings
+from django_tenants.middleware.main import TenantMainMiddleware
 from django_tenants.utils import connection
 from apps.tenants.models import Tenant, Domain
+from apps.tenants.services.tenant_resolution_cache import TenantResolutionCache
+
+
+class TenantResolutionMiddleware(TenantMainMiddleware):
+    """
+    TenantMainMiddleware que resuelve el dominio a través de
+    TenantResolutionCache: con la caché caliente no consulta Domain ni Tenant.
+    """
+    
+    def get_tenant(self, domain_model, hostname):
+        return TenantResolutionCache.get_by_domain(hostname)
 
 
 class DevelopmentTenantMiddleware:
@@ -2,5 +2,6 @@ from .tenant_service import TenantService
 from .tenant_data_service import TenantDataService
 from .tenant_validation_service import TenantValidationService
 from .tenant_creation_service import TenantCreationService
+from .tenant_resolution_cache import TenantResolutionCache
 
-__all__ = ['TenantService', 'TenantDataService', 'TenantValidationService', 'TenantCreationService']
+__all__ = ['TenantService', 'TenantDataService', 'TenantValidationService', 'TenantCreationService', 'TenantResolutionCache']
@@ -0,0 +1,98 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+
+
+class TenantResolutionCache:
+    """
+    Caché por proceso de dominio → tenant, con caducidad.
+    
+    La comparten TenantResolutionMiddleware y el context processor
+    tenant_context: con la caché caliente, enrutar una petición no hace
+    ninguna consulta. Las señales de Tenant y Domain (incluidos soft_delete()
+    y restore(), que pasan por save()) vacían las entradas afectadas tras el
+    commit en el proceso que escribe; en los demás caducan a los
+    TENANT_RESOLUTION_CACHE_TTL segundos. Con TTL 0 no se cachea nada.
+    
+    Se devuelve siempre una copia del tenant: el middleware le anota
+    domain_url y no debe compartirse entre peticiones.
+    """
+    
+    _by_domain = {}
+    _by_pk = {}
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def _ttl():
+        return settings.TENANT_RESOLUTION_CACHE_TTL
+    
+    @classmethod
+    def _get(cls, entries, key):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        expires_at, tenant = entry
+        if expires_at <= time.monotonic():
+            entries.pop(key, None)
+            return None
+        return copy.copy(tenant)
+    
+    @classmethod
+    def _store(cls, tenant, hostname=None):
+        ttl = cls._ttl()
+        if ttl <= 0:
+            return
+        expires_at = time.monotonic() + ttl
+        with cls._lock:
+            cls._by_pk[tenant.pk] = (expires_at, tenant)
+            if hostname:
+                cls._by_domain[hostname] = (expires_at, tenant)
+    
+    @classmethod
+    def get_by_domain(cls, hostname):
+        """Tenant asociado al dominio; lanza Domain.DoesNotExist si no hay ninguno."""
+        tenant = cls._get(cls._by_domain, hostname)
+        if tenant is not None:
+            return tenant
+        
+        from apps.tenants.models import Domain
+        tenant = Domain.objects.select_related('tenant').get(domain=hostname).tenant
+        cls._store(tenant, hostname)
+        return copy.copy(tenant)
+    
+    @classmethod
+    def get_by_pk(cls, tenant_id):
+        if tenant_id is None:
+            return None
+        tenant = cls._get(cls._by_pk, tenant_id)
+        if tenant is not None:
+            return tenant
+        
+        from apps.tenants.models import Tenant
+        tenant = Tenant.objects.filter(pk=tenant_id).first()
+        if tenant is None:
+            return None
+        cls._store(tenant)
+        return copy.copy(tenant)
+    
+    @classmethod
+    def invalidate_tenant(cls, tenant_id):
+        with cls._lock:
+            cls._by_pk.pop(tenant_id, None)
+            for hostname in [hostname for hostname, (_, tenant) in cls._by_domain.items() if tenant.pk == tenant_id]:
+                del cls._by_domain[hostname]
+    
+    @classmethod
+    def invalidate_domain(cls, hostname, tenant_id):
+        # Si el dominio se ha renombrado, el nombre anterior sigue apuntando al tenant
+        with cls._lock:
+            cls._by_domain.pop(hostname, None)
+        cls.invalidate_tenant(tenant_id)
+    
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._by_domain.clear()
+            cls._by_pk.clear()
@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Tenant, Domain
+from .services.tenant_resolution_cache import TenantResolutionCache
+
+
+# Se invalida al momento y otra vez tras el commit, por si entretanto una
+# lectura en este proceso ha cacheado el estado aún no confirmado
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_resolution(sender, instance, **kwargs):
+    tenant_id = instance.pk
+    TenantResolutionCache.invalidate_tenant(tenant_id)
+    transaction.on_commit(lambda: TenantResolutionCache.invalidate_tenant(tenant_id))
+
+
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def invalidate_domain_resolution(sender, instance, **kwargs):
+    hostname, tenant_id = instance.domain, instance.tenant_id
+    TenantResolutionCache.invalidate_domain(hostname, tenant_id)
+    transaction.on_commit(lambda: TenantResolutionCache.invalidate_domain(hostname, tenant_id))
@@ -38,8 +38,9 @@ TENANT_APPS = tenant_config['TENANT_APPS']
 INSTALLED_APPS = tenant_config['INSTALLED_APPS']
 
 MIDDLEWARE = [
-    'apps.tenants.debug_middleware.TenantDebugMiddleware',
-    'django_tenants.middleware.main.TenantMainMiddleware',
+    'apps.core.diagnostics.RequestDiagnosticsMiddleware',
+    'apps.core.query_budget.QueryInspectionMiddleware',
+    'apps.tenants.middleware.TenantResolutionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -158,3 +159,44 @@ MESSAGE_TAGS = {
     messages.WARNING: 'warning',
     messages.ERROR: 'error',
 }
+
+# Facturación: procesos usados para generar PDFs en las descargas masivas
+# (0 = uno por núcleo disponible, 1 = generación secuencial en el propio proceso)
+INVOICE_PDF_WORKERS = config('INVOICE_PDF_WORKERS', default=0, cast=int)
+
+# Tareas en segundo plano (manage.py run_jobs): ficheros resultantes en disco local
+JOB_RESULTS_ROOT = config('JOB_RESULTS_ROOT', default=os.path.join(BASE_DIR, 'job_results'))
+JOB_RESULT_TTL_HOURS = config('JOB_RESULT_TTL_HOURS', default=24, cast=int)
+JOB_STALE_MINUTES = config('JOB_STALE_MINUTES', default=60, cast=int)
+
+# Facturación: caché en disco de PDFs generados (direccionada por contenido)
+INVOICE_PDF_CACHE_ROOT = config('INVOICE_PDF_CACHE_ROOT', default=os.path.join(BASE_DIR, 'pdf_cache'))
+
+# Facturación: descargas masivas por encima de este tamaño estimado se dividen
+# en varios ZIP (por mes y, si hace falta, por bloques de facturas)
+BULK_ZIP_PART_MAX_MB = config('BULK_ZIP_PART_MAX_MB', default=100, cast=int)
+
+# Diagnóstico de peticiones (apps.core.diagnostics): fracción de peticiones
+# muestreadas (0 = desactivado), tamaño del búfer y nivel de la línea de log
+REQUEST_DIAGNOSTICS_SAMPLE_RATE = config('REQUEST_DIAGNOSTICS_SAMPLE_RATE', default=0.0, cast=float)
+REQUEST_DIAGNOSTICS_BUFFER_SIZE = config('REQUEST_DIAGNOSTICS_BUFFER_SIZE', default=200, cast=int)
+REQUEST_DIAGNOSTICS_LOG_LEVEL = config('REQUEST_DIAGNOSTICS_LOG_LEVEL', default='DEBUG')
+
+# Caché de resultados por tenant (apps.core.services.tenant_cache): alias del
+# backend compartido, caducidad en segundos y entradas del LRU de cada proceso
+TENANT_CACHE_ALIAS = 'default'
+TENANT_CACHE_TIMEOUT = config('TENANT_CACHE_TIMEOUT', default=900, cast=int)
+TENANT_CACHE_LOCAL_MAX_ENTRIES = config('TENANT_CACHE_LOCAL_MAX_ENTRIES', default=256, cast=int)
+
+# Segundos que cada proceso recuerda la resolución dominio → tenant
+# (apps.tenants.services.tenant_resolution_cache); 0 la desactiva
+TENANT_RESOLUTION_CACHE_TTL = config('TENANT_RESOLUTION_CACHE_TTL', default=60, cast=int)
+
+# Presupuestos de consultas (apps.core.query_budget): qué hacer al superarlos
+# ('raise', 'log' u 'off'); los tests usan QueryBudgetTestMixin, que siempre falla
+QUERY_BUDGET_ACTION = config('QUERY_BUDGET_ACTION', default='log')
+
+# Detección de N+1 por petición: activa en desarrollo, avisa a partir de
+# este número de consultas con la misma forma
+QUERY_INSPECTION_ENABLED = config('QUERY_INSPECTION_ENABLED', default=DEBUG, cast=bool)
+QUERY_INSPECTION_REPEAT_THRESHOLD = config('QUERY_INSPECTION_REPEAT_THRESHOLD', default=5, cast=int)
@@ -111,13 +111,14 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@miapp.com')
 
 # CACHE - Configuración SIN Redis (modo económico)
+# En disco: las lecturas no pasan por PostgreSQL y el recorte no lanza DELETE
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
-        'LOCATION': 'django_cache_table',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_LOCATION', default=os.path.join(BASE_DIR, 'cache')),
         'TIMEOUT': 300,  # 5 minutos
         'OPTIONS': {
-            'MAX_ENTRIES': 1000,
+            'MAX_ENTRIES': 5000,
             'CULL_FREQUENCY': 3,
         }
     }
@@ -150,7 +151,7 @@ MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
 MEDIA_URL = '/media/'
 
 if 'whitenoise.middleware.WhiteNoiseMiddleware' not in MIDDLEWARE:
-    tenant_index = MIDDLEWARE.index('django_tenants.middleware.main.TenantMainMiddleware')
+    tenant_index = MIDDLEWARE.index('apps.tenants.middleware.TenantResolutionMiddleware')
     MIDDLEWARE.insert(tenant_index + 1, 'whitenoise.middleware.WhiteNoiseMiddleware')
 
 
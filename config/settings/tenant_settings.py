@@ -13,6 +13,7 @@ def configure_tenant_settings():
             'apps.authentication',
         ],
         'TENANT_APPS': [
+            'apps.core',
             'apps.dashboard', 
             'apps.accounting',
             'apps.business_lines',
@@ -173,8 +173,8 @@ run_development() {
 
 # Función para modo producción
 run_production() {
-    log "🌟 Iniciando servidor de producción con Gunicorn..."
-    exec gunicorn \
+    log "🌟 Iniciando servidor de producción con Gunicorn y worker de tareas..."
+    exec /app/scripts/start-web.sh gunicorn \
         --bind 0.0.0.0:8000 \
         --workers ${GUNICORN_WORKERS:-3} \
         --worker-class ${GUNICORN_WORKER_CLASS:-sync} \
@@ -0,0 +1,38 @@
+#!/bin/bash
+# =============================================================================
+# start-web.sh - Arranca el worker de tareas junto al servidor web
+# =============================================================================
+# Uso: ./scripts/start-web.sh gunicorn [opciones] config.wsgi:application
+#
+# Las exportaciones y descargas masivas se encolan desde la web y las procesa
+# `manage.py run_jobs`. Los resultados se escriben en JOB_RESULTS_ROOT, en el
+# disco local del contenedor, así que el worker tiene que correr en el mismo
+# contenedor que sirve las descargas. JOB_WORKER_ENABLED=False lo desactiva
+# (por ejemplo, si se despliega un worker aparte con disco compartido).
+
+set -e
+
+start_job_worker() {
+    if [ "${JOB_WORKER_ENABLED:-True}" = "False" ]; then
+        echo "[start-web] Worker de tareas desactivado (JOB_WORKER_ENABLED=False)"
+        return 0
+    fi
+    
+    echo "[start-web] Iniciando worker de tareas en segundo plano..."
+    (
+        # Si el worker termina por un error se vuelve a lanzar
+        while true; do
+            python manage.py run_jobs --sleep "${JOB_WORKER_SLEEP:-5}" || true
+            echo "[start-web] El worker de tareas se detuvo; reiniciando en 5 segundos..."
+            sleep 5
+        done
+    ) &
+}
+
+if [ $# -eq 0 ]; then
+    echo "Uso: $0 <comando del servidor web>"
+    exit 1
+fi
+
+start_job_worker
+exec "$@"
@@ -0,0 +1,132 @@
+/**
+ * Tareas en segundo plano: encola la operación en el servidor, sondea su
+ * estado y descarga el resultado cuando termina.
+ */
+class BackgroundJobs {
+    static POLL_INTERVAL = 2000;
+
+    static getCsrfToken() {
+        const meta = document.querySelector('meta[name="csrf-token"]');
+        return meta ? meta.getAttribute('content') : '';
+    }
+
+    static start(url, data = {}) {
+        const body = data instanceof FormData ? data : new URLSearchParams(data);
+        const toast = BackgroundJobs.createToast('Preparando la tarea...');
+
+        fetch(url, {
+            method: 'POST',
+            body: body,
+            headers: { 'X-CSRFToken': BackgroundJobs.getCsrfToken() },
+            credentials: 'same-origin'
+        })
+            .then(response => response.json())
+            .then(result => {
+                if (!result.success) {
+                    BackgroundJobs.fail(toast, result.error || 'No se pudo iniciar la tarea');
+                    return;
+                }
+                BackgroundJobs.poll(result.status_url, toast);
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                BackgroundJobs.fail(toast, 'No se pudo iniciar la tarea');
+            });
+    }
+
+    static poll(statusUrl, toast) {
+        fetch(statusUrl, { credentials: 'same-origin' })
+            .then(response => response.json())
+            .then(job => {
+                BackgroundJobs.updateToast(toast, job.message || job.status_display, job.progress);
+
+                if (!job.finished) {
+                    setTimeout(() => BackgroundJobs.poll(statusUrl, toast), BackgroundJobs.POLL_INTERVAL);
+                    return;
+                }
+
+                if (job.parts && job.parts.length > 1) {
+                    BackgroundJobs.updateToast(toast, job.message || 'Descarga lista', 100);
+                    BackgroundJobs.showParts(toast, job.parts);
+                } else if (job.download_url) {
+                    BackgroundJobs.updateToast(toast, job.message || 'Descarga lista', 100);
+                    window.location.href = job.download_url;
+                    setTimeout(() => toast.remove(), 5000);
+                } else {
+                    BackgroundJobs.fail(toast, job.error || 'Error al ejecutar la tarea');
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                setTimeout(() => BackgroundJobs.poll(statusUrl, toast), BackgroundJobs.POLL_INTERVAL * 2);
+            });
+    }
+
+    static createToast(message) {
+        let container = document.getElementById('backgroundJobsContainer');
+        if (!container) {
+            container = document.createElement('div');
+            container.id = 'backgroundJobsContainer';
+            container.className = 'fixed bottom-4 right-4 z-50 space-y-2 w-80';
+            document.body.appendChild(container);
+        }
+
+        const toast = document.createElement('div');
+        toast.className = 'bg-white dark:bg-gray-800 rounded-lg shadow-lg ring-1 ring-black ring-opacity-5 p-4';
+        toast.innerHTML = `
+            <p class="text-sm text-gray-700 dark:text-gray-200" data-job-message></p>
+            <div class="mt-2 h-2 bg-gray-200 dark:bg-gray-700 rounded-full overflow-hidden">
+                <div class="h-2 bg-blue-600 transition-all duration-300" style="width: 0%" data-job-progress></div>
+            </div>
+        `;
+        container.appendChild(toast);
+        BackgroundJobs.updateToast(toast, message, 0);
+        return toast;
+    }
+
+    static showParts(toast, parts) {
+        // Varias descargas automáticas seguidas las bloquea el navegador: se ofrecen como enlaces
+        const list = document.createElement('ul');
+        list.className = 'mt-2 space-y-1 max-h-48 overflow-y-auto';
+        parts.forEach(part => {
+            const item = document.createElement('li');
+            const link = document.createElement('a');
+            link.href = part.url;
+            link.textContent = `${part.filename} (${BackgroundJobs.formatSize(part.size)})`;
+            link.className = 'text-sm text-blue-600 hover:text-blue-800 dark:text-blue-400';
+            item.appendChild(link);
+            list.appendChild(item);
+        });
+
+        const close = document.createElement('button');
+        close.type = 'button';
+        close.textContent = 'Cerrar';
+        close.className = 'mt-2 text-xs text-gray-500 hover:text-gray-700 dark:text-gray-400';
+        close.addEventListener('click', () => toast.remove());
+
+        toast.appendChild(list);
+        toast.appendChild(close);
+    }
+
+    static formatSize(bytes) {
+        if (bytes >= 1024 * 1024) {
+            return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+        }
+        return `${Math.max(1, Math.round(bytes / 1024))} KB`;
+    }
+
+    static updateToast(toast, message, progress) {
+        toast.querySelector('[data-job-message]').textContent = message;
+        toast.querySelector('[data-job-progress]').style.width = `${progress || 0}%`;
+    }
+
+    static fail(toast, message) {
+        const text = toast.querySelector('[data-job-message]');
+        text.textContent = message;
+        text.classList.add('text-red-500');
+        toast.querySelector('[data-job-progress]').classList.replace('bg-blue-600', 'bg-red-500');
+        setTimeout(() => toast.remove(), 8000);
+    }
+}
+
+window.BackgroundJobs = BackgroundJobs;